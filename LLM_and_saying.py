@@ -1,15 +1,22 @@
 import os
-from pydantic_ai import Agent, RunContext, BinaryContent
+from pydantic_ai import Agent, RunContext
 from pydantic_ai.models.openai import OpenAIModel
 from pydantic_ai.providers.openrouter import OpenRouterProvider
 from pydantic import BaseModel
 from dotenv import load_dotenv, find_dotenv
-from typing import Any
+from typing import Any, Optional
 import time
+import threading
 import cv2
 from rpi_client import RPiController
 from motion import grabGun, lowerGun, turnHead
 from camera import draw_gun_camera_crosshair
+from speech_pipeline import SentenceSegmenter, SpeechQueue
+from history_manager import HistoryManager
+from image_shaper import ImageShaper
+from shot_correction import ShotCorrector
+from aim_calibration import record_sample
+import asyncio
 import logfire
 import requests
 
@@ -20,6 +27,11 @@ import requests
 
 load_dotenv(find_dotenv())
 
+LOOK_AROUND_ANGLES = [-120, -60, 0, 120, 60]  # head yaw in degrees, captured in this order
+NEVER_ABORTED = threading.Event()  # abort event of runs not started by a tracked task; never set
+PANORAMA_MAX_BYTES = 400_000  # one panorama replaces all look_around frames
+GUN_PHOTO_MAX_SIDE = 820  # RPi Camera V2 full resolution (3280 px) / 4, keeps the crosshair labels readable
+
 
 class Corrections(BaseModel):
     vertical_correction: float  # stopnie, + = do góry, – = w dół
@@ -27,15 +39,22 @@ class Corrections(BaseModel):
 
 
 class LLMAndSaying:
-    def __init__(self, motion_service, video_service, video_handle, sound_module, speech_service, prompt_name='system_message_shooting', language='Polski'):
+    def __init__(self, motion_service, video_service, video_handle, sound_module, speech_service, prompt_name='system_message_shooting', language='Polski',
+                 look_around_mode='frames', camera_manager=None):
         """Initialize the agent with system prompt and movement tools"""
 
         self.motion_service = motion_service
         self.video_service = video_service
         self.video_handle = video_handle
+        self.camera_manager = camera_manager  # if given, each tool uses the resolution it needs
+        self.look_around_mode = look_around_mode  # 'frames': one image per angle, 'panorama': one stitched image
 
         self.is_idle = True  # Flag to track if the robot is idle
+        self.speech_queue = SpeechQueue(speech_service)  # robot speaks while the LLM keeps streaming
         self.message_history = []  # Conversation history management
+        self.history_manager = HistoryManager()  # strips old images, keeps requests inside the token budget
+        self.image_shaper = ImageShaper()  # every image sent to the LLM goes through it
+        self.shot_corrector = ShotCorrector()  # local aim correction, the shooter LLM only as fallback
         self.system_prompt = self._load_system_message(prompt_name, language)
         self.openrouter_model = OpenAIModel(
             #'openai/gpt-4.1',
@@ -59,12 +78,20 @@ class LLMAndSaying:
         self.agent.tool(self.task_finished_tool())
         self.shooter_llm = Agent(self.openrouter_model, output_type=Corrections)
 
-    async def generate_say_execute_response(self, user_input, speech_service, sound_module, is_idle):
+    async def generate_say_execute_response(self, user_input, speech_service, sound_module, is_idle, abort_event=None):
+        """
+        Streams the LLM answer, speaks it and runs the tools it calls. `abort_event`
+        (see TaskPreemptor.track) reaches the tools as ctx.deps and is set on "stop".
+        """
         full_response = ""
-        sentence_buffer = ""
+        segmenter = SentenceSegmenter()
         self.is_idle = is_idle  # Update idle state based on the input
+        self.message_history = self.history_manager.compact(self.message_history)
+        self.history_manager.report(self.message_history, user_input)
         try:
-            async with self.agent.run_stream(user_input, message_history=self.message_history) as result:
+            self.speech_queue.begin()
+            async with self.agent.run_stream(user_input, message_history=self.message_history,
+                                             deps=abort_event) as result:
                 # tts.say(random.choice(animations))
                 async for token in result.stream_text(delta=True):
                     # Check if adding this token would exceed 1000 characters
@@ -73,29 +100,36 @@ class LLMAndSaying:
 
                     print(token, end='', flush=True)
                     full_response += token
-                    sentence_buffer += token
 
-                    # Do not listen while talking
-                    if sound_module.is_listening:
-                        sound_module.setNotListening()
+                    # While talking only a stop word is listened for
+                    if not sound_module.stop_words_only:
+                        sound_module.setStopWordsOnly()
 
-                    # If token ends with sentence delimiter, speak the buffered sentence
-                    if token.endswith('.') or token.endswith('!') or token.endswith('?'):# or token.endswith(','):
-                        if sentence_buffer.strip():
-                            speech_service.say(sentence_buffer.strip())
-                            sentence_buffer = ""
+                    # Speak every finished sentence while the rest is still streaming
+                    for sentence in segmenter.push(token):
+                        self.speech_queue.speak(sentence)
 
                 # Speak final sentence if any
-                if sentence_buffer.strip():
-                    speech_service.say(sentence_buffer.strip())
+                rest = segmenter.flush()
+                if rest:
+                    self.speech_queue.speak(rest)
 
                 # Update message history with new messages
                 self.message_history.extend(result.new_messages())
-                return self.is_idle
+            await self.speech_queue.drain()  # take all commands again only after the robot finished talking
+            return self.is_idle
+        except asyncio.CancelledError:
+            self.speech_queue.clear()
+            raise
         finally:
             # Always restore listening, even if the task was cancelled
             sound_module.setListening()
 
+    @staticmethod
+    def _abort_event(ctx):
+        """Abort event of the task that started this run (passed as deps)"""
+        return ctx.deps if ctx.deps is not None else NEVER_ABORTED
+
     def reset_conversation(self):
         """Reset conversation history for a new task"""
         self.message_history = []
@@ -120,6 +154,8 @@ class LLMAndSaying:
         def move_forward(ctx: RunContext[Any], meters: float):
             """Move the robot forward by specified meters (max 2 meters)"""
 
+            if self._abort_event(ctx).is_set():
+                return "Task was stopped by the human."
             if meters > 2:
                 meters = 2
             elif meters < 0:
@@ -139,6 +175,8 @@ class LLMAndSaying:
             Turn the robot by specified angle in degrees (positive = left, negative = right).
             param degrees: angle to turn. Hint: angle value you see on the photo under the target is the value you need to provide here (keep sign as well).
             """
+            if self._abort_event(ctx).is_set():
+                return "Task was stopped by the human."
             print(f"Turning {degrees} degrees")
 
             print(motion_service.getExternalCollisionProtectionEnabled("Arms"))
@@ -153,67 +191,91 @@ class LLMAndSaying:
 
         return turn_robot
 
+    def _camera(self, phase, video_service, video_handle):
+        """(video service, handle) to capture with in a task phase (see camera.PHASE_RESOLUTIONS)"""
+        if self.camera_manager is None:
+            return video_service, video_handle
+        return self.camera_manager.video, self.camera_manager.handle_for(phase)
+
     def _look_around_tool(self, motion_service, video_service, video_handle):
         """Create look around tool for the agent"""
         def look_around(ctx: RunContext[Any]):
             """Look around yourself to understand envinronment. Use that tool when you can't see the thing you are looking for"""
-            from motion import turnHead
-            from camera import take_picture
+            from camera import sweep_head
 
+            video, handle = self._camera("look_around", video_service, video_handle)
             print("Looking around - taking 5 photos at different angles")
+            started = time.monotonic()
 
-            photos = []
-            angles = [-120, -60, 0, 120, 60]
+            angles = LOOK_AROUND_ANGLES
+            abort_event = self._abort_event(ctx)
+            if self.look_around_mode == 'panorama':
+                return self._look_around_panorama(motion_service, video, handle, angles, started, abort_event)
 
-            for angle in angles:
-                turnHead(motion_service, angle)
-                time.sleep(0.2)  # Wait for head to move
+            encoded = {}  # angle -> Future of ShapedImage, encoded while the head moves on
 
-                # Get raw NumPy image array
-                image_buffer = take_picture(video_service, video_handle, center_angle=angle)
+            def on_frame(angle, image):
+                encoded[angle] = self.image_shaper.submit(image, name=f"look_around {angle}")
 
-                # Encode the image to JPEG, then convert to bytes for the LLM
-                _, buffer = cv2.imencode('.jpg', image_buffer, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                photo_bytes = buffer.tobytes()
-                photo_content = BinaryContent(data=photo_bytes, media_type='image/jpeg')
-                photos.append(photo_content)
+            captured = sweep_head(motion_service, video, handle, angles, on_frame, abort_event=abort_event)
 
-                # save photo buffer to file (use opencv functions), place angle in the filename
+            photos = []
+            for angle in captured:
+                image = encoded[angle].result()
+                photos.append(image.content())
+                # save photo to file, place angle in the filename
                 with open(f"pepper_image_{angle}.jpg", 'wb') as f:
-                    f.write(buffer)
-
-            # Return head to center position
-            print("Returning head to center position")
-            turnHead(motion_service, 0)
+                    f.write(image.data)
 
+            print(f"[LOOK_AROUND] {len(photos)} photos in {time.monotonic() - started:.2f} s")
             return photos
         
         return look_around
+
+    def _look_around_panorama(self, motion_service, video_service, video_handle, angles, started, abort_event):
+        """look_around in panorama mode: all angles stitched into one image"""
+        from camera import sweep_head, compose_panorama
+
+        frames = []
+        sweep_head(motion_service, video_service, video_handle, angles,
+                   lambda angle, image: frames.append((angle, image)),
+                   abort_event=abort_event, add_grid=False)
+        if not frames:
+            return "Looking around was stopped by the human."
+
+        panorama = compose_panorama(frames)
+        image = self.image_shaper.shape(panorama, name="look_around panorama",
+                                        max_bytes=PANORAMA_MAX_BYTES, max_side=panorama.shape[1])
+        with open("pepper_image_panorama.jpg", 'wb') as f:
+            f.write(image.data)
+
+        print(f"[LOOK_AROUND] Panorama of {len(frames)} angles in {time.monotonic() - started:.2f} s")
+        left = max(angle for angle, _ in frames)
+        right = min(angle for angle, _ in frames)
+        return [f"Panorama around you, from {left} deg (left edge) to {right} deg (right edge), "
+                f"angles marked at the bottom:", image.content()]
     
     def _look_forward_tool(self, motion_service, video_service, video_handle):
         """Create look forward tool for the agent"""
         def look_forward(ctx: RunContext[Any]):
             """Take a photo of what you currently see in front of you to analyze the environment"""
-            from camera import take_picture
+            from camera import take_picture, MIN_SHARPNESS
             
             print("Taking photo of what's in front")
+            video, handle = self._camera("navigation", video_service, video_handle)
 
             # Get raw NumPy image array
-            image_buffer = take_picture(video_service, video_handle, center_angle=0)
-
+            image_buffer = take_picture(video, handle, center_angle=0, reuse_buffer=True,
+                                        min_sharpness=MIN_SHARPNESS)
 
-            # Encode the image to JPEG, then convert to bytes for the LLM
-            _, buffer = cv2.imencode('.jpg', image_buffer, [cv2.IMWRITE_JPEG_QUALITY, 70])
-            photo_bytes = buffer.tobytes()
-            photo_content = BinaryContent(data=photo_bytes, media_type='image/jpeg')
-
-            return photo_content
+            # Encode the image to JPEG within the image budget
+            return self.image_shaper.shape(image_buffer, name="look_forward").content()
         
         return look_forward
 
     def _shoot_tool(self, motion_service):
         """Create tool for the agent"""
-        def shoot(ctx: RunContext[Any], vertical_angle: float, target_name: str):
+        def shoot(ctx: RunContext[Any], vertical_angle: float, target_name: str, distance: Optional[float] = None):
             """
             Shoot. Calling that tool shoots using airsoft gun to the front of you.
             Ensure object you want to shoot is exactly in front of you (on 0 deg).
@@ -221,54 +283,70 @@ class LLMAndSaying:
 
             :param vertical_angle: angle of vertical target in degrees (positive = up, negative = down)
             :param target_name: name and short description of target
+            :param distance: estimated distance to the target in meters, if you can tell
             """
+            abort_event = self._abort_event(ctx)
+            if abort_event.is_set():
+                return "Task was stopped by the human."
             print(f"[SHOOT TOOL] Shooting: {target_name}, Initial vertical angle: {vertical_angle} deg")
-            grabGun(motion_service, vertical_angle, 0)
+            shoulder_pitch, elbow_roll = grabGun(motion_service, vertical_angle, 0, distance)
             motion_service.waitUntilMoveIsFinished()
             # Take photo from gun camera
             gun_photo = self.rpi_controller.capture_image()
 
-            gun_photo = cv2.resize(gun_photo, (int(gun_photo.shape[1]/4), int(gun_photo.shape[0]/4))) # lower resolution to fit llm. ToDo: Make on RPi side.
-            # Apply crosshair grid to gun camera image
-            gun_photo_with_grid = draw_gun_camera_crosshair(gun_photo)
-            # make resolution lesser
-            # write to file
-            cv2.imwrite("gun_camera_with_grid.png", gun_photo_with_grid)
+            gun_photo = self.image_shaper.fit(gun_photo, max_side=GUN_PHOTO_MAX_SIDE) # lower resolution to fit llm. ToDo: Make on RPi side.
 
+            def ask_llm(photo):
+                # Apply crosshair grid to gun camera image
+                gun_photo_with_grid = draw_gun_camera_crosshair(photo.copy())
+                # write to file
+                cv2.imwrite("gun_camera_with_grid.png", gun_photo_with_grid)
 
-            # Convert processed image to bytes for LLM
-            _, buffer = cv2.imencode('.jpg', gun_photo_with_grid, [cv2.IMWRITE_JPEG_QUALITY, 90])
-            photo_bytes = buffer.tobytes()
-            photo_content = BinaryContent(data=photo_bytes, media_type='image/jpeg')
+                # Convert processed image to bytes for LLM
+                photo_content = self.image_shaper.shape(gun_photo_with_grid, name="gun camera", quality=90).content()
 
-            # Prepare detailed input for LLM
-            llm_prompt = f"""Analyze the gun camera image to determine shooting corrections for target: {target_name}.
+                # Prepare detailed input for LLM
+                llm_prompt = f"""Analyze the gun camera image to determine shooting corrections for target: {target_name}.
             
-            Aim in the very middle of the target. You need to provide:
-            1. vertical_correction: degrees to adjust up (positive) or down (negative) to hit the target
-            2. horizontal_correction: degrees to adjust left (positive) or right (negative) to hit the target"""
-
-            # Get corrections from LLM (single call with structured output)
-            corrections = self.shooter_llm.run_sync(
-                [llm_prompt, photo_content],
-            )
-
-            # Apply corrections - vertical starts from 0, horizontal adds to initial correction
-            final_vertical_correction = corrections.output.vertical_correction
-            final_horizontal_correction = vertical_angle + corrections.output.horizontal_correction
+                Aim in the very middle of the target. You need to provide:
+                1. vertical_correction: degrees to adjust up (positive) or down (negative) to hit the target
+                2. horizontal_correction: degrees to adjust left (positive) or right (negative) to hit the target"""
+
+                # Get corrections from LLM (single call with structured output)
+                corrections = self.shooter_llm.run_sync(
+                    [llm_prompt, photo_content],
+                )
+                return corrections.output.vertical_correction, corrections.output.horizontal_correction
+
+            # Detect the target locally; the LLM is asked only if the detector is not sure
+            correction = self.shot_corrector.correct(gun_photo, target_name, ask_llm)
+
+            # Log the aim error for the calibration table: the gun pointed away from the target by minus the seen offset
+            record_sample(vertical_angle, 0, shoulder_pitch, elbow_roll, -correction.vertical, -correction.horizontal,
+                          distance=distance, source=correction.source)
+
+            # The target is seen relative to where the gun points now, (vertical_angle, 0):
+            # the corrections are offsets from that aim, as in the calibration sample above
+            final_vertical_correction = vertical_angle + correction.vertical
+            final_horizontal_correction = correction.horizontal
             
-            print(f"[SHOOT TOOL] shoot corrections. Vertical: {corrections.output.vertical_correction} deg, Horizontal: {corrections.output.horizontal_correction} deg")
-
-            grabGun(motion_service, final_vertical_correction, final_horizontal_correction)
-            time.sleep(1)  # Wait for hand ro raise
+            print(f"[SHOOT TOOL] shoot corrections ({correction.source}). Vertical: {correction.vertical:.1f} deg, Horizontal: {correction.horizontal:.1f} deg")
+
+            if abort_event.is_set():
+                return f"Shot at {target_name} aborted - task was stopped by the human."
+            grabGun(motion_service, final_vertical_correction, final_horizontal_correction, distance)
+            # Waits use abort_event so a "stop" interrupts them
+            if abort_event.wait(1):  # Wait for hand ro raise
+                return f"Shot at {target_name} aborted - task was stopped by the human."
             self.rpi_controller.fire()
-            time.sleep(1)    # Wait for gun to shoot
-            time.sleep(10) # for barrel kierunek analisys
+            abort_event.wait(1)    # Wait for gun to shoot
+            abort_event.wait(10) # for barrel kierunek analisys
             lowerGun(motion_service)
 
             motion_service.waitUntilMoveIsFinished()
+            self.shot_corrector.report()
 
-            return f"Shot fired at {target_name} with corrections - V: {corrections['vertical_correction']}°, H: {corrections['horizontal_correction']}°"
+            return f"Shot fired at {target_name} with corrections - V: {correction.vertical:.1f}°, H: {correction.horizontal:.1f}°"
         
         return shoot
 
@@ -278,9 +356,11 @@ class LLMAndSaying:
             """Say something to the human. Use that tool when you want to tell something to human."""
             print(f"Saying: {message}")
             full_response = ""
-            sentence_buffer = ""
+            segmenter = SentenceSegmenter()
             try:
-                async with self.agent.run_stream(message, message_history=self.message_history) as result:
+                self.speech_queue.begin()
+                async with self.agent.run_stream(message, message_history=self.message_history,
+                                                 deps=ctx.deps) as result:
                     # tts.say(random.choice(animations))
                     async for token in result.stream_text(delta=True):
                         # Check if adding this token would exceed 1000 characters
@@ -289,24 +369,26 @@ class LLMAndSaying:
 
                         print(token, end='', flush=True)
                         full_response += token
-                        sentence_buffer += token
 
-                        # Do not listen while talking
-                        if sound_module.is_listening:
-                            sound_module.setNotListening()
+                        # While talking only a stop word is listened for
+                        if not sound_module.stop_words_only:
+                            sound_module.setStopWordsOnly()
 
-                        # If token ends with sentence delimiter, speak the buffered sentence
-                        if token.endswith('.') or token.endswith('!') or token.endswith('?'):  # or token.endswith(','):
-                            if sentence_buffer.strip():
-                                speech_service.say(sentence_buffer.strip())
-                                sentence_buffer = ""
+                        # Speak every finished sentence while the rest is still streaming
+                        for sentence in segmenter.push(token):
+                            self.speech_queue.speak(sentence)
 
                     # Speak final sentence if any
-                    if sentence_buffer.strip():
-                        speech_service.say(sentence_buffer.strip())
+                    rest = segmenter.flush()
+                    if rest:
+                        self.speech_queue.speak(rest)
 
                     # Update message history with new messages
                     self.message_history.extend(result.new_messages())
+                await self.speech_queue.drain()
+            except asyncio.CancelledError:
+                self.speech_queue.clear()
+                raise
             finally:
                 # Always restore listening, even if the task was cancelled
                 sound_module.setListening()
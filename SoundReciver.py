@@ -1,12 +1,10 @@
 import math
 import numpy as np
-from time import sleep
 import speech_recognition as sr
-import pyaudio
-import wave
-import io
-import time  # Add this import for timing.
-import threading  # <--- Add this import
+from stt_worker import RecognitionWorkerPool, StreamingRecognitionWorker
+from stt_backends import GoogleBackend
+from command_bus import PRIORITY_HIGH, classify_priority, is_stop_command
+from vad import AdaptiveVAD, SPEECH_START, SPEECH_END, SILENCE
 
 
 # --- Energy Calculation Functions ---
@@ -68,33 +66,172 @@ def get_rms_energy_from_bytes(byte_data):
     return calculate_rms_energy(float_array)
 
 
+# --- Audio Accumulation ---
+
+SAMPLE_RATE = 16000
+
+
+class AudioRingBuffer(object):
+    """
+    Fixed-capacity int16 accumulator used by the NAOqi audio callback.
+
+    While waiting for speech, frames go into a small pre-roll ring so the audio
+    just before the threshold was crossed is not lost. When an utterance starts,
+    the pre-roll is unrolled into a linear utterance buffer and every following
+    frame is copied in place. No sample memory is allocated per frame.
+
+    Utterance buffers rotate, so a memoryview returned by finalize() stays valid
+    until `n_buffers - 1` further utterances have been finalized.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE, max_seconds=30.0, preroll_seconds=0.3, n_buffers=2):
+        self.sample_rate = sample_rate
+        self.capacity = int(sample_rate * max_seconds)
+        self.preroll_capacity = max(1, int(sample_rate * preroll_seconds))
+        self._preroll = np.zeros(self.preroll_capacity, dtype=np.int16)
+        self._preroll_pos = 0  # next write index in the pre-roll ring
+        self._preroll_len = 0
+        self._buffers = [np.zeros(self.capacity, dtype=np.int16) for _ in range(max(1, n_buffers))]
+        self._active = 0
+        self._length = 0
+        self.is_recording = False
+
+    def reset(self):
+        """
+        Drops the pre-roll and any partially accumulated utterance.
+        """
+        self._preroll_pos = 0
+        self._preroll_len = 0
+        self._length = 0
+        self.is_recording = False
+
+    def push_preroll(self, samples):
+        """
+        Stores samples in the pre-roll ring, overwriting the oldest ones.
+        """
+        cap = self.preroll_capacity
+        n = len(samples)
+        if n >= cap:
+            self._preroll[:] = samples[n - cap:]
+            self._preroll_pos = 0
+            self._preroll_len = cap
+            return
+        end = self._preroll_pos + n
+        if end <= cap:
+            self._preroll[self._preroll_pos:end] = samples
+        else:
+            first = cap - self._preroll_pos
+            self._preroll[self._preroll_pos:] = samples[:first]
+            self._preroll[:n - first] = samples[first:]
+        self._preroll_pos = end % cap
+        self._preroll_len = min(cap, self._preroll_len + n)
+
+    def start(self):
+        """
+        Begins a new utterance, seeded with the current pre-roll.
+        """
+        cap = self.preroll_capacity
+        buf = self._buffers[self._active]
+        n = self._preroll_len
+        begin = (self._preroll_pos - n) % cap
+        if begin + n <= cap:
+            buf[:n] = self._preroll[begin:begin + n]
+        else:
+            first = cap - begin
+            buf[:first] = self._preroll[begin:]
+            buf[first:n] = self._preroll[:n - first]
+        self._length = n
+        self._preroll_pos = 0
+        self._preroll_len = 0
+        self.is_recording = True
+
+    def append(self, samples):
+        """
+        Appends samples to the current utterance.
+
+        Returns:
+            False once the utterance buffer is full and should be finalized.
+        """
+        n = min(len(samples), self.capacity - self._length)
+        self._buffers[self._active][self._length:self._length + n] = samples[:n]
+        self._length += n
+        return self._length < self.capacity
+
+    def finalize(self):
+        """
+        Ends the current utterance and hands it over without copying.
+
+        Returns:
+            A memoryview over the int16 samples of the utterance.
+        """
+        view = memoryview(self._buffers[self._active][:self._length])
+        self._active = (self._active + 1) % len(self._buffers)
+        self._length = 0
+        self.is_recording = False
+        return view
+
+    def current(self):
+        """
+        Returns a view of the samples accumulated so far in the current utterance.
+        """
+        return self._buffers[self._active][:self._length]
+
+    def __len__(self):
+        return self._length
+
+
 class SoundReceiverModule(object):
     """
     A NAOqi module to subscribe to ALAudioDevice and process microphone data.
     """
-    def __init__(self, session, name="SoundReceiverModule", thresholdRMSEnergy = 0.01, language="Polski"):
+    def __init__(self, session, name="SoundReceiverModule", thresholdRMSEnergy = 0.01, language="Polski",
+                 environment="indoor", vad=None, stt_backend=None, command_bus=None):
+        """
+        thresholdRMSEnergy is the absolute minimum energy of speech; on top of it the
+        VAD tracks the noise floor. Pass `vad` (e.g. vad.FixedThresholdVAD) to override
+        the detector built from the `language` / `environment` endpointing profile.
+        `stt_backend` defaults to stt_backends.GoogleBackend; streaming backends such as
+        stt_backends.VoskBackend are fed while the person is still speaking.
+        With a `command_bus` (command_bus.CommandBus) recognized text is published
+        there; otherwise it is left in stt_output.
+        """
         super(SoundReceiverModule, self).__init__()
         self.session = session
         self.audio_service = session.service("ALAudioDevice")
         self.module_name = name
         self.channels = 1  # Assuming you want to process the front microphone
-        self.accumulated_frames = []
+        # Enough utterance buffers for every recording the STT pool can still hold
+        self.stt_workers = 1
+        self.stt_max_queue = 2
+        self.audio_buffer = AudioRingBuffer(sample_rate=SAMPLE_RATE, n_buffers=self.stt_workers + self.stt_max_queue + 1)
         self.is_accumulating = False
         self.is_accumulating_or_recognizing_speech = False
-        self.lastBelowThresholdTime = None
-        self.r = sr.Recognizer()
         self.is_listening = False
+        self.stop_words_only = False  # while the robot speaks only stop commands get through
         self.stt_output = None  # Variable to store STT output
+        self.stt_partial = None  # Latest partial hypothesis of a streaming backend
+        self.command_bus = command_bus
+        self._stop_published = False  # a partial hypothesis already sent "stop" for this utterance
         self.thresholdRMSEnergy = thresholdRMSEnergy
         self.language_map = {"Polski": "pl-PL", "English": "en-US"}
         self.stt_language = self.language_map.get(language, "pl-PL")
+        self.stt_backend = stt_backend or GoogleBackend(language=self.stt_language)
+        self.stt_pool = RecognitionWorkerPool(self._recognize, self._onRecognitionResult,
+                                              workers=self.stt_workers, max_queue=self.stt_max_queue,
+                                              name="SoundReceiver")
+        self.stt_stream = None
+        if self.stt_backend.streaming:
+            self.stt_stream = StreamingRecognitionWorker(self.stt_backend, self._onRecognitionResult,
+                                                         on_partial=self._onPartialResult,
+                                                         name="SoundReceiver-stream")
+        self.vad = vad or AdaptiveVAD.from_profile(language, environment, sample_rate=SAMPLE_RATE,
+                                                   min_energy=thresholdRMSEnergy)
 
     def start(self):
         """
         Subscribes to the audio device.
         """
         self.audio_service.closeAudioInputs()
-        self.audio_service.setClientPreferences(self.module_name, 16000, self.channels, 0)
+        self.audio_service.setClientPreferences(self.module_name, SAMPLE_RATE, self.channels, 0)
         self.audio_service.subscribe(self.module_name)
         #print ("[SoundReceiver] Subscribed to ALAudioDevice.")
 
@@ -106,39 +243,14 @@ class SoundReceiverModule(object):
         print ("[SoundReceiver] Unsubscribed from ALAudioDevice.")
    
 
-    def _processSpeechRecognition(self, full_recording):
+    def _recognize(self, full_recording):
         """
-        Process speech recognition in a separate thread with simple compression.
+        Recognizes one utterance on an STT worker thread.
         """
         try:
-            # Simple compression: reduce audio data by removing every other sample
-            audio_array = np.frombuffer(full_recording, dtype=np.int16)
-            compressed_audio = audio_array[::2]  # Take every second sample
-            compressed_bytes = compressed_audio.tobytes()
-            
-            # Create WAV file in memory with compressed data
-            p = pyaudio.PyAudio()
-            audio_format = pyaudio.paInt16
-            channels = 1
-            rate = 8000  # Half the original rate due to downsampling
-
-            byte_buffer = io.BytesIO()
-            with wave.open(byte_buffer, "wb") as wf:
-                wf.setnchannels(channels)
-                wf.setsampwidth(p.get_sample_size(audio_format))
-                wf.setframerate(rate)
-                wf.writeframes(compressed_bytes)
-
-            byte_buffer.seek(0)
-            #print("[SoundReceiver] Processing accumulated audio on a separate thread.")
-            
-            with sr.AudioFile(byte_buffer) as source:
-                audio_data = self.r.record(source)
-                
-                print("[SoundReceiver] Recognizing speech...")
-                text = self.r.recognize_google(audio_data, language=self.stt_language, pfilter=1)
-                print("[SoundReceiver] Recognized text:", text)
-                self.stt_output = None if text.strip() == "" else text
+            print("[SoundReceiver] Recognizing speech...")
+            text = self.stt_backend.recognize(np.frombuffer(full_recording, dtype=np.int16))
+            return text
 
         except sr.UnknownValueError:
             print("[SoundReceiver] Could not understand audio")
@@ -146,58 +258,111 @@ class SoundReceiverModule(object):
             print("[SoundReceiver] Speech Recognition request error:", e)
         except Exception as e:
             print(f"[SoundReceiver] Error during audio processing: {e}")
-        finally:
+        return None
+
+    def _onPartialResult(self, text):
+        """
+        Called by a streaming backend whenever the partial hypothesis changes.
+        """
+        self.stt_partial = text
+        # A stop word does not wait for the end of the utterance
+        if self.command_bus is not None and not self._stop_published and is_stop_command(text):
+            self._stop_published = True
+            self.command_bus.publish(text, PRIORITY_HIGH)
+
+    def _onRecognitionResult(self, text):
+        """
+        Called by the STT pool or stream when an utterance has been recognized.
+        """
+        self.stt_partial = None
+        stop_published, self._stop_published = self._stop_published, False
+        if text is not None and text.strip() and self.stop_words_only and not is_stop_command(text):
+            print("[SoundReceiver] Ignored while speaking:", text)
+        elif text is not None and text.strip():
+            print("[SoundReceiver] Recognized text:", text)
+            if self.command_bus is not None:
+                priority = classify_priority(text)
+                if not (stop_published and priority == PRIORITY_HIGH):
+                    self.command_bus.publish(text, priority)
+            else:
+                self.stt_output = text
+        if not self.is_accumulating and self.stt_pool.is_idle:
             self.is_accumulating_or_recognizing_speech = False
-            self.setListening()
+
     def setListening(self):
         """
         Enables or disables listening mode.
         """
         self.is_listening = True
+        self.stop_words_only = False
         print("[SoundReceiver] Started listening.")
 
+    def setStopWordsOnly(self):
+        """
+        Keeps the microphone on while the robot speaks, but only commands with a
+        stop word (command_bus.STOP_KEYWORDS) are passed on; anything else, such
+        as the robot's own voice, is dropped. setListening() ends it.
+        """
+        self.is_listening = True
+        self.stop_words_only = True
+        print("[SoundReceiver] Listening for stop words only.")
+
     def setNotListening(self):
         """
         Disables listening mode.
         """
         self.is_listening = False
+        self.stop_words_only = False
+        if self.is_accumulating and self.stt_stream is not None:
+            self.stt_stream.cancel()
         self.is_accumulating = False
-        self.accumulated_frames = []
-        self.lastBelowThresholdTime = None
+        self.audio_buffer.reset()
+        self.vad.reset()
         print("[SoundReceiver] Stopped listening and cleared accumulated frames.")
 
     def processRemote(self, nbOfChannels, nbrOfSamplesByChannel, timestamp, buffer):
         if not self.is_listening:
             return
-        rms = get_rms_energy_from_bytes(buffer)
-        # print("[SoundReceiver] RMS Energy:", rms)
-        # Start accumulating if we detect a loud signal
+        samples = np.frombuffer(buffer, dtype=np.int16)
+        event = self.vad.process(samples)
+        # Start accumulating when the VAD detects speech
         if not self.is_accumulating:
-            if rms > self.thresholdRMSEnergy:
+            if event == SPEECH_START:
                 self.is_accumulating = True
                 self.is_accumulating_or_recognizing_speech = True
-                self.accumulated_frames = []
-                self.accumulated_frames.append(buffer)
-                self.lastBelowThresholdTime = None
-        else:
-            # Already accumulating; append the buffer
-            self.accumulated_frames.append(buffer)
-            if rms > self.thresholdRMSEnergy:
-                self.lastBelowThresholdTime = None
+                self.audio_buffer.start()  # keeps ~300 ms of pre-roll
+                self.audio_buffer.append(samples)
+                if self.stt_stream is not None:
+                    self.stt_stream.start(self.audio_buffer.current().copy())
+            else:
+                self.audio_buffer.push_preroll(samples)
+            return
+
+        # Already accumulating; append the buffer
+        has_room = self.audio_buffer.append(samples)
+        if self.stt_stream is not None:
+            self.stt_stream.feed(samples)
+        if event == SILENCE:
+            # VAD rejected the segment as too short to be speech
+            self.is_accumulating = False
+            self.is_accumulating_or_recognizing_speech = False
+            self.audio_buffer.reset()
+            if self.stt_stream is not None:
+                self.stt_stream.cancel()
+        elif event == SPEECH_END or not has_room:
+            # Finalize
+            self.is_accumulating = False
+            if event == SPEECH_END:
+                print(f"[SoundReceiver] End of speech after {self.vad.hangover:.2f}s hangover, queueing for recognition...")
+            else:
+                # The VAD still thinks the speaker is talking; start the next utterance from scratch
+                self.vad.reset()
+                print(f"[SoundReceiver] Buffer full after {len(self.audio_buffer) / SAMPLE_RATE:.1f}s of speech, "
+                      f"queueing for recognition...")
+
+            # Keep listening; a newer utterance replaces this one if it is still waiting
+            recording = self.audio_buffer.finalize()
+            if self.stt_stream is not None:
+                self.stt_stream.end()  # already decoded while speaking
             else:
-                # If below threshold, check timer
-                if self.lastBelowThresholdTime is None:
-                    self.lastBelowThresholdTime = time.time()
-                else:
-                    if time.time() - self.lastBelowThresholdTime >= 2.0:
-                        # Finalize
-                        self.is_accumulating = False
-                        print("[SoundReceiver] Below threshold for 2s, spawning thread...")
-
-                        full_recording = b''.join(self.accumulated_frames)
-                        self.accumulated_frames = []
-                        self.is_listening = False
-                        threading.Thread(
-                            target=self._processSpeechRecognition,
-                            args=(full_recording,)
-                        ).start()
+                self.stt_pool.submit(recording)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Aim calibration for grabGun: a lookup table from (distance, vertical, horizontal)
+aim request to the RShoulderPitch / RElbowRoll joint angles, refitted from
+logged shots.
+
+Usage:
+    python aim_calibration.py fit                       # refit calibration/aim_table.npz from the logged samples
+    python aim_calibration.py fit --bandwidth 1.0 5 5   # distance [m], vertical [deg], horizontal [deg]
+    python aim_calibration.py fit --source-weight llm 0 # leave out the corrections read by the LLM
+    python aim_calibration.py show --distance 3
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+
+AIM_TABLE_PATH = os.path.join("calibration", "aim_table.npz")
+AIM_SAMPLES_PATH = os.path.join("calibration", "aim_samples.jsonl")
+DEFAULT_DISTANCE = 3.0  # meters, used when the distance to the target is unknown
+
+# Grid of the default table
+DISTANCES = np.array([1.0, 3.0, 5.0, 8.0])
+VERTICALS = np.arange(-30.0, 31.0, 5.0)
+HORIZONTALS = np.arange(-30.0, 31.0, 5.0)
+
+# Linear mapping grabGun used before calibration (degrees):
+# RShoulderPitch = -21 - vertical, RElbowRoll = 13 + horizontal
+BASE_SHOULDER_PITCH = -21.0
+BASE_ELBOW_ROLL = 13.0
+# Hand measurements: RElbowRoll 5 m - 12 deg, 3 m - 14 deg; RShoulderPitch (base) 5 m - -10 deg, 3 m - -8 deg
+
+# Weight of a sample in fit() by where its aim error came from (ShotCorrection.source).
+# The LLM reads the crosshair labels only to a few degrees, the detector box center
+# is much closer; samples without a source (measured by hand) count fully.
+SOURCE_WEIGHTS = {"local": 1.0, "llm": 0.2}
+
+
+def _axis_weights(axis, values):
+    """Lower grid index and fraction along one axis; outside the grid the edge cells are extrapolated linearly."""
+    index = np.clip(np.searchsorted(axis, values, side="right") - 1, 0, len(axis) - 2)
+    fraction = (values - axis[index]) / (axis[index + 1] - axis[index])
+    return index, fraction
+
+
+class AimTable(object):
+    """
+    Joint angles (degrees) on a (distance, vertical, horizontal) grid with
+    trilinear interpolation. Stored as a compact .npz (axes + two float32 grids).
+    """
+    def __init__(self, distances, verticals, horizontals, shoulder_pitch, elbow_roll):
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.verticals = np.asarray(verticals, dtype=np.float64)
+        self.horizontals = np.asarray(horizontals, dtype=np.float64)
+        self.shoulder_pitch = np.asarray(shoulder_pitch, dtype=np.float32)
+        self.elbow_roll = np.asarray(elbow_roll, dtype=np.float32)
+        self._grids = np.stack([self.shoulder_pitch, self.elbow_roll], axis=-1)
+
+    @classmethod
+    def default(cls):
+        """Table that reproduces the uncalibrated linear mapping at every distance."""
+        d, v, h = np.meshgrid(DISTANCES, VERTICALS, HORIZONTALS, indexing="ij")
+        return cls(DISTANCES, VERTICALS, HORIZONTALS, BASE_SHOULDER_PITCH - v, BASE_ELBOW_ROLL + h)
+
+    @classmethod
+    def load(cls, path=AIM_TABLE_PATH):
+        with np.load(path) as data:
+            return cls(data["distances"], data["verticals"], data["horizontals"],
+                       data["shoulder_pitch"], data["elbow_roll"])
+
+    def save(self, path=AIM_TABLE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, distances=self.distances, verticals=self.verticals,
+                            horizontals=self.horizontals, shoulder_pitch=self.shoulder_pitch,
+                            elbow_roll=self.elbow_roll)
+
+    def lookup(self, distance, vertical, horizontal):
+        """
+        Interpolated (shoulder_pitch, elbow_roll) in degrees. Arguments may be
+        scalars or arrays of the same shape; the result has that shape.
+        """
+        distance, vertical, horizontal = np.broadcast_arrays(
+            np.asarray(distance, dtype=np.float64), np.asarray(vertical, dtype=np.float64),
+            np.asarray(horizontal, dtype=np.float64))
+        i, fi = _axis_weights(self.distances, distance.ravel())
+        j, fj = _axis_weights(self.verticals, vertical.ravel())
+        k, fk = _axis_weights(self.horizontals, horizontal.ravel())
+        result = np.zeros((len(i), 2))
+        for di, wi in ((0, 1 - fi), (1, fi)):
+            for dj, wj in ((0, 1 - fj), (1, fj)):
+                for dk, wk in ((0, 1 - fk), (1, fk)):
+                    result += (wi * wj * wk)[:, None] * self._grids[i + di, j + dj, k + dk]
+        shape = distance.shape
+        return result[:, 0].reshape(shape), result[:, 1].reshape(shape)
+
+    def fit(self, samples, bandwidth=(1.5, 8.0, 8.0), prior=0.1, source_weights=SOURCE_WEIGHTS):
+        """
+        Returns a new table corrected by logged samples.
+
+        A sample says that the joint angles it used actually aim at
+        (vertical + error_vertical, horizontal + error_horizontal). Each grid
+        node moves by the Gaussian-weighted mean of the residuals between those
+        joint angles and the current table at the effective aim; `prior` is the
+        weight of "no change", so nodes far from any sample stay as they are.
+        The Gaussian weight of a sample is scaled by `source_weights` of its
+        source (1 for sources not listed); 0 leaves the sample out.
+        """
+        scale = np.array([source_weights.get(s.get("source"), 1.0) for s in samples], dtype=np.float64)
+        samples = [s for s, w in zip(samples, scale) if w > 0]
+        scale = scale[scale > 0]
+        if not samples:
+            return self
+        distance = np.array([s.get("distance") or DEFAULT_DISTANCE for s in samples], dtype=np.float64)
+        vertical = np.array([s["vertical"] + s["error_vertical"] for s in samples], dtype=np.float64)
+        horizontal = np.array([s["horizontal"] + s["error_horizontal"] for s in samples], dtype=np.float64)
+        observed = np.array([[s["shoulder_pitch"], s["elbow_roll"]] for s in samples], dtype=np.float64)
+        residuals = observed - np.stack(self.lookup(distance, vertical, horizontal), axis=-1)
+
+        d, v, h = np.meshgrid(self.distances, self.verticals, self.horizontals, indexing="ij")
+        nodes = np.stack([d.ravel(), v.ravel(), h.ravel()], axis=-1)
+        points = np.stack([distance, vertical, horizontal], axis=-1)
+        scaled = (nodes[:, None, :] - points[None, :, :]) / np.asarray(bandwidth)
+        weights = np.exp(-0.5 * (scaled ** 2).sum(axis=-1)) * scale  # (nodes, samples)
+        correction = weights @ residuals / (weights.sum(axis=1) + prior)[:, None]
+        grids = self._grids.reshape(-1, 2) + correction
+        shape = self.shoulder_pitch.shape
+        return AimTable(self.distances, self.verticals, self.horizontals,
+                        grids[:, 0].reshape(shape), grids[:, 1].reshape(shape))
+
+
+_table = None
+_table_mtime = None
+
+
+def get_table(path=AIM_TABLE_PATH):
+    """The calibrated table, reloaded when the file changes; the default one if there is none."""
+    global _table, _table_mtime
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    if _table is None or mtime != _table_mtime:
+        _table = AimTable.load(path) if mtime is not None else AimTable.default()
+        _table_mtime = mtime
+        print(f"[AIM] using {'calibrated table ' + path if mtime is not None else 'default aim table'}")
+    return _table
+
+
+def aim_joint_angles(vertical, horizontal, distance=None):
+    """(RShoulderPitch, RElbowRoll) in degrees for an aim request."""
+    shoulder_pitch, elbow_roll = get_table().lookup(DEFAULT_DISTANCE if distance is None else distance,
+                                                    vertical, horizontal)
+    return float(shoulder_pitch), float(elbow_roll)
+
+
+def record_sample(vertical, horizontal, shoulder_pitch, elbow_roll, error_vertical, error_horizontal,
+                  distance=None, source=None, path=AIM_SAMPLES_PATH):
+    """
+    Appends one calibration sample: the requested aim (degrees), the joint
+    angles used for it and the observed aim error, i.e. where the gun pointed
+    (or the shot landed) relative to the target, + = up / left. A target seen at
+    (v, h) from the gun camera crosshair is an error of (-v, -h).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    sample = {"time": time.time(), "distance": distance, "vertical": vertical, "horizontal": horizontal,
+              "shoulder_pitch": shoulder_pitch, "elbow_roll": elbow_roll,
+              "error_vertical": error_vertical, "error_horizontal": error_horizontal, "source": source}
+    with open(path, "a") as f:
+        f.write(json.dumps(sample) + "\n")
+
+
+def load_samples(path=AIM_SAMPLES_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _sample_errors(table, samples):
+    """RMS difference between the joint angles of the samples and the table at their effective aim."""
+    distance = np.array([s.get("distance") or DEFAULT_DISTANCE for s in samples])
+    vertical = np.array([s["vertical"] + s["error_vertical"] for s in samples])
+    horizontal = np.array([s["horizontal"] + s["error_horizontal"] for s in samples])
+    pitch, roll = table.lookup(distance, vertical, horizontal)
+    observed = np.array([[s["shoulder_pitch"], s["elbow_roll"]] for s in samples])
+    return float(np.sqrt(np.mean((observed - np.stack([pitch, roll], axis=-1)) ** 2)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fit_parser = subparsers.add_parser("fit", help="refit the table from logged samples")
+    fit_parser.add_argument("--samples", default=AIM_SAMPLES_PATH)
+    fit_parser.add_argument("--table", default=AIM_TABLE_PATH, help="table to refine and overwrite")
+    fit_parser.add_argument("--from-default", action="store_true", help="start from the default table")
+    fit_parser.add_argument("--bandwidth", type=float, nargs=3, default=(1.5, 8.0, 8.0))
+    fit_parser.add_argument("--prior", type=float, default=0.1)
+    fit_parser.add_argument("--source-weight", nargs=2, action="append", default=[], metavar=("SOURCE", "WEIGHT"),
+                            help=f"weight of the samples from SOURCE (default {SOURCE_WEIGHTS}), 0 leaves them out")
+    show_parser = subparsers.add_parser("show", help="print the table at one distance")
+    show_parser.add_argument("--table", default=AIM_TABLE_PATH)
+    show_parser.add_argument("--distance", type=float, default=DEFAULT_DISTANCE)
+    args = parser.parse_args()
+
+    exists = os.path.exists(args.table)
+    table = AimTable.load(args.table) if exists and not getattr(args, "from_default", False) else AimTable.default()
+    if args.command == "fit":
+        samples = load_samples(args.samples)
+        if not samples:
+            print(f"No samples in {args.samples}")
+            return
+        source_weights = dict(SOURCE_WEIGHTS, **{source: float(weight) for source, weight in args.source_weight})
+        fitted = table.fit(samples, tuple(args.bandwidth), args.prior, source_weights)
+        used = [s for s in samples if source_weights.get(s.get("source"), 1.0) > 0]
+        if not used:
+            print(f"No samples left after weighting by source {source_weights}")
+            return
+        before = _sample_errors(table, used)
+        after = _sample_errors(fitted, used)
+        fitted.save(args.table)
+        counts = {}
+        for sample in used:
+            counts[sample.get("source")] = counts.get(sample.get("source"), 0) + 1
+        print(f"Fitted {len(used)} samples {counts} -> {args.table}: "
+              f"RMS joint error {before:.2f} -> {after:.2f} deg")
+    else:
+        verticals, horizontals = np.meshgrid(table.verticals, table.horizontals, indexing="ij")
+        pitch, roll = table.lookup(args.distance, verticals, horizontals)
+        print(f"Distance {args.distance} m, rows = vertical, columns = horizontal")
+        print("horizontal " + " ".join(f"{h:>11.0f}" for h in table.horizontals))
+        for row, v in enumerate(table.verticals):
+            print(f"{v:>10.0f} " + " ".join(f"{p:>5.1f}/{r:<5.1f}" for p, r in zip(pitch[row], roll[row])))
+
+
+if __name__ == "__main__":
+    main()
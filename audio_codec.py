@@ -0,0 +1,117 @@
+import io
+import wave
+from math import gcd
+from functools import lru_cache
+import numpy as np
+
+
+# --- Resampling ---
+
+@lru_cache(maxsize=8)
+def _polyphase_filter(up, down, half_taps=10, beta=8.0):
+    """
+    Designs the anti-aliasing low-pass for `up`/`down` and splits it into
+    `up` phases (reversed, so a plain dot product with a sample window applies it).
+    """
+    factor = max(up, down)
+    half_len = half_taps * factor
+    n = np.arange(-half_len, half_len + 1)
+    cutoff = 1.0 / factor  # relative to the Nyquist rate of the upsampled signal
+    h = cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), beta) * up
+
+    taps_per_phase = -(-len(h) // up)
+    padded = np.zeros(taps_per_phase * up)
+    padded[:len(h)] = h
+    phases = padded.reshape(taps_per_phase, up).T  # phases[p, j] = h[p + j * up]
+    return np.ascontiguousarray(phases[:, ::-1], dtype=np.float32), half_len
+
+
+def resample_poly(samples, up, down, block=8192):
+    """
+    Resamples int16 (or float) audio by `up`/`down` with a polyphase FIR filter.
+
+    Only the output samples are computed: every output is one dot product of a
+    sliding window over the input with the filter phase it falls on. Blocks of
+    outputs are processed at once to keep the window matrix small.
+
+    Returns:
+        An int16 array of ceil(len(samples) * up / down) samples.
+    """
+    divisor = gcd(up, down)
+    up, down = up // divisor, down // divisor
+    samples = np.asarray(samples)
+    if up == down:
+        return samples.astype(np.int16, copy=False)
+
+    phases, half_len = _polyphase_filter(up, down)
+    taps = phases.shape[1]
+    n_out = -(-len(samples) * up // down)
+
+    # Zero padding so every window index stays inside the signal
+    padded = np.zeros(len(samples) + 2 * taps + half_len // up + 2, dtype=np.float32)
+    padded[taps - 1:taps - 1 + len(samples)] = samples
+    windows = np.lib.stride_tricks.sliding_window_view(padded, taps)
+
+    out = np.empty(n_out, dtype=np.float32)
+    for start in range(0, n_out, block):
+        t = np.arange(start, min(start + block, n_out)) * down + half_len
+        out[start:start + len(t)] = np.einsum("ij,ij->i", windows[t // up], phases[t % up])
+    return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+
+def resample(samples, from_rate, to_rate):
+    """
+    Resamples audio from `from_rate` to `to_rate` Hz.
+    """
+    return resample_poly(samples, to_rate, from_rate)
+
+
+# --- Payload encoding ---
+
+CONTENT_TYPES = {
+    "wav": "audio/wav",
+    "flac": "audio/x-flac; rate={rate}",
+    "opus": "audio/ogg; codecs=opus",
+    "l16": "audio/l16; rate={rate}",
+}
+
+
+def encode_payload(samples, sample_rate, codec="flac"):
+    """
+    Encodes mono int16 audio for upload.
+
+    FLAC and Opus go through soundfile (libsndfile) when it is installed; FLAC
+    falls back to the flac binary bundled with speech_recognition.
+
+    Returns:
+        (payload bytes, content type header value)
+    """
+    samples = np.ascontiguousarray(samples, dtype=np.int16)
+    content_type = CONTENT_TYPES[codec].format(rate=sample_rate)
+
+    if codec == "l16":
+        return samples.byteswap().tobytes(), content_type  # big-endian raw PCM
+    if codec == "wav":
+        byte_buffer = io.BytesIO()
+        with wave.open(byte_buffer, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(sample_rate)
+            wf.writeframes(samples.tobytes())
+        return byte_buffer.getvalue(), content_type
+
+    try:
+        import soundfile as sf
+    except ImportError:
+        if codec != "flac":
+            raise RuntimeError(f"Encoding to {codec} needs the soundfile package")
+        import speech_recognition as sr
+        return sr.AudioData(samples.tobytes(), sample_rate, 2).get_flac_data(), content_type
+
+    byte_buffer = io.BytesIO()
+    if codec == "flac":
+        sf.write(byte_buffer, samples, sample_rate, format="FLAC", subtype="PCM_16")
+    else:
+        # Opus only runs at 8, 12, 16, 24 or 48 kHz
+        sf.write(byte_buffer, samples, sample_rate, format="OGG", subtype="OPUS")
+    return byte_buffer.getvalue(), content_type
@@ -0,0 +1,100 @@
+"""
+Aim calibration table: parity of the default table with the old linear grabGun
+mapping (exit status 1 if it differs), lookup latency, and how well a fit from
+logged shots recovers a distance-dependent arm. The synthetic "true" arm follows
+the hand measurements in motion.py (RElbowRoll 14 deg at 3 m, 12 deg at 5 m;
+RShoulderPitch base -8 deg at 3 m, -10 deg at 5 m); the shots are aimed with the
+default table and the logged error is the true aim minus the requested one plus noise.
+A share of the shots (--llm-share) was corrected by the LLM, with more noise
+(--llm-noise); the fit weighted by sample source (aim_calibration.SOURCE_WEIGHTS)
+must not aim worse than one that weights every sample the same (exit status 1).
+
+Usage:
+    python benchmarks/aim_lookup.py --shots 200 --noise 0.5 --llm-share 0.5 --llm-noise 4
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+from aim_calibration import AimTable, SOURCE_WEIGHTS
+
+
+def true_aim(distance, shoulder_pitch, elbow_roll):
+    """Where a synthetic arm with distance-dependent offsets actually aims (vertical, horizontal)."""
+    pitch_base = -8 - (distance - 3) * 1.0   # -8 at 3 m, -10 at 5 m
+    roll_base = 14 - (distance - 3) * 1.0    # 14 at 3 m, 12 at 5 m
+    return pitch_base - shoulder_pitch, elbow_roll - roll_base
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shots", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5, help="degrees of observation noise")
+    parser.add_argument("--llm-share", type=float, default=0.5, help="share of shots corrected by the LLM")
+    parser.add_argument("--llm-noise", type=float, default=4.0, help="degrees of noise of the LLM corrections")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    table = AimTable.default()
+
+    # Parity with -21 - v / 13 + h, also outside the grid (linear extrapolation)
+    d = rng.uniform(0.5, 10, 10000)
+    v = rng.uniform(-45, 45, 10000)
+    h = rng.uniform(-45, 45, 10000)
+    pitch, roll = table.lookup(d, v, h)
+    error = max(np.abs(pitch - (-21 - v)).max(), np.abs(roll - (13 + h)).max())
+    print(f"default table vs linear mapping: max difference {error:.2e} deg")
+
+    started = time.perf_counter()
+    for i in range(1000):
+        table.lookup(d[i], v[i], h[i])
+    single = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    table.lookup(d, v, h)
+    batch = (time.perf_counter() - started) * 1000
+    print(f"lookup: {single:.3f} us per single call, {batch / 10:.3f} us per aim in a batch of 10000")
+
+    # Logged shots aimed with the default table
+    d = rng.uniform(2, 6, args.shots)
+    v = rng.uniform(-20, 20, args.shots)
+    h = rng.uniform(-20, 20, args.shots)
+    pitch, roll = table.lookup(d, v, h)
+    aimed_v, aimed_h = true_aim(d, pitch, roll)
+    sources = np.where(rng.uniform(size=args.shots) < args.llm_share, "llm", "local")
+    noise = np.where(sources == "llm", args.llm_noise, args.noise)
+    samples = [{"distance": d[i], "vertical": v[i], "horizontal": h[i],
+                "shoulder_pitch": pitch[i], "elbow_roll": roll[i],
+                "error_vertical": aimed_v[i] - v[i] + rng.normal(0, noise[i]),
+                "error_horizontal": aimed_h[i] - h[i] + rng.normal(0, noise[i]),
+                "source": str(sources[i])} for i in range(args.shots)]
+    print(f"{args.shots} logged shots, {np.count_nonzero(sources == 'llm')} corrected by the LLM")
+    equal = table.fit(samples, source_weights={})
+    fitted = table.fit(samples)
+
+    # Aim error on new targets with each table
+    d = rng.uniform(2.5, 5.5, 2000)
+    v = rng.uniform(-15, 15, 2000)
+    h = rng.uniform(-15, 15, 2000)
+    rms = {}
+    for label, candidate in (("default", table), ("fitted, equal weights", equal),
+                             (f"fitted, weights {SOURCE_WEIGHTS}", fitted)):
+        aimed_v, aimed_h = true_aim(d, *candidate.lookup(d, v, h))
+        rms[label] = np.sqrt(np.mean((aimed_v - v) ** 2 + (aimed_h - h) ** 2))
+        print(f"{label} table: RMS aim error {rms[label]:.2f} deg on new targets")
+
+    failed = False
+    if error > 1e-4:
+        print("FAIL: default table differs from the linear mapping")
+        failed = True
+    if rms[f"fitted, weights {SOURCE_WEIGHTS}"] > rms["fitted, equal weights"]:
+        print("FAIL: weighting by source made the fit worse")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Transfer size and end-to-end capture latency of take_picture for BGR and
+YUV422 subscriptions. A stand-in ALVideoDevice serves recorded frames (the
+pictures in images/, scaled to the camera resolution) and sleeps for the time
+the frame would take over a link of --mbps megabits per second.
+
+Usage:
+    python benchmarks/camera_colorspace.py --resolution 3 --mbps 40 --frames 20
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+from camera import take_picture, COLORSPACE_BGR, COLORSPACE_YUV422
+
+RESOLUTIONS = {1: (320, 240), 2: (640, 480), 3: (1280, 960)}
+
+
+def bgr_to_yuyv(image):
+    """Packs a BGR image as YUV422 (Y0 U Y1 V), like ALVideoDevice sends it."""
+    if hasattr(cv2, "COLOR_BGR2YUV_YUYV"):
+        return cv2.cvtColor(image, cv2.COLOR_BGR2YUV_YUYV)
+    yuv = cv2.cvtColor(image, cv2.COLOR_BGR2YUV).astype(np.uint16)
+    packed = np.empty(image.shape[:2] + (2,), dtype=np.uint8)
+    packed[..., 0] = yuv[..., 0]
+    packed[:, 0::2, 1] = (yuv[:, 0::2, 1] + yuv[:, 1::2, 1]) // 2
+    packed[:, 1::2, 1] = (yuv[:, 0::2, 2] + yuv[:, 1::2, 2]) // 2
+    return packed
+
+
+class RecordedVideoService(object):
+    """ALVideoDevice stand-in cycling through recorded frames over a simulated link."""
+    def __init__(self, images, colorspace, mbps):
+        self.frames = []
+        for image in images:
+            height, width = image.shape[:2]
+            data = bgr_to_yuyv(image) if colorspace == COLORSPACE_YUV422 else image
+            self.frames.append([width, height, data.shape[2], colorspace, 0, 0, data.tobytes()])
+        self.bytes_per_second = mbps * 1e6 / 8
+        self.bytes_sent = 0
+        self._index = 0
+
+    def getImageRemote(self, handle):
+        frame = self.frames[self._index % len(self.frames)]
+        self._index += 1
+        self.bytes_sent += len(frame[6])
+        time.sleep(len(frame[6]) / self.bytes_per_second)
+        return frame
+
+
+def load_images(width, height):
+    images = []
+    for path in sorted((parent_dir / "images").iterdir()):
+        image = cv2.imread(str(path))
+        if image is not None:
+            images.append(cv2.resize(image, (width, height)))
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolution", type=int, default=3, choices=sorted(RESOLUTIONS))
+    parser.add_argument("--mbps", type=float, default=40.0, help="simulated Wi-Fi throughput")
+    parser.add_argument("--frames", type=int, default=20)
+    args = parser.parse_args()
+
+    width, height = RESOLUTIONS[args.resolution]
+    images = load_images(width, height)
+    print(f"{width}x{height}, {len(images)} recorded frames, {args.mbps:.0f} Mbit/s")
+    print(f"{'colorspace':>10} {'KB/frame':>9} {'latency [ms]':>13} {'decode [ms]':>12} {'color error':>12}")
+    for name, colorspace in (("BGR", COLORSPACE_BGR), ("YUV422", COLORSPACE_YUV422)):
+        video_service = RecordedVideoService(images, colorspace, args.mbps)
+        transfer = 0.0
+        start = time.perf_counter()
+        error = 0.0
+        for i in range(args.frames):
+            image = take_picture(video_service, name, reuse_buffer=True)
+            transfer += len(video_service.frames[i % len(images)][6]) / video_service.bytes_per_second
+            if i < len(images):
+                # compare away from the grid at the bottom
+                error += np.abs(image[:height // 2].astype(np.int16) - images[i][:height // 2]).mean() / len(images)
+        elapsed = (time.perf_counter() - start) / args.frames
+        decode = elapsed - transfer / args.frames
+        print(f"{name:>10} {video_service.bytes_sent / args.frames / 1024:>9.0f} {elapsed * 1000:>13.1f} "
+              f"{decode * 1000:>12.2f} {error:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Counts the memory allocated per frame by take_picture for RGB and BGR
+subscriptions, with and without the reusable per-subscription buffer, using a
+stand-in ALVideoDevice that serves the same frame bytes every time (like the
+bytes object a qi call returns).
+
+Usage:
+    python benchmarks/camera_decode_alloc.py --resolution 3 --frames 50
+"""
+import sys
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+from camera import take_picture, COLORSPACE_RGB, COLORSPACE_BGR
+
+# ALVideoDevice resolution index -> (width, height)
+RESOLUTIONS = {1: (320, 240), 2: (640, 480), 3: (1280, 960)}
+
+
+class FakeVideoService(object):
+    """ALVideoDevice stand-in returning a prebuilt getImageRemote result."""
+    def __init__(self, width, height, colorspace):
+        data = np.random.default_rng(0).integers(0, 256, width * height * 3, dtype=np.uint8).tobytes()
+        self.frame = [width, height, 3, colorspace, 0, 0, data]
+
+    def getImageRemote(self, handle):
+        return self.frame
+
+
+def measure(video_service, handle, reuse_buffer, frames):
+    """Returns (MB allocated per frame, ms per frame)."""
+    take_picture(video_service, handle, reuse_buffer=reuse_buffer)  # warm up caches and buffers
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    allocated = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        image = take_picture(video_service, handle, reuse_buffer=reuse_buffer)
+        allocated += tracemalloc.get_traced_memory()[1] - before
+        del image
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return allocated / frames / 1e6, elapsed / frames * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolution", type=int, default=3, choices=sorted(RESOLUTIONS))
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    width, height = RESOLUTIONS[args.resolution]
+    frame_mb = width * height * 3 / 1e6
+    print(f"{width}x{height}, one frame = {frame_mb:.2f} MB")
+    print(f"{'colorspace':>10} {'reuse':>6} {'MB/frame':>9} {'frames':>7} {'ms/frame':>9}")
+    for name, colorspace in (("RGB", COLORSPACE_RGB), ("BGR", COLORSPACE_BGR)):
+        video_service = FakeVideoService(width, height, colorspace)
+        for reuse_buffer in (False, True):
+            handle = f"{name}-{reuse_buffer}"
+            mb, ms = measure(video_service, handle, reuse_buffer, args.frames)
+            print(f"{name:>10} {str(reuse_buffer):>6} {mb:>9.2f} {mb / frame_mb:>7.2f} {ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
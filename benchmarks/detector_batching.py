@@ -0,0 +1,58 @@
+"""
+CPU throughput of the resident bottle detector at batch sizes 1, 5 and 16,
+against the old per-frame path that constructed YOLO("yolov8n.pt") for every
+frame. Frames are the pictures in images/ scaled to 1280x960.
+
+Usage:
+    python benchmarks/detector_batching.py --frames 32
+    python benchmarks/detector_batching.py --weights yolov8n.yaml   # offline: same network, random weights
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import cv2
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "vla_and_vision"))
+from bottle_detector import BottleDetector
+from ultralytics import YOLO
+
+
+def load_frames(count, width=1280, height=960):
+    images = [cv2.imread(str(path)) for path in sorted((parent_dir / "images").iterdir())]
+    images = [cv2.resize(image, (width, height)) for image in images if image is not None]
+    return [images[i % len(images)] for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--reload-frames", type=int, default=3, help="frames for the old reload-per-frame path")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames)
+
+    started = time.perf_counter()
+    for frame in frames[:args.reload_frames]:
+        YOLO(args.weights)(frame, verbose=False)
+    old = args.reload_frames / (time.perf_counter() - started)
+    print(f"reload per frame: {old:.2f} frames/s")
+
+    detector = BottleDetector(args.weights)
+    for batch_size in (1, 5, 16):
+        started = time.perf_counter()
+        results = detector.detect_batch(frames, batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+        stages = {key: sum(r.timings[key] for r in results) / len(results)
+                  for key in ("preprocess", "inference", "postprocess")}
+        print(f"batch {batch_size:>2}: {len(frames) / elapsed:.2f} frames/s "
+              f"(per frame: preprocess {stages['preprocess']:.1f} ms, inference {stages['inference']:.1f} ms, "
+              f"postprocess {stages['postprocess']:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
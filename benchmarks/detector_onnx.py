@@ -0,0 +1,120 @@
+"""
+Parity and CPU latency of the ONNX Runtime bottle detector against the
+ultralytics (PyTorch) one. Both run on the pictures in images/ scaled to
+1280x960; for every frame the detections and the bottle chosen by
+select_best_bottle() must match (same class, IoU >= --min-iou, confidence
+within --conf-tolerance). Exits with status 1 when they do not.
+
+The ONNX model is exported from --weights unless --onnx is given; --int8 also
+builds a statically quantized copy (calibrated on the same pictures) and reports
+its latency and how many chosen bottles still match.
+
+Usage:
+    python benchmarks/detector_onnx.py --weights yolov8n.pt --int8
+    python benchmarks/detector_onnx.py --weights yolov8n_rand.pt --conf 0.001   # offline: random weights
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import cv2
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "vla_and_vision"))
+from bottle_detector import (BOTTLE_CLASS_ID, BottleDetector, OnnxBottleDetector, export_onnx,
+                             quantize_onnx, select_best_bottle)
+
+
+def load_frames(width=1280, height=960):
+    images = [cv2.imread(str(path)) for path in sorted((parent_dir / "images").iterdir())]
+    return [cv2.resize(image, (width, height)) for image in images if image is not None]
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union else 1.0
+
+
+def matched(reference, candidate, min_iou, conf_tolerance):
+    """Number of reference detections with a counterpart in candidate (greedy, same class)."""
+    free = list(candidate)
+    count = 0
+    for detection in sorted(reference, key=lambda d: -d.confidence):
+        for other in free:
+            if (other.class_id == detection.class_id and iou(detection.box, other.box) >= min_iou
+                    and abs(other.confidence - detection.confidence) <= conf_tolerance):
+                free.remove(other)
+                count += 1
+                break
+    return count
+
+
+def same_bottle(a, b, min_iou):
+    return (a is None and b is None) or (a is not None and b is not None and iou(a, b) >= min_iou)
+
+
+def latency(detector, frames, repeats):
+    """Median ms per single-frame detect() call."""
+    times = []
+    for _ in range(repeats):
+        for frame in frames:
+            started = time.perf_counter()
+            detector.detect(frame)
+            times.append((time.perf_counter() - started) * 1000)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--onnx", help="already exported model (default: export --weights)")
+    parser.add_argument("--int8", action="store_true", help="also quantize and measure an INT8 model")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime intra-op threads")
+    parser.add_argument("--min-iou", type=float, default=0.9)
+    parser.add_argument("--conf-tolerance", type=float, default=0.02)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    frames = load_frames()
+    onnx_path = args.onnx or export_onnx(args.weights)
+
+    torch_detector = BottleDetector(args.weights, conf=args.conf)
+    onnx_detector = OnnxBottleDetector(onnx_path, conf=args.conf, threads=args.threads)
+    detectors = [("ultralytics", torch_detector), ("onnxruntime", onnx_detector)]
+    if args.int8:
+        int8_path = quantize_onnx(onnx_path, calibration_frames=frames)
+        detectors.append(("onnxruntime int8", OnnxBottleDetector(int8_path, conf=args.conf, threads=args.threads)))
+
+    reference = [torch_detector.detect(frame).detections for frame in frames]
+    ok = True
+    for label, detector in detectors[1:]:
+        results = [detector.detect(frame).detections for frame in frames]
+        total = sum(len(r) for r in reference)
+        found = sum(matched(r, c, args.min_iou, args.conf_tolerance) for r, c in zip(reference, results))
+        bottles = sum(same_bottle(select_best_bottle(r, args.conf), select_best_bottle(c, args.conf), args.min_iou)
+                      for r, c in zip(reference, results))
+        candidates = sum(1 for r in reference for d in r if d.class_id == BOTTLE_CLASS_ID)
+        print(f"{label}: {found}/{total} detections matched, chosen bottle equal in {bottles}/{len(frames)} frames "
+              f"({candidates} bottle detections in the reference)")
+        # INT8 is allowed to drift; FP32 must reproduce the reference
+        if "int8" not in label and (found != total or bottles != len(frames)
+                                    or sum(len(r) for r in results) != total):
+            ok = False
+
+    for label, detector in detectors:
+        print(f"{label}: {latency(detector, frames, args.repeats):.1f} ms per frame (median)")
+
+    if not ok:
+        print("FAIL: ONNX Runtime detections differ from ultralytics")
+        sys.exit(1)
+    print("OK: ONNX Runtime matches ultralytics")
+
+
+if __name__ == "__main__":
+    main()
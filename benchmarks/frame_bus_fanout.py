@@ -0,0 +1,96 @@
+"""
+Throughput and latency of frame_bus with 1, 2 and 4 consumer processes. The
+publisher writes 1280x960 BGR frames at --fps; every consumer reads each new
+frame zero-copy, touches it (--work ms of simulated processing), and checks
+that the slot was not overwritten meanwhile. Reports the publisher's cost per
+frame and for each consumer the frames read, skipped and the publish-to-read
+latency.
+
+Usage:
+    python benchmarks/frame_bus_fanout.py --fps 30 --seconds 3 --work 5
+"""
+import sys
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+from frame_bus import FrameBus, FrameBusReader
+
+BUS_NAME = "pepper_frames_bench"
+
+
+def consumer(name, work, stop, results):
+    reader = FrameBusReader(name)
+    latencies = []
+    torn = 0
+    while not stop.is_set():
+        sequence, timestamp, view = reader.read(timeout=0.1)
+        if view is None:
+            continue
+        latencies.append(time.time() - timestamp)
+        view[::64, ::64].mean()  # touch the frame without copying it
+        if work:
+            time.sleep(work / 1000)
+        if not reader.valid(sequence):
+            torn += 1
+    results.put((reader.frames_read, reader.frames_skipped, torn, latencies))
+    del view
+    reader.close()
+
+
+def run(consumers, fps, seconds, work):
+    bus = FrameBus(BUS_NAME, slots=4, max_shape=(960, 1280, 3))
+    frames = [np.full((960, 1280, 3), i, dtype=np.uint8) for i in range(4)]
+    stop = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=consumer, args=(BUS_NAME, work, stop, results))
+                 for _ in range(consumers)]
+    for process in processes:
+        process.start()
+    time.sleep(0.5)  # let the readers attach
+
+    publish_times = []
+    period = 1.0 / fps
+    next_frame = time.monotonic()
+    end = next_frame + seconds
+    i = 0
+    while time.monotonic() < end:
+        started = time.perf_counter()
+        bus.publish(frames[i % len(frames)])
+        publish_times.append(time.perf_counter() - started)
+        i += 1
+        next_frame += period
+        time.sleep(max(0.0, next_frame - time.monotonic()))
+    time.sleep(0.2)
+    stop.set()
+    stats = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    bus.close()
+
+    published = len(publish_times)
+    print(f"{consumers} consumer(s): published {published} frames ({published / seconds:.1f} fps), "
+          f"publish {np.mean(publish_times) * 1000:.2f} ms/frame")
+    for n, (read, skipped, torn, latencies) in enumerate(stats):
+        latencies = np.array(latencies) * 1000
+        print(f"    consumer {n}: read {read} ({read / seconds:.1f} fps), skipped {skipped}, torn {torn}, "
+              f"latency mean {latencies.mean():.2f} ms, p95 {np.percentile(latencies, 95):.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--work", type=float, default=5.0, help="simulated processing per frame in ms")
+    args = parser.parse_args()
+    for consumers in (1, 2, 4):
+        run(consumers, args.fps, args.seconds, args.work)
+
+
+if __name__ == "__main__":
+    main()
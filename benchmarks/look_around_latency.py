@@ -0,0 +1,128 @@
+"""
+Total latency of the look_around sweep: the old serial version (blocking
+turnHead, fixed 0.2 s sleep, capture, encode) against the pipelined sweep_head
+with encoding on the ImageShaper pool. Uses a stand-in ALMotion that moves the
+head at a fixed yaw speed and a stand-in ALVideoDevice that captures at a fixed
+frame rate.
+
+Usage:
+    python benchmarks/look_around_latency.py --runs 3 --speed 300 --fps 15
+"""
+import sys
+import time
+import argparse
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+from camera import take_picture, sweep_head, COLORSPACE_BGR
+from image_shaper import ImageShaper
+from motion import turnHead
+
+OLD_ANGLES = [-120, -60, 0, 120, 60]
+DEG_TO_RAD = 0.017453
+
+
+class FakeFuture(object):
+    def __init__(self, thread):
+        self._thread = thread
+
+    def value(self):
+        self._thread.join()
+
+
+class FakeMotion(object):
+    """ALMotion stand-in: the head turns at `speed` deg/s, plus a settle time at the end."""
+    def __init__(self, speed, settle=0.05):
+        self.speed = speed
+        self.settle = settle
+        self.yaw = 0.0
+        self._lock = threading.Lock()
+
+    def _move(self, target):
+        with self._lock:
+            start = self.yaw
+        duration = abs(target - start) / self.speed
+        t0 = time.monotonic()
+        while True:
+            progress = min(1.0, (time.monotonic() - t0) / duration) if duration else 1.0
+            with self._lock:
+                self.yaw = start + (target - start) * progress
+            if progress >= 1.0:
+                break
+            time.sleep(0.002)
+        time.sleep(self.settle)
+
+    def angleInterpolationWithSpeed(self, names, angles, speed, _async=False):
+        target = angles[0] / DEG_TO_RAD
+        if not _async:
+            return self._move(target)
+        thread = threading.Thread(target=self._move, args=(target,))
+        thread.start()
+        return FakeFuture(thread)
+
+    def getAngles(self, names, use_sensors):
+        with self._lock:
+            return [self.yaw * DEG_TO_RAD]
+
+
+class FakeVideo(object):
+    """ALVideoDevice stand-in: the newest frame was captured at the last 1/fps tick."""
+    def __init__(self, fps, width=1280, height=960, latency=0.03):
+        self.period = 1.0 / fps
+        self.latency = latency
+        rng = np.random.default_rng(0)
+        small = rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8)
+        self.data = cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR).tobytes()
+        self.width, self.height = width, height
+
+    def getImageRemote(self, handle):
+        now = time.time()
+        captured = now - now % self.period
+        time.sleep(self.latency)
+        return [self.width, self.height, 3, COLORSPACE_BGR, int(captured), int(captured % 1 * 1e6), self.data]
+
+
+def old_look_around(motion, video, shaper):
+    images = []
+    for angle in OLD_ANGLES:
+        turnHead(motion, angle)
+        time.sleep(0.2)  # Wait for head to move
+        image = take_picture(video, "old", center_angle=angle)
+        images.append(shaper.shape(image, name=f"old {angle}"))
+    turnHead(motion, 0)
+    return images
+
+
+def new_look_around(motion, video, shaper):
+    encoded = {}
+    captured = sweep_head(motion, video, "new", OLD_ANGLES,
+                          lambda angle, image: encoded.__setitem__(angle, shaper.submit(image, name=f"new {angle}")))
+    return [encoded[angle].result() for angle in captured]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--speed", type=float, default=300.0, help="head yaw speed in deg/s")
+    parser.add_argument("--fps", type=float, default=15.0)
+    args = parser.parse_args()
+
+    for name, look_around in (("serial", old_look_around), ("pipelined", new_look_around)):
+        motion = FakeMotion(args.speed)
+        video = FakeVideo(args.fps)
+        shaper = ImageShaper()
+        times = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            photos = look_around(motion, video, shaper)
+            times.append(time.perf_counter() - start)
+        print(f"{name:>10}: {len(photos)} photos, mean {sum(times) / len(times):.2f} s, best {min(times):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
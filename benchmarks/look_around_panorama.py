@@ -0,0 +1,86 @@
+"""
+Payload of look_around in "frames" mode (five JPEGs) against "panorama" mode
+(one stitched JPEG), built from the pictures in images/ as head frames. Reports
+bytes, estimated image tokens, local processing time and the upload time over
+--mbps. With --model and OPENROUTER_API_KEY set it also measures the real LLM
+round trip of one question about each payload.
+
+Usage:
+    python benchmarks/look_around_panorama.py --mbps 20
+    python benchmarks/look_around_panorama.py --model google/gemini-2.5-pro --runs 3
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import cv2
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+from camera import compose_panorama, draw_horizontal_angle_grid
+from image_shaper import ImageShaper
+
+ANGLES = [-120, -60, 0, 60, 120]
+PANORAMA_MAX_BYTES = 400_000
+QUESTION = "List the objects you can see and the angle at which each one is."
+
+
+def load_frames(width=1280, height=960):
+    images = [cv2.imread(str(path)) for path in sorted((parent_dir / "images").iterdir())]
+    images = [cv2.resize(image, (width, height)) for image in images if image is not None]
+    return [(angle, images[i % len(images)]) for i, angle in enumerate(ANGLES)]
+
+
+def frames_payload(frames, shaper):
+    gridded = [draw_horizontal_angle_grid(image.copy(), angle) for angle, image in frames]
+    return shaper.shape_many(gridded, names=[f"frame {angle}" for angle, _ in frames])
+
+
+def panorama_payload(frames, shaper):
+    panorama = compose_panorama(frames)
+    return [shaper.shape(panorama, name="panorama", max_bytes=PANORAMA_MAX_BYTES, max_side=panorama.shape[1])]
+
+
+def llm_round_trip(model_name, shaped, runs):
+    from pydantic_ai import Agent
+    from pydantic_ai.models.openai import OpenAIModel
+    from pydantic_ai.providers.openrouter import OpenRouterProvider
+
+    model = OpenAIModel(model_name, provider=OpenRouterProvider(api_key=os.getenv('OPENROUTER_API_KEY')))
+    agent = Agent(model)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        agent.run_sync([QUESTION] + [image.content() for image in shaped])
+        times.append(time.perf_counter() - start)
+    return sum(times) / len(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mbps", type=float, default=20.0, help="uplink to the LLM provider")
+    parser.add_argument("--model", help="OpenRouter model for a real round trip")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = load_frames()
+    shaper = ImageShaper()
+    print(f"{'mode':>9} {'images':>7} {'KB':>6} {'tokens':>7} {'local [ms]':>11} {'upload [ms]':>12} {'LLM [s]':>8}")
+    for mode, build in (("frames", frames_payload), ("panorama", panorama_payload)):
+        start = time.perf_counter()
+        shaped = build(frames, shaper)
+        local = time.perf_counter() - start
+        size = sum(image.size for image in shaped)
+        tokens = sum(image.tokens for image in shaped)
+        upload = size * 8 / (args.mbps * 1e6)
+        llm = "-"
+        if args.model and os.getenv('OPENROUTER_API_KEY'):
+            llm = f"{llm_round_trip(args.model, shaped, args.runs):.2f}"
+        print(f"{mode:>9} {len(shaped):>7} {size / 1024:>6.0f} {tokens:>7} {local * 1000:>11.1f} "
+              f"{upload * 1000:>12.0f} {llm:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Measures the "stop" path with fake NAOqi services: a voice command published
+from an STT thread must cancel the running task (a streaming LLM answer while the
+robot walks), return from stopMove and stopAll, and start lowering the gun within
+the preemption budget. Exits with status 1 if any run is over budget.
+
+Usage:
+    python benchmarks/preemption_latency.py --runs 20 --naoqi-delay 0.02
+"""
+import sys
+import time
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+from command_bus import CommandBus, classify_priority
+from preemption import TaskPreemptor
+
+
+class FakeMotion(object):
+    """ALMotion stand-in: moveTo blocks until stopMove, every call has a network delay."""
+    def __init__(self, delay):
+        self.delay = delay
+        self._stopped = threading.Event()
+        self.lowered = threading.Event()
+
+    def moveTo(self, x, y, theta):
+        time.sleep(self.delay)
+        self._stopped.wait(10)
+
+    def stopMove(self):
+        time.sleep(self.delay)
+        self._stopped.set()
+
+    def angleInterpolationWithSpeed(self, names, angles, speed):
+        time.sleep(self.delay)
+        self.lowered.set()
+        time.sleep(1.0)  # arm travel
+
+
+class FakeTTS(object):
+    def __init__(self, delay):
+        self.delay = delay
+
+    def stopAll(self):
+        time.sleep(self.delay)
+
+
+async def fake_task(motion):
+    """A task that walks on a worker thread while streaming a long answer."""
+    loop = asyncio.get_running_loop()
+    walk = loop.run_in_executor(None, motion.moveTo, 2.0, 0.0, 0.0)
+    for _ in range(1000):
+        await asyncio.sleep(0.01)  # LLM tokens arriving
+    await walk
+
+
+async def run_once(budget, delay):
+    bus = CommandBus()
+    bus.bind()
+    motion, tts = FakeMotion(delay), FakeTTS(delay)
+    preemptor = TaskPreemptor(motion, tts, budget=budget)
+    stopped = []
+    bus.add_preempt_handler(lambda command: stopped.append(preemptor.preempt(command.text)))
+
+    task = asyncio.create_task(fake_task(motion))
+    preemptor.track(task)
+    await asyncio.sleep(0.2)
+
+    published_at = time.monotonic()
+    threading.Thread(target=bus.publish, args=("stop", classify_priority("stop"))).start()
+    await asyncio.wait([task])
+    cancelled_after = time.monotonic() - published_at
+    while not stopped:
+        await asyncio.sleep(0.001)
+    services_after = await asyncio.wrap_future(stopped[0])
+    total = time.monotonic() - published_at
+    return task.cancelled(), cancelled_after, services_after, total, motion.lowered.wait(budget)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stop-command preemption latency with fake NAOqi services")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=0.1, help="Seconds allowed from publish to everything stopped")
+    parser.add_argument("--naoqi-delay", type=float, default=0.02, help="Simulated round trip of every NAOqi call")
+    args = parser.parse_args()
+
+    failures = 0
+    for run in range(args.runs):
+        cancelled, cancel_s, services_s, total_s, lowering = asyncio.run(run_once(args.budget, args.naoqi_delay))
+        ok = cancelled and lowering and total_s <= args.budget
+        failures += not ok
+        print(f"run {run:2d}: task cancelled {cancel_s * 1000:5.1f} ms, stopMove+stopAll {services_s * 1000:5.1f} ms, "
+              f"total {total_s * 1000:5.1f} ms, gun lowering started {lowering} - {'OK' if ok else 'FAIL'}")
+    print(f"{args.runs - failures}/{args.runs} runs within {args.budget * 1000:.0f} ms")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
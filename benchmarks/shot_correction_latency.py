@@ -0,0 +1,78 @@
+"""
+Latency of the shot correction paths: local detection on the gun camera photo
+against the shooter LLM reading the crosshair. The pictures in images/ are used
+as gun camera photos (scaled like the shoot tool does). For every picture the
+local correction, its confidence and time are printed; with --model and
+OPENROUTER_API_KEY set, the LLM fallback is timed on the same pictures.
+
+Usage:
+    python benchmarks/shot_correction_latency.py
+    python benchmarks/shot_correction_latency.py --model google/gemini-2.5-pro
+    python benchmarks/shot_correction_latency.py --weights yolov8n.yaml --min-confidence 0   # offline
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import cv2
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+from camera import draw_gun_camera_crosshair
+from image_shaper import ImageShaper
+from shot_correction import ShotCorrector
+
+GUN_PHOTO_MAX_SIDE = 820
+TARGET = "metal bottle"
+
+
+def llm_correction(model_name, shaper, image):
+    from pydantic import BaseModel
+    from pydantic_ai import Agent
+    from pydantic_ai.models.openai import OpenAIModel
+    from pydantic_ai.providers.openrouter import OpenRouterProvider
+
+    class Corrections(BaseModel):
+        vertical_correction: float
+        horizontal_correction: float
+
+    model = OpenAIModel(model_name, provider=OpenRouterProvider(api_key=os.getenv('OPENROUTER_API_KEY')))
+    content = shaper.shape(draw_gun_camera_crosshair(image.copy()), name="gun camera", quality=90).content()
+    output = Agent(model, output_type=Corrections).run_sync(
+        [f"Analyze the gun camera image to determine shooting corrections for target: {TARGET}. "
+         "Aim in the very middle of the target. vertical_correction: degrees up (positive) or down (negative), "
+         "horizontal_correction: degrees left (positive) or right (negative).", content]).output
+    return output.vertical_correction, output.horizontal_correction
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    parser.add_argument("--model", help="OpenRouter model for the LLM path")
+    args = parser.parse_args()
+
+    shaper = ImageShaper()
+    corrector = ShotCorrector(args.weights, min_confidence=args.min_confidence, preload=False)
+    corrector._load()
+    for path in sorted((parent_dir / "images").iterdir()):
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        image = shaper.fit(image, max_side=GUN_PHOTO_MAX_SIDE)
+        started = time.perf_counter()
+        correction, confidence = corrector.estimate(image, TARGET)
+        elapsed = (time.perf_counter() - started) * 1000
+        local = f"{correction}" if correction else f"no target (best confidence {confidence or 0:.2f}), would ask the LLM"
+        print(f"{path.name:>14} local: {local}, {elapsed:.0f} ms")
+        if args.model and os.getenv('OPENROUTER_API_KEY'):
+            started = time.perf_counter()
+            vertical, horizontal = llm_correction(args.model, shaper, image)
+            print(f"{'':>14} llm:   V={vertical:.1f}, H={horizontal:.1f}, "
+                  f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compares STT upload preparation: the old `[::2]` decimation against the polyphase
+resampler, for every payload codec.
+
+Reports bytes on the wire and encode time per second of audio. With
+--transcripts (JSON {"file.wav": "reference text", ...}) every variant is also
+sent to the Google backend and the word error rate is reported.
+
+Usage:
+    python benchmarks/stt_payload.py recordings/*.wav --transcripts refs.json --language pl-PL
+"""
+import sys
+import json
+import time
+import wave
+import argparse
+import numpy as np
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+from audio_codec import resample, encode_payload
+
+
+SAMPLE_RATE = 16000
+
+
+def read_wav(path):
+    with wave.open(str(path), "rb") as wf:
+        if wf.getframerate() != SAMPLE_RATE or wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16 kHz mono int16")
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    distance = np.arange(len(hyp) + 1)
+    for i, ref_word in enumerate(ref, 1):
+        previous, distance[0] = distance.copy(), i
+        for j, hyp_word in enumerate(hyp, 1):
+            distance[j] = min(previous[j] + 1, distance[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+    return distance[-1] / max(1, len(ref))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="STT payload size / encode time / accuracy benchmark")
+    parser.add_argument("wavs", nargs="+")
+    parser.add_argument("--codecs", default="wav,flac,opus")
+    parser.add_argument("--transcripts", help="JSON with reference text per file name")
+    parser.add_argument("--language", default="pl-PL")
+    args = parser.parse_args()
+
+    references = json.load(open(args.transcripts)) if args.transcripts else {}
+    backend = None
+    if references:
+        from stt_backends import GoogleBackend
+        backend = GoogleBackend(language=args.language)
+
+    variants = {
+        "decimate 8k": lambda x: (np.ascontiguousarray(x[::2]), 8000),
+        "polyphase 8k": lambda x: (resample(x, SAMPLE_RATE, 8000), 8000),
+        "native 16k": lambda x: (x, SAMPLE_RATE),
+    }
+    clips = [(Path(p).name, read_wav(p)) for p in args.wavs]
+    total_seconds = sum(len(x) for _, x in clips) / SAMPLE_RATE
+
+    print(f"{len(clips)} clips, {total_seconds:.1f} s of audio")
+    for variant, prepare in variants.items():
+        for codec in args.codecs.split(","):
+            n_bytes, encode_time, errors = 0, 0.0, []
+            try:
+                for name, samples in clips:
+                    started = time.perf_counter()
+                    pcm, rate = prepare(samples)
+                    payload, content_type = encode_payload(pcm, rate, codec)
+                    encode_time += time.perf_counter() - started
+                    n_bytes += len(payload)
+                    if backend is not None and name in references:
+                        try:
+                            hypothesis = backend.recognize_payload(payload, content_type)
+                        except Exception:
+                            hypothesis = ""
+                        errors.append(word_error_rate(references[name], hypothesis))
+            except RuntimeError as e:
+                print(f"{variant:>13} {codec:>5}: skipped ({e})")
+                continue
+            wer = f" | WER {np.mean(errors) * 100:5.1f}%" if errors else ""
+            print(f"{variant:>13} {codec:>5}: {n_bytes / total_seconds / 1024:7.1f} KiB/s of audio, "
+                  f"encode {encode_time / total_seconds * 1000:6.2f} ms per audio second{wer}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Aiming-loop rate and target stability with and without the bottle tracker.
+
+A synthetic scene has two upright bottles of almost the same height drifting
+across a 1280x960 frame; the detector returns their boxes with pixel jitter and
+costs --detect-ms per call (or the measured latency of --weights on images/).
+The old loop detects every frame and picks the tallest bottle from scratch;
+the tracker detects every --detect-every frames and keeps its target locked.
+Reported: loop rate, detector calls, how often the chosen bottle changed, and the
+mean distance of the aimed center from the true center of the chosen bottle.
+
+Usage:
+    python benchmarks/tracker_loop.py --frames 300
+    python benchmarks/tracker_loop.py --weights yolov8n.onnx --detect-every 5
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "vla_and_vision"))
+from bottle_detector import BOTTLE_CLASS_ID, Detection, DetectionResult, get_detector, select_best_bottle
+from tracker import BottleTracker, iou_matrix
+
+FRAME_SHAPE = (960, 1280, 3)
+
+
+class SyntheticScene(object):
+    """Two bottles moving with constant velocity; detections jitter by a few pixels."""
+    def __init__(self, detect_ms, jitter=6.0, seed=0):
+        self.detect_ms = detect_ms
+        self.jitter = jitter
+        self.random = np.random.default_rng(seed)
+        self.frame = 0
+        self.calls = 0
+
+    def truth(self):
+        t = self.frame
+        return [(300 + 2.0 * t, 300, 380 + 2.0 * t, 560),     # bottle 0
+                (800 - 1.5 * t, 310, 878 - 1.5 * t, 568)]     # bottle 1, 2 px taller
+
+    def detect(self, frame):
+        self.calls += 1
+        time.sleep(self.detect_ms / 1000)
+        detections = [Detection(tuple(int(v) for v in np.add(box, self.random.normal(0, self.jitter, 4))),
+                                0.8, BOTTLE_CLASS_ID) for box in self.truth()]
+        return DetectionResult(detections, {"total": self.detect_ms})
+
+
+def identify(box, truth):
+    """Index of the true bottle a chosen box belongs to."""
+    return int(np.argmax(iou_matrix([box], truth)[0]))
+
+
+def run(scene, frames, choose):
+    frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+    chosen, errors = [], []
+    started = time.perf_counter()
+    for i in range(frames):
+        scene.frame = i
+        box = choose(frame)
+        if box is None:
+            continue
+        truth = scene.truth()
+        index = identify(box, truth)
+        chosen.append(index)
+        center = ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+        true_center = ((truth[index][0] + truth[index][2]) / 2, (truth[index][1] + truth[index][3]) / 2)
+        errors.append(np.hypot(center[0] - true_center[0], center[1] - true_center[1]))
+    elapsed = time.perf_counter() - started
+    switches = sum(1 for a, b in zip(chosen, chosen[1:]) if a != b)
+    return frames / elapsed, switches, float(np.mean(errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=150)
+    parser.add_argument("--detect-ms", type=float, default=90.0, help="simulated detector latency")
+    parser.add_argument("--weights", help="measure the detector latency of these weights instead")
+    parser.add_argument("--detect-every", type=int, default=5)
+    args = parser.parse_args()
+
+    detect_ms = args.detect_ms
+    if args.weights:
+        image = cv2.resize(cv2.imread(str(sorted((parent_dir / "images").iterdir())[0])), FRAME_SHAPE[1::-1])
+        detector = get_detector(args.weights)
+        detect_ms = float(np.median([detector.detect(image).timings["total"] for _ in range(10)]))
+    print(f"detector latency: {detect_ms:.1f} ms")
+
+    scene = SyntheticScene(detect_ms)
+    rate, switches, error = run(scene, args.frames,
+                                lambda frame: select_best_bottle(scene.detect(frame).detections))
+    print(f"detect every frame: {rate:5.1f} frames/s, {scene.calls} detector calls, "
+          f"{switches} target switches, {error:.1f} px mean aim error")
+
+    scene = SyntheticScene(detect_ms)
+    tracker = BottleTracker(scene, detect_every=args.detect_every)
+    rate, switches, error = run(scene, args.frames, tracker.update)
+    print(f"tracker (N={args.detect_every}):   {rate:5.1f} frames/s, {scene.calls} detector calls, "
+          f"{switches} target switches, {error:.1f} px mean aim error")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Replays recorded audio through the VAD detectors and reports endpoint latency.
+
+Each WAV (16 kHz, mono, int16) is expected to be trimmed so the speech ends at the
+end of the file, or the end time can be given in a JSON labels file
+({"file.wav": 1.83, ...}). A tail of synthetic background noise is appended and
+streamed in NAOqi-sized buffers; the latency is the time between the real end of
+speech and the SPEECH_END event. The noise tail is also replayed on its own to
+count false triggers.
+
+Usage:
+    python benchmarks/vad_replay.py recordings/*.wav --labels labels.json --noise-rms 0.01
+"""
+import sys
+import json
+import wave
+import argparse
+import numpy as np
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+from vad import AdaptiveVAD, FixedThresholdVAD, SPEECH_START, SPEECH_END
+
+
+SAMPLE_RATE = 16000
+NAOQI_BUFFER = 1365  # samples per processRemote call for the front microphone at 16 kHz
+
+
+def read_wav(path):
+    with wave.open(str(path), "rb") as wf:
+        if wf.getframerate() != SAMPLE_RATE or wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16 kHz mono int16")
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+
+def replay(vad, samples, chunk):
+    """Returns the sample positions at which SPEECH_START and SPEECH_END fired."""
+    vad.reset()
+    starts, ends = [], []
+    for pos in range(0, len(samples), chunk):
+        event = vad.process(samples[pos:pos + chunk])
+        if event == SPEECH_START:
+            starts.append(pos + chunk)
+        elif event == SPEECH_END:
+            ends.append(pos + chunk)
+    return starts, ends
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VAD endpoint latency replay benchmark")
+    parser.add_argument("wavs", nargs="+", help="Recorded utterances")
+    parser.add_argument("--labels", help="JSON file with speech end time (s) per file name")
+    parser.add_argument("--noise-rms", type=float, default=0.01, help="RMS of the appended noise tail")
+    parser.add_argument("--tail", type=float, default=4.0, help="Seconds of noise appended after speech")
+    parser.add_argument("--chunk", type=int, default=NAOQI_BUFFER)
+    parser.add_argument("--threshold", type=float, default=0.04, help="Fixed threshold (main.py uses 0.04)")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--environment", default="indoor")
+    args = parser.parse_args()
+
+    labels = json.load(open(args.labels)) if args.labels else {}
+    rng = np.random.default_rng(0)
+    tail = (rng.standard_normal(int(args.tail * SAMPLE_RATE)) * args.noise_rms * 32768).astype(np.int16)
+
+    detectors = {
+        "fixed": lambda: FixedThresholdVAD(args.threshold, hangover=2.0, sample_rate=SAMPLE_RATE),
+        "adaptive": lambda: AdaptiveVAD.from_profile(args.language, args.environment,
+                                                     sample_rate=SAMPLE_RATE, min_energy=args.threshold),
+    }
+
+    for name, make in detectors.items():
+        latencies, missed, false_triggers = [], 0, 0
+        for path in args.wavs:
+            speech = read_wav(path)
+            speech_end = int(labels.get(Path(path).name, len(speech) / SAMPLE_RATE) * SAMPLE_RATE)
+            _, ends = replay(make(), np.concatenate([speech, tail]), args.chunk)
+            ends = [e for e in ends if e >= speech_end]
+            if ends:
+                latencies.append((ends[0] - speech_end) / SAMPLE_RATE)
+            else:
+                missed += 1
+            starts, _ = replay(make(), tail, args.chunk)
+            false_triggers += len(starts)
+
+        if latencies:
+            lat = np.array(latencies) * 1000
+            print(f"{name:>8}: endpoint latency mean {lat.mean():6.0f} ms, p50 {np.percentile(lat, 50):6.0f} ms, "
+                  f"p95 {np.percentile(lat, 95):6.0f} ms | missed {missed} | false triggers on noise {false_triggers}")
+        else:
+            print(f"{name:>8}: no endpoint detected in {missed} files | false triggers on noise {false_triggers}")
+
+
+if __name__ == "__main__":
+    main()
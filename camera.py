@@ -1,3 +1,6 @@
+import time
+import threading
+from collections import deque
 import numpy as np
 import cv2
 
@@ -6,17 +9,23 @@ def delete_subs(name, app, video_service):
     all_subscribers = video_service.getSubscribers()
     sub_to_delete = [subscriber for subscriber in all_subscribers if name in str(subscriber)] # type: ignore
     for sub in sub_to_delete:
-        app.session.service("ALVideoDevice").unsubscribe(sub)
+        video_service.unsubscribe(sub)
 
     return video_service
 
 
+HEAD_CAMERA_HALF_HFOV = 28  # degrees visible on each side of the head camera image center
+GUN_CAMERA_HFOV = 62  # RPi Camera V2 field of view in degrees
+GUN_CAMERA_VFOV = 49
+PANORAMA_FRAME_WIDTH = 640  # width of one head angle in the panorama; keeps the grid labels readable
+
+
 def draw_horizontal_angle_grid(image, center_angle=0):
     """Draw HORIZONTAL angle markers on the bottom of the image."""
     image_height, image_width = image.shape[:2]
 
     # Calculate visible angles based on center_angle
-    visible_range = 28  # 28 degrees each side
+    visible_range = HEAD_CAMERA_HALF_HFOV  # 28 degrees each side
     min_angle = center_angle - visible_range
     max_angle = center_angle + visible_range
 
@@ -73,15 +82,331 @@ def draw_vertical_angle_grid(image):
     return image
 
 
-def take_picture(video_service, video_handle, center_angle=0, add_vertical_grid=False):
-    frame_data = video_service.getImageRemote(video_handle)  # get frame
+# ALVideoDevice colorspaces
+COLORSPACE_YUV422 = 9  # 2 bytes per pixel (Y0 U Y1 V), a third less to send than RGB/BGR
+COLORSPACE_RGB = 11
+COLORSPACE_BGR = 13
+
+
+def frame_timestamp(frame_data):
+    """Returns the NAOqi capture timestamp of a getImageRemote result in seconds."""
+    return frame_data[4] + frame_data[5] * 1e-6
+
+
+def frame_shape(frame_data):
+    """Shape of the decoded BGR image of a getImageRemote result."""
+    return (frame_data[1], frame_data[0], 3)
+
+
+def decode_frame(frame_data, out=None):
+    """
+    Converts a getImageRemote result into a BGR image, written into `out` if given.
+
+    BGR frames (COLORSPACE_BGR) are only copied, RGB and YUV422 frames are
+    converted by cv2.cvtColor straight into the output, so a frame costs at most one copy.
+    """
     width = frame_data[0]
     height = frame_data[1]
+    layers = frame_data[2]
+    colorspace = frame_data[3]
     raw_bytes = frame_data[6]  # Could be a list of ints
 
-    image_buffer = np.frombuffer(raw_bytes, dtype=np.uint8).reshape((height, width, 3))
-    image_buffer = cv2.cvtColor(image_buffer, cv2.COLOR_RGB2BGR)
-    image_buffer = draw_horizontal_angle_grid(image_buffer, center_angle)
+    image_buffer = np.frombuffer(raw_bytes, dtype=np.uint8).reshape((height, width, layers))
+    if colorspace == COLORSPACE_YUV422:
+        return cv2.cvtColor(image_buffer, cv2.COLOR_YUV2BGR_YUYV, dst=out)
+    if colorspace == COLORSPACE_BGR:
+        if out is None:
+            return image_buffer if image_buffer.flags.writeable else image_buffer.copy()
+        np.copyto(out, image_buffer)
+        return out
+    return cv2.cvtColor(image_buffer, cv2.COLOR_RGB2BGR, dst=out)
+
+
+_clock_offsets = {}  # video handle -> smallest (local time - NAOqi timestamp) seen
+
+
+def frame_local_time(video_handle, frame_data, received=None):
+    """
+    Estimates when a frame was captured, in local time.time() seconds.
+
+    The robot clock is not synchronized with ours, so the offset between them is
+    estimated per subscription as the smallest (receive time - frame timestamp)
+    seen so far, i.e. the fastest delivery observed.
+    """
+    received = time.time() if received is None else received
+    offset = received - frame_timestamp(frame_data)
+    best = _clock_offsets.get(video_handle)
+    if best is None or offset < best:
+        _clock_offsets[video_handle] = best = offset
+    return frame_timestamp(frame_data) + best
+
+
+DEFAULT_FRAME_RATE = 5  # fps assumed when ALVideoDevice cannot tell (main.py subscribes at 5)
+_frame_periods = {}  # video handle -> seconds between two frames of the subscription
+
+
+def frame_period(video_service, video_handle):
+    """Seconds between frames of a subscription (ALVideoDevice.getFrameRate), cached per handle."""
+    period = _frame_periods.get(video_handle)
+    if period is None:
+        try:
+            rate = video_service.getFrameRate(video_handle)
+        except Exception:
+            rate = None
+        period = 1.0 / (rate if rate and rate > 0 else DEFAULT_FRAME_RATE)
+        _frame_periods[video_handle] = period
+    return period
+
+
+def get_frame(video_service, video_handle, not_older_than=None, timeout=1.0):
+    """
+    getImageRemote that skips frames captured before `not_older_than` (local time.time()).
+
+    Every call transfers a full frame, so a stale one is only retried after one
+    frame period of the subscription, when the camera has a new frame. Gives up
+    after `timeout` seconds and returns the newest frame received.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        frame_data = video_service.getImageRemote(video_handle)  # get frame
+        captured = frame_local_time(video_handle, frame_data)
+        if not_older_than is None or captured >= not_older_than:
+            return frame_data
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print(f"[CAMERA] No frame newer than requested after {timeout}s, using one "
+                  f"{not_older_than - captured:.2f}s older")
+            return frame_data
+        time.sleep(min(frame_period(video_service, video_handle), remaining))
+
+
+_decode_buffers = {}  # video handle -> preallocated BGR image
+
+
+def _decode_buffer(video_handle, shape):
+    """Returns the reusable output image of a subscription, reallocated only if the resolution changed."""
+    buffer = _decode_buffers.get(video_handle)
+    if buffer is None or buffer.shape != shape:
+        buffer = np.empty(shape, dtype=np.uint8)
+        _decode_buffers[video_handle] = buffer
+    return buffer
+
+
+class FrameGrabber(object):
+    """
+    Background thread that keeps the latest frame of one camera subscription.
+
+    Frames are decoded into two preallocated buffers: the thread fills the back
+    buffer and swaps it with the front one, readers copy the front buffer. Each
+    frame keeps its NAOqi timestamp, the local time it arrived and its capture
+    time mapped to local time (frame_local_time), so callers can ask for a frame
+    no older than a given age, or captured after a given moment, instead of
+    waiting for a getImageRemote round trip. With a `frame_bus` (frame_bus.FrameBus) every
+    frame is also published once for readers in other processes.
+    """
+    def __init__(self, video_service, video_handle, rate=5.0, frame_bus=None):
+        self.video_service = video_service
+        self.video_handle = video_handle
+        self.frame_bus = frame_bus
+        self.period = 1.0 / rate
+        self._buffers = [None, None]
+        self._front = 0
+        self._front_info = None  # (naoqi timestamp, local receive time, sequence number, local capture time)
+        self._last_read_seq = -1
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.frames_captured = 0
+        self.frames_dropped = 0  # replaced before anyone read them
+        self._capture_times = deque(maxlen=30)
+        self._read_ages = deque(maxlen=30)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"FrameGrabber-{self.video_handle}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        last_timestamp = None
+        while self._running:
+            started = time.monotonic()
+            try:
+                frame_data = self.video_service.getImageRemote(self.video_handle)
+            except Exception as e:
+                print(f"[CAMERA] Frame grabber error: {e}")
+                frame_data = None
+            if frame_data is not None and frame_timestamp(frame_data) != last_timestamp:
+                last_timestamp = frame_timestamp(frame_data)
+                self._store(frame_data, last_timestamp, frame_local_time(self.video_handle, frame_data))
+            time.sleep(max(0.0, self.period - (time.monotonic() - started)))
+
+    def _store(self, frame_data, timestamp, captured):
+        back = 1 - self._front
+        shape = frame_shape(frame_data)
+        if self._buffers[back] is None or self._buffers[back].shape != shape:
+            self._buffers[back] = np.empty(shape, dtype=np.uint8)
+        decode_frame(frame_data, out=self._buffers[back])
+        received = time.monotonic()
+        if self.frame_bus is not None:
+            self.frame_bus.publish(self._buffers[back], captured)
+        with self._cond:
+            if self._front_info is not None and self._front_info[2] != self._last_read_seq:
+                self.frames_dropped += 1
+            self._front = back
+            self._front_info = (timestamp, received, self.frames_captured, captured)
+            self.frames_captured += 1
+            self._capture_times.append(received)
+            self._cond.notify_all()
+
+    def latest(self, max_age=None, timeout=1.0, out=None, not_older_than=None):
+        """
+        Returns (image copy, NAOqi timestamp) of a frame at most `max_age` seconds old
+        and captured no earlier than `not_older_than` (local time.time()).
+
+        Waits up to `timeout` for a fresh enough frame, then returns the newest one
+        available. Returns (None, None) if nothing was captured yet. The copy is
+        written into `out` when it has the frame's shape.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                info = self._front_info
+                fresh = (info is not None and (max_age is None or time.monotonic() - info[1] <= max_age)
+                         and (not_older_than is None or info[3] >= not_older_than))
+                remaining = deadline - time.monotonic()
+                if fresh or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if info is None:
+                return None, None
+            if not fresh:
+                print(f"[CAMERA] No fresh enough frame after {timeout}s, using one "
+                      f"{time.monotonic() - info[1]:.2f}s old")
+            self._last_read_seq = info[2]
+            self._read_ages.append(time.monotonic() - info[1])
+            front = self._buffers[self._front]
+            if out is not None and out.shape == front.shape:
+                np.copyto(out, front)
+                return out, info[0]
+            return front.copy(), info[0]
+
+    def stats(self):
+        """Capture rate (fps), mean age of frames handed out (s) and dropped frame count."""
+        times = self._capture_times
+        rate = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+        ages = self._read_ages
+        return {
+            "capture_rate": rate,
+            "mean_frame_age": sum(ages) / len(ages) if ages else None,
+            "frames_captured": self.frames_captured,
+            "frames_dropped": self.frames_dropped,
+        }
+
+
+_frame_grabbers = {}  # video handle -> FrameGrabber
+
+
+def start_frame_grabber(video_service, video_handle, rate=5.0, frame_bus=None):
+    """Starts a background grabber; take_picture on this handle will use it."""
+    grabber = _frame_grabbers.get(video_handle)
+    if grabber is None or not grabber.is_alive():
+        grabber = FrameGrabber(video_service, video_handle, rate, frame_bus).start()
+        _frame_grabbers[video_handle] = grabber
+    return grabber
+
+
+def stop_frame_grabber(video_handle):
+    grabber = _frame_grabbers.pop(video_handle, None)
+    if grabber is not None:
+        grabber.stop()
+
+
+MIN_SHARPNESS = 100.0  # Laplacian variance at 320 px width; motion-blurred head frames score well below
+
+
+def sharpness_score(image, width=320):
+    """
+    Variance of the Laplacian of a downsampled grayscale copy of a BGR image.
+    Higher is sharper; motion blur lowers it a lot. Compute it before drawing grids.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    height = max(1, round(gray.shape[0] * width / gray.shape[1]))
+    small = cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(small, cv2.CV_32F).var())
+
+
+def _capture(video_service, video_handle, max_age, reuse_buffer, not_older_than, timeout):
+    """One decoded frame from the frame grabber or getImageRemote."""
+    grabber = _frame_grabbers.get(video_handle)
+    out = _decode_buffers.get(video_handle) if reuse_buffer else None
+    if grabber is not None and grabber.is_alive():
+        image_buffer, _ = grabber.latest(max_age=max_age, timeout=timeout, out=out, not_older_than=not_older_than)
+    else:
+        image_buffer = None
+    if image_buffer is None:
+        frame_data = get_frame(video_service, video_handle, not_older_than, timeout)
+        if reuse_buffer:
+            out = _decode_buffer(video_handle, frame_shape(frame_data))
+        image_buffer = decode_frame(frame_data, out=out)
+    elif reuse_buffer and out is None:
+        _decode_buffers[video_handle] = image_buffer  # reuse the grabber's copy from now on
+    return image_buffer
+
+
+def take_picture(video_service, video_handle, center_angle=0, add_vertical_grid=False, max_age=0.5,
+                 reuse_buffer=False, not_older_than=None, add_horizontal_grid=True, min_sharpness=None,
+                 time_budget=1.0):
+    """
+    Returns the current camera frame (BGR) with angle grids drawn on it.
+
+    With a frame grabber running for `video_handle` the latest buffered frame no
+    older than `max_age` seconds is used instead of a getImageRemote round trip.
+    `not_older_than` (local time.time(), normally when the last motion ended)
+    skips frames captured before it, e.g. while the robot was still moving.
+    With `min_sharpness` (see sharpness_score) blurred frames are retried with
+    newer ones until `time_budget` seconds pass; then the sharpest one is used.
+    With `reuse_buffer` the frame is written into one preallocated image per
+    subscription; it is overwritten by the next call, so use it only when the
+    image is encoded or copied right away.
+    """
+    deadline = time.monotonic() + time_budget
+    best, best_score, attempts = None, -1.0, 0
+    while True:
+        remaining = max(0.0, deadline - time.monotonic())
+        image_buffer = _capture(video_service, video_handle, max_age, reuse_buffer, not_older_than,
+                                timeout=remaining)
+        attempts += 1
+        if min_sharpness is None:
+            best = image_buffer
+            break
+        score = sharpness_score(image_buffer)
+        if score >= min_sharpness:
+            best, best_score = image_buffer, score
+            break
+        if score > best_score:
+            # the reusable buffer is overwritten by the next attempt
+            best = image_buffer.copy() if reuse_buffer else image_buffer
+            best_score = score
+        if time.monotonic() >= deadline:
+            print(f"[CAMERA] No frame sharper than {min_sharpness:.0f} in {time_budget}s "
+                  f"({attempts} attempts), using the sharpest ({best_score:.0f})")
+            break
+        not_older_than = time.time()  # the next attempt needs a new frame
+    if attempts > 1 and best_score >= min_sharpness:
+        print(f"[CAMERA] Sharp frame ({best_score:.0f}) after {attempts} attempts")
+    image_buffer = best
+
+    if add_horizontal_grid:
+        image_buffer = draw_horizontal_angle_grid(image_buffer, center_angle)
 
     if add_vertical_grid:
         image_buffer = draw_vertical_angle_grid(image_buffer)
@@ -89,6 +414,166 @@ def take_picture(video_service, video_handle, center_angle=0, add_vertical_grid=
     return image_buffer
 
 
+def sweep_head(motion_service, video_service, video_handle, angles, on_frame, abort_event=None,
+               tolerance=2.0, add_grid=True):
+    """
+    Turns the head through `angles` and calls on_frame(angle, image) for each.
+
+    The next head motion starts right after a frame is captured, so whatever
+    on_frame hands off (e.g. to ImageShaper.submit) runs while the head moves.
+    Each capture waits for the motion to finish and the measured HeadYaw to be on
+    target, and skips frames older than that moment. The head ends at 0 deg;
+    returns the angles that were captured.
+    """
+    from motion import turnHead, waitForHeadYaw
+
+    captured = []
+    move = turnHead(motion_service, angles[0], wait=False) if angles else None
+    for i, angle in enumerate(angles):
+        move.value()
+        if abort_event is not None and abort_event.is_set():
+            break
+        waitForHeadYaw(motion_service, angle, tolerance)
+        image = take_picture(video_service, video_handle, center_angle=angle, not_older_than=time.time(),
+                             add_horizontal_grid=add_grid, min_sharpness=MIN_SHARPNESS, time_budget=0.5)
+        next_angle = angles[i + 1] if i + 1 < len(angles) else 0
+        move = turnHead(motion_service, next_angle, wait=False)
+        on_frame(angle, image)
+        captured.append(angle)
+    if move is not None and captured and captured[-1] == angles[-1]:
+        move.value()  # back at 0 deg
+    else:
+        turnHead(motion_service, 0)
+    return captured
+
+
+def compose_panorama(frames, frame_width=PANORAMA_FRAME_WIDTH):
+    """
+    Places head camera frames [(angle, BGR image), ...] side by side on one
+    continuous angle axis, left (most positive yaw) to right, and draws the
+    horizontal angle grid across it. Frames should be taken without a grid.
+
+    Each frame covers +/- HEAD_CAMERA_HALF_HFOV around its angle; parts of the
+    axis no frame covers stay black, overlapping parts show the frame further right.
+    """
+    frames = sorted(frames, key=lambda frame: frame[0], reverse=True)
+    left = frames[0][0] + HEAD_CAMERA_HALF_HFOV
+    px_per_degree = frame_width / (2 * HEAD_CAMERA_HALF_HFOV)
+    height, width = frames[0][1].shape[:2]
+    frame_height = round(height * frame_width / width)
+    offsets = [round((left - angle - HEAD_CAMERA_HALF_HFOV) * px_per_degree) for angle, _ in frames]
+
+    panorama = np.zeros((frame_height, offsets[-1] + frame_width, 3), dtype=np.uint8)
+    for (angle, image), x in zip(frames, offsets):
+        view = panorama[:, x:x + frame_width]
+        cv2.resize(image, (frame_width, frame_height), dst=view, interpolation=cv2.INTER_AREA)
+        draw_horizontal_angle_grid(view, center_angle=angle)
+    return panorama
+
+
+# ALVideoDevice resolution index -> (width, height)
+RESOLUTIONS = {0: (160, 120), 1: (320, 240), 2: (640, 480), 3: (1280, 960)}
+# Resolution each phase of a task needs
+PHASE_RESOLUTIONS = {
+    "navigation": 2,  # front camera steps, look_forward
+    "look_around": 2,
+}
+BYTES_PER_PIXEL = {COLORSPACE_YUV422: 2, COLORSPACE_RGB: 3, COLORSPACE_BGR: 3}
+
+
+class _CountingVideoService(object):
+    """ALVideoDevice wrapper that counts the frames, bytes and time of getImageRemote per handle."""
+    def __init__(self, video_service):
+        self._video_service = video_service
+        self.counters = {}  # handle -> [frames, bytes, seconds]
+
+    def getImageRemote(self, handle):
+        started = time.monotonic()
+        frame_data = self._video_service.getImageRemote(handle)
+        counter = self.counters.setdefault(handle, [0, 0, 0.0])
+        counter[0] += 1
+        counter[1] += len(frame_data[6]) if frame_data is not None else 0
+        counter[2] += time.monotonic() - started
+        return frame_data
+
+    def __getattr__(self, name):
+        return getattr(self._video_service, name)
+
+
+class CameraManager(object):
+    """
+    Pool of ALVideoDevice subscriptions, one per resolution, shared by the tools.
+
+    Each phase of a task (see PHASE_RESOLUTIONS) asks for its handle with
+    handle_for(phase); subscriptions are created on first use and kept, so
+    switching resolution costs nothing after that. Use `video` (a wrapper of
+    ALVideoDevice) for the captures so report() can show per resolution how many
+    bytes were transferred, how many were saved against `baseline_resolution`
+    and how long a frame took; the time saved is estimated from the measured
+    throughput of that handle. close() unsubscribes everything, and on start
+    subscriptions left over by an earlier run with the same name are removed.
+    """
+    def __init__(self, app, video_service, name="kamera", camera_index=0, colorspace=COLORSPACE_BGR, fps=5,
+                 phase_resolutions=None, baseline_resolution=3):
+        self.app = app
+        self.name = name
+        self.camera_index = camera_index
+        self.colorspace = colorspace
+        self.fps = fps
+        self.phase_resolutions = dict(PHASE_RESOLUTIONS, **(phase_resolutions or {}))
+        self.baseline_resolution = baseline_resolution
+        self.video = _CountingVideoService(delete_subs(name, app, video_service))  # needed for camera initialization
+        self._handles = {}  # resolution index -> handle
+        self._lock = threading.Lock()
+
+    def handle(self, resolution):
+        """Subscription handle for a resolution index, subscribing on first use."""
+        with self._lock:
+            handle = self._handles.get(resolution)
+            if handle is None:
+                handle = self.video.subscribeCamera(f"{self.name}_{resolution}", self.camera_index, resolution,
+                                                    self.colorspace, self.fps)
+                self._handles[resolution] = handle
+                print(f"[CAMERA] Subscribed {RESOLUTIONS[resolution][0]}x{RESOLUTIONS[resolution][1]}: {handle}")
+            return handle
+
+    def handle_for(self, phase):
+        """Subscription handle with the resolution `phase` needs."""
+        return self.handle(self.phase_resolutions[phase])
+
+    def report(self, reset=True):
+        """
+        Prints and returns {resolution: (frames, MB, MB saved, mean ms per frame, s saved)} since the last reset.
+        """
+        width, height = RESOLUTIONS[self.baseline_resolution]
+        baseline_bytes = width * height * BYTES_PER_PIXEL.get(self.colorspace, 3)
+        report = {}
+        for resolution, handle in self._handles.items():
+            frames, size, seconds = self.video.counters.get(handle, (0, 0, 0.0))
+            if not frames:
+                continue
+            saved = frames * baseline_bytes - size
+            time_saved = saved * seconds / size if size else 0.0
+            report[resolution] = (frames, size / 1e6, saved / 1e6, seconds / frames * 1000, time_saved)
+            print(f"[CAMERA] {RESOLUTIONS[resolution][0]}x{RESOLUTIONS[resolution][1]}: {frames} frames, "
+                  f"{size / 1e6:.1f} MB, {saved / 1e6:.1f} MB saved, {seconds / frames * 1000:.0f} ms per frame, "
+                  f"~{time_saved:.1f} s saved")
+        if reset:
+            self.video.counters.clear()
+        return report
+
+    def close(self):
+        """Unsubscribes all handles of the pool."""
+        with self._lock:
+            for handle in self._handles.values():
+                stop_frame_grabber(handle)
+                try:
+                    self.video.unsubscribe(handle)
+                except Exception as e:
+                    print(f"[CAMERA] Could not unsubscribe {handle}: {e}")
+            self._handles.clear()
+
+
 def take_gun_camera_photo():
     pass
 
@@ -98,8 +583,8 @@ def draw_gun_camera_crosshair(image):
     image_height, image_width = image.shape[:2]
     
     # RPi Camera V2 field of view
-    horizontal_fov = 62
-    vertical_fov = 49
+    horizontal_fov = GUN_CAMERA_HFOV
+    vertical_fov = GUN_CAMERA_VFOV
     
     # Center coordinates
     center_x = image_width // 2
@@ -0,0 +1,110 @@
+import time
+import asyncio
+import itertools
+
+
+# Lower value = handled first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+
+# Words that interrupt whatever the robot is doing
+STOP_KEYWORDS = {"stop", "halt", "freeze", "stój", "stoj", "przestań", "przestan", "zatrzymaj"}
+
+
+def is_stop_command(text):
+    """Returns True if the text contains one of STOP_KEYWORDS."""
+    words = text.lower().replace(",", " ").replace(".", " ").replace("!", " ").split()
+    return any(word in STOP_KEYWORDS for word in words)
+
+
+def classify_priority(text):
+    """Returns the priority a recognized text should be published with."""
+    return PRIORITY_HIGH if is_stop_command(text) else PRIORITY_NORMAL
+
+
+class Command(object):
+    """
+    A recognized voice command with the time it was heard and its priority.
+    """
+    def __init__(self, text, priority=PRIORITY_NORMAL, timestamp=None):
+        self.text = text
+        self.priority = priority
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    @property
+    def age(self):
+        """Seconds since the command was recognized."""
+        return time.time() - self.timestamp
+
+    def __repr__(self):
+        return f"Command({self.text!r}, priority={self.priority})"
+
+
+class CommandBus(object):
+    """
+    Thread-safe handoff of voice commands into the asyncio loop.
+
+    publish() can be called from any thread (the STT workers); it schedules the
+    put on the event loop with call_soon_threadsafe. Consumers await get() instead
+    of polling. Commands come out by priority, then in arrival order.
+
+    High-priority commands additionally call the preempt handlers right away, on
+    the loop thread, before they are queued.
+    """
+    def __init__(self):
+        self.loop = None
+        self._queue = asyncio.PriorityQueue()
+        self._order = itertools.count()
+        self._preempt_handlers = []
+
+    def add_preempt_handler(self, handler):
+        """
+        Registers handler(command), called on the loop for every PRIORITY_HIGH command.
+        """
+        self._preempt_handlers.append(handler)
+
+    def bind(self, loop=None):
+        """
+        Attaches the bus to the running event loop. Call once from inside the loop.
+        """
+        self.loop = loop or asyncio.get_running_loop()
+
+    def publish(self, text, priority=PRIORITY_NORMAL, timestamp=None):
+        """
+        Queues a command from any thread. Returns the Command.
+        """
+        command = Command(text, priority, timestamp)
+        if self.loop is None:
+            print(f"[COMMAND_BUS] Not bound to an event loop, dropping {command}")
+            return command
+        self.loop.call_soon_threadsafe(self._put, command)
+        return command
+
+    def _put(self, command):
+        if command.priority <= PRIORITY_HIGH:
+            for handler in self._preempt_handlers:
+                try:
+                    handler(command)
+                except Exception as e:
+                    print(f"[COMMAND_BUS] Preempt handler failed: {e}")
+        self._queue.put_nowait((command.priority, next(self._order), command))
+
+    async def get(self):
+        """
+        Waits for the next command.
+        """
+        _, _, command = await self._queue.get()
+        return command
+
+    def get_nowait(self):
+        """
+        Returns the next command, or None if there is none waiting.
+        """
+        try:
+            _, _, command = self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+        return command
+
+    def empty(self):
+        return self._queue.empty()
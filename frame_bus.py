@@ -0,0 +1,190 @@
+import time
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+
+
+# Header of the shared block (int64): [last published sequence, number of slots, bytes per slot, magic]
+HEADER_FIELDS = 4
+# Per slot header (int64): [sequence * 2 (+1 while written), height, width, channels, timestamp in ns]
+SLOT_FIELDS = 5
+MAGIC = 0x46524D42  # "FRMB"
+ALIGN = 64
+
+
+def _layout(slots, slot_bytes):
+    header = HEADER_FIELDS * 8
+    slot_headers = slots * SLOT_FIELDS * 8
+    data_offset = -(-(header + slot_headers) // ALIGN) * ALIGN
+    slot_stride = -(-slot_bytes // ALIGN) * ALIGN
+    return data_offset, slot_stride, data_offset + slots * slot_stride
+
+
+def _attach(name):
+    """
+    Opens an existing block without taking ownership of it. Otherwise the
+    resource tracker of a reader process unlinks the block when the reader exits.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+    # A tracker inherited from the publisher (fork) must keep its registration
+    own_tracker = getattr(resource_tracker._resource_tracker, "_fd", None) is None
+    shm = shared_memory.SharedMemory(name=name)
+    if own_tracker:
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
+
+
+class _FrameBusBase(object):
+    def _map(self, shm, slots, slot_bytes):
+        self.shm = shm
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        data_offset, self._stride, _ = _layout(slots, slot_bytes)
+        self._header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        self._slot_headers = np.ndarray((slots, SLOT_FIELDS), dtype=np.int64, buffer=shm.buf, offset=HEADER_FIELDS * 8)
+        self._data = np.ndarray((slots, self._stride), dtype=np.uint8, buffer=shm.buf, offset=data_offset)
+
+    def _slot_view(self, slot, shape):
+        size = shape[0] * shape[1] * shape[2]
+        return self._data[slot, :size].reshape(shape)
+
+    @property
+    def last_sequence(self):
+        """Sequence number of the newest published frame (0 = none yet)."""
+        return int(self._header[0])
+
+
+class FrameBus(_FrameBusBase):
+    """
+    Publishes camera frames once into shared memory for readers in other processes.
+
+    Frames go round-robin into `slots` fixed-size slots. Every slot is guarded by
+    a sequence lock: its counter is odd while the frame is being written and
+    even (2 * frame sequence) when done. The publisher never waits for readers;
+    a reader that is too slow finds its slot overwritten and skips ahead. Keep
+    the FrameBus object alive while readers use it and call close() at the end
+    (it also unlinks the shared block).
+    """
+    def __init__(self, name="pepper_frames", slots=4, max_shape=(960, 1280, 3)):
+        self.name = name
+        slot_bytes = int(np.prod(max_shape))
+        _, _, total = _layout(slots, slot_bytes)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=total)
+        except FileExistsError:
+            # left over by a crashed run
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=total)
+        self._map(shm, slots, slot_bytes)
+        self._header[:] = (0, slots, slot_bytes, MAGIC)
+        self._slot_headers[:] = 0
+        self.frames_published = 0
+
+    def publish(self, image, timestamp=None):
+        """
+        Copies a HxWxC uint8 image into the next slot. Returns its sequence number.
+        """
+        if image.nbytes > self.slot_bytes:
+            raise ValueError(f"Frame of {image.shape} does not fit a {self.slot_bytes} byte slot")
+        sequence = self.last_sequence + 1
+        slot = sequence % self.slots
+        header = self._slot_headers[slot]
+        header[0] = 2 * sequence - 1  # odd: being written
+        height, width = image.shape[:2]
+        channels = image.shape[2] if image.ndim == 3 else 1
+        header[1:5] = (height, width, channels, int((time.time() if timestamp is None else timestamp) * 1e9))
+        np.copyto(self._slot_view(slot, (height, width, channels)), image.reshape(height, width, channels))
+        header[0] = 2 * sequence  # even: complete
+        self._header[0] = sequence
+        self.frames_published += 1
+        return sequence
+
+    def close(self):
+        self._header = self._slot_headers = self._data = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class FrameBusReader(_FrameBusBase):
+    """
+    Reads frames published by a FrameBus, possibly in another process.
+
+    read() returns a view straight into shared memory (no copy). The publisher
+    may overwrite the slot later, so after using the view call valid(sequence)
+    to know the result is trustworthy, or use read_copy() to get a private copy.
+    """
+    def __init__(self, name="pepper_frames"):
+        shm = _attach(name)
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        if header[3] != MAGIC:
+            shm.close()
+            raise ValueError(f"Shared memory '{name}' is not a frame bus")
+        self._map(shm, int(header[1]), int(header[2]))
+        self.frames_read = 0
+        self.frames_skipped = 0
+        self._last = 0
+
+    def _try_read(self, sequence):
+        slot = sequence % self.slots
+        header = self._slot_headers[slot]
+        if header[0] != 2 * sequence:
+            return None
+        shape = (int(header[1]), int(header[2]), int(header[3]))
+        timestamp = int(header[4]) / 1e9
+        view = self._slot_view(slot, shape)
+        return view, timestamp
+
+    def valid(self, sequence):
+        """True if the frame `sequence` is still intact in its slot."""
+        return self._slot_headers[sequence % self.slots][0] == 2 * sequence
+
+    def read(self, timeout=1.0, poll=0.001):
+        """
+        Waits for a frame newer than the last one read and returns
+        (sequence, timestamp, zero-copy view), or (None, None, None) on timeout.
+        Frames that were overwritten before this reader got to them are skipped.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            sequence = self.last_sequence
+            if sequence > self._last:
+                result = self._try_read(sequence)
+                if result is not None:
+                    self.frames_skipped += sequence - self._last - 1
+                    self._last = sequence
+                    self.frames_read += 1
+                    return sequence, result[1], result[0]
+            if time.monotonic() > deadline:
+                return None, None, None
+            time.sleep(poll)
+
+    def read_copy(self, out=None, timeout=1.0):
+        """
+        Like read() but returns a private copy (written into `out` if it has the
+        right shape), retried if the slot was overwritten while copying.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            sequence, timestamp, view = self.read(max(0.0, deadline - time.monotonic()))
+            if view is None:
+                return None, None, None
+            if out is None or out.shape != view.shape:
+                out = np.empty(view.shape, dtype=np.uint8)
+            np.copyto(out, view)
+            if self.valid(sequence):
+                return sequence, timestamp, out
+            self.frames_skipped += 1
+
+    def close(self):
+        self._header = self._slot_headers = self._data = None
+        self.shm.close()
@@ -0,0 +1,197 @@
+from dataclasses import replace
+from pydantic_ai.messages import (
+    BinaryContent, ModelRequest, ModelResponse, SystemPromptPart, TextPart,
+    ToolCallPart, ToolReturnPart, RetryPromptPart, UserPromptPart,
+)
+
+
+CHARS_PER_TOKEN = 4
+IMAGE_TILE = 768  # Gemini bills images per 768x768 tile
+TOKENS_PER_TILE = 258
+
+
+def jpeg_size(data):
+    """
+    Reads (width, height) from the SOF header of a JPEG without decoding it.
+    Returns None if the data is not a readable JPEG.
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        length = int.from_bytes(data[i + 2:i + 4], "big")
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return width, height
+        i += 2 + length
+    return None
+
+
+def estimate_image_tokens(width, height):
+    """Estimated number of input tokens an image costs the LLM."""
+    tiles = -(-width // IMAGE_TILE) * -(-height // IMAGE_TILE)
+    return tiles * TOKENS_PER_TILE
+
+
+def _is_image(content):
+    return isinstance(content, BinaryContent) and content.media_type.startswith("image/")
+
+
+def _content_cost(content):
+    """Returns (bytes, tokens) of one user prompt item."""
+    if isinstance(content, str):
+        return len(content.encode("utf-8")), len(content) // CHARS_PER_TOKEN
+    if isinstance(content, BinaryContent):
+        size = jpeg_size(content.data) if content.media_type == "image/jpeg" else None
+        tokens = estimate_image_tokens(*size) if size else 4 * TOKENS_PER_TILE
+        return len(content.data), tokens
+    return 0, 0
+
+
+class HistoryManager(object):
+    """
+    Keeps the conversation sent with every LLM request inside a token and byte budget.
+
+    A step is one call of generate_say_execute_response: it starts with a request
+    holding the user prompt and runs until the next one, so every tool call and its
+    return always belong to the same step. On compact():
+      - images older than `keep_image_steps` steps are replaced by a short text placeholder,
+      - tool returns and model text older than `keep_tool_steps` steps are shortened,
+      - if still over budget, whole oldest steps are dropped (the system prompt is kept),
+      - if the last step alone is over budget, its images are stripped and its texts shortened too.
+    """
+    def __init__(self, max_tokens=60000, max_bytes=3_000_000, keep_image_steps=2,
+                 keep_tool_steps=4, max_old_text_chars=300):
+        self.max_tokens = max_tokens
+        self.max_bytes = max_bytes
+        self.keep_image_steps = keep_image_steps
+        self.keep_tool_steps = keep_tool_steps
+        self.max_old_text_chars = max_old_text_chars
+        self.images_removed = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def _starts_step(message):
+        return isinstance(message, ModelRequest) and any(
+            isinstance(part, UserPromptPart) for part in message.parts
+        ) and not any(isinstance(part, (ToolReturnPart, RetryPromptPart)) for part in message.parts)
+
+    def split_steps(self, messages):
+        """Groups messages into steps (lists of messages)."""
+        steps = []
+        for message in messages:
+            if not steps or self._starts_step(message):
+                steps.append([])
+            steps[-1].append(message)
+        return steps
+
+    def _shorten(self, text):
+        if len(text) <= self.max_old_text_chars:
+            return text
+        return text[:self.max_old_text_chars] + " [...]"
+
+    def _compact_request(self, message, step_index, strip_images, shorten_tools):
+        parts = []
+        for part in message.parts:
+            if strip_images and isinstance(part, UserPromptPart) and not isinstance(part.content, str):
+                content = []
+                for item in part.content:
+                    if _is_image(item):
+                        self.images_removed += 1
+                        self.bytes_saved += len(item.data)
+                        item = f"[image from step {step_index} removed to save context]"
+                    content.append(item)
+                part = replace(part, content=content)
+            elif shorten_tools and isinstance(part, ToolReturnPart) and isinstance(part.content, str):
+                part = replace(part, content=self._shorten(part.content))
+            parts.append(part)
+        return replace(message, parts=parts)
+
+    def _compact_response(self, message):
+        parts = [
+            replace(part, content=self._shorten(part.content)) if isinstance(part, TextPart) else part
+            for part in message.parts
+        ]
+        return replace(message, parts=parts)
+
+    def _compact_step(self, step, step_index, strip_images, shorten_tools):
+        if not (strip_images or shorten_tools):
+            return list(step)
+        return [
+            self._compact_request(m, step_index, strip_images, shorten_tools) if isinstance(m, ModelRequest)
+            else self._compact_response(m) if shorten_tools and isinstance(m, ModelResponse)
+            else m
+            for m in step
+        ]
+
+    def _fits(self, steps):
+        size, tokens = self.payload_size([m for step in steps for m in step])
+        return size <= self.max_bytes and tokens <= self.max_tokens
+
+    def compact(self, messages):
+        """
+        Returns a compacted copy of `messages` that fits the budget.
+        """
+        steps = self.split_steps(messages)
+        compacted = []
+        for index, step in enumerate(steps):
+            age = len(steps) - index  # 1 = the previous step
+            compacted.append(self._compact_step(step, index, age > self.keep_image_steps,
+                                                age > self.keep_tool_steps))
+
+        # Over budget: drop the oldest steps, but keep the system prompt
+        while len(compacted) > 1 and not self._fits(compacted):
+            dropped = compacted.pop(0)
+            system_parts = [part for m in dropped if isinstance(m, ModelRequest)
+                            for part in m.parts if isinstance(part, SystemPromptPart)]
+            if system_parts:
+                first = compacted[0][0]
+                compacted[0][0] = replace(first, parts=system_parts + list(first.parts))
+
+        # The last step alone can still be over budget: strip its images and shorten its texts too
+        if compacted and not self._fits(compacted):
+            compacted[-1] = self._compact_step(compacted[-1], len(steps) - 1, True, True)
+            if not self._fits(compacted):
+                size, tokens = self.payload_size([m for step in compacted for m in step])
+                print(f"[HISTORY] Last step still over budget without images: {size / 1024:.0f} KB, ~{tokens} tokens")
+
+        return [m for step in compacted for m in step]
+
+    @staticmethod
+    def payload_size(messages, extra_input=None):
+        """
+        Estimates (bytes, tokens) of the history plus an optional new user input.
+        """
+        size = tokens = 0
+        items = []
+        for message in messages:
+            for part in message.parts:
+                content = str(part.args) if isinstance(part, ToolCallPart) else getattr(part, "content", None)
+                if isinstance(content, (list, tuple)):
+                    items.extend(content)
+                elif content is not None:
+                    items.append(content if isinstance(content, (str, BinaryContent)) else str(content))
+        if extra_input is not None:
+            items.extend(extra_input if isinstance(extra_input, (list, tuple)) else [extra_input])
+        for item in items:
+            item_size, item_tokens = _content_cost(item)
+            size += item_size
+            tokens += item_tokens
+        return size, tokens
+
+    def report(self, messages, extra_input=None):
+        """
+        Prints and returns the estimated payload of the next request.
+        """
+        size, tokens = self.payload_size(messages, extra_input)
+        images = sum(1 for m in messages for part in m.parts
+                     if isinstance(part, UserPromptPart) and not isinstance(part.content, str)
+                     for item in part.content if _is_image(item))
+        print(f"[HISTORY] Request payload: {len(messages)} messages, {images} images in history, "
+              f"{size / 1024:.0f} KB, ~{tokens} tokens (removed {self.images_removed} images, "
+              f"{self.bytes_saved / 1024:.0f} KB so far)")
+        return size, tokens
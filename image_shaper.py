@@ -0,0 +1,128 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from pydantic_ai import BinaryContent
+from history_manager import estimate_image_tokens
+
+
+class ShapedImage(object):
+    """
+    A JPEG ready to be sent to the LLM, with what it costs.
+    """
+    def __init__(self, data, width, height, quality):
+        self.data = data
+        self.width = width
+        self.height = height
+        self.quality = quality
+        self.tokens = estimate_image_tokens(width, height)
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    def content(self):
+        """The image as pydantic-ai BinaryContent."""
+        return BinaryContent(data=self.data, media_type='image/jpeg')
+
+    def __repr__(self):
+        return f"ShapedImage({self.width}x{self.height}, q={self.quality}, {self.size / 1024:.0f} KB, ~{self.tokens} tokens)"
+
+
+class ImageShaper(object):
+    """
+    Encodes every image sent to the LLM so it fits a per-image byte budget.
+
+    The image is first scaled so its longer side is at most `max_side`. It is then
+    JPEG-encoded starting from the quality that last fitted this resolution
+    (cached per size, never above `max_quality`, the quality used before the
+    budget existed), lowering it by `quality_step` down to `min_quality` while
+    over budget and shrinking the image if even that is too big. When an image
+    comes out well under budget, the next one of that size starts one step higher.
+    Encoding runs on a thread pool (cv2 releases the GIL), so several images can
+    be encoded in parallel with shape_many() or submit().
+    """
+    def __init__(self, max_bytes=200_000, max_side=1280, max_quality=70, min_quality=40,
+                 quality_step=10, workers=3):
+        self.max_bytes = max_bytes
+        self.max_side = max_side
+        self.max_quality = max_quality
+        self.min_quality = min_quality
+        self.quality_step = quality_step
+        self._qualities = {}  # (width, height, max_bytes, max_quality) -> JPEG quality that fitted last time
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image_shaper")
+        self.images_shaped = 0
+        self.bytes_total = 0
+        self.tokens_total = 0
+
+    def fit(self, image, max_side=None):
+        """Downscales `image` so its longer side is at most `max_side` (default: self.max_side)."""
+        max_side = max_side or self.max_side
+        height, width = image.shape[:2]
+        scale = max_side / max(height, width)
+        if scale >= 1:
+            return image
+        return cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    def shape(self, image, name="image", max_bytes=None, max_side=None, quality=None):
+        """
+        Returns the image as a ShapedImage within `max_bytes` (default: self.max_bytes).
+
+        `quality` is the highest JPEG quality for this call (default: self.max_quality).
+        """
+        max_bytes = max_bytes or self.max_bytes
+        max_quality = quality or self.max_quality
+        image = self.fit(image, max_side)
+        while True:
+            height, width = image.shape[:2]
+            key = (width, height, max_bytes, max_quality)
+            with self._lock:
+                start = self._qualities.get(key, max_quality)
+            q = min(start, max_quality)
+            while True:
+                ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, q])
+                if not ok:
+                    raise ValueError(f"Could not encode {name} as JPEG")
+                if buffer.size <= max_bytes or q <= self.min_quality:
+                    break
+                q = max(self.min_quality, q - self.quality_step)
+            if buffer.size <= max_bytes or min(width, height) <= 64:
+                break
+            # Even the lowest quality is too big: shrink by the missing ratio and retry
+            scale = 0.9 * (max_bytes / buffer.size) ** 0.5
+            image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+
+        shaped = ShapedImage(buffer.tobytes(), width, height, q)
+        with self._lock:
+            # Start the next image of this size one step higher if there is plenty of room
+            self._qualities[key] = min(max_quality, q + self.quality_step) if shaped.size < max_bytes // 2 else q
+            self.images_shaped += 1
+            self.bytes_total += shaped.size
+            self.tokens_total += shaped.tokens
+        print(f"[IMAGE] {name}: {shaped.width}x{shaped.height}, JPEG q={shaped.quality}, "
+              f"{shaped.size / 1024:.0f} KB, ~{shaped.tokens} tokens")
+        return shaped
+
+    def submit(self, image, name="image", **kwargs):
+        """Shapes the image on the thread pool. Returns a Future of ShapedImage."""
+        return self._executor.submit(self.shape, image, name, **kwargs)
+
+    def shape_many(self, images, names=None, **kwargs):
+        """Shapes several images in parallel, keeping their order."""
+        names = names or [f"image {i}" for i in range(len(images))]
+        futures = [self.submit(image, name, **kwargs) for image, name in zip(images, names)]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        """Number of images shaped and their total bytes and estimated tokens."""
+        with self._lock:
+            return {
+                "images": self.images_shaped,
+                "bytes": self.bytes_total,
+                "tokens": self.tokens_total,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -3,16 +3,22 @@ import qi
 import sys
 from SoundReciver import SoundReceiverModule
 from robot_auth import AuthenticatorFactory
-from camera import delete_subs
+from camera import CameraManager, start_frame_grabber
 from robot_action_logic import RobotActionHandler
+from command_bus import CommandBus, PRIORITY_HIGH
+from frame_bus import FrameBus
 from motion import grabGun
 from time import sleep
 
 # inne parametry dla nao i peppera, sprawdzić w developer guidzie
 CAMERA_INDEX = 0
 RESOLUTION_INDEX = 3
-COLORSPACE_INDEX = 11
+CAMERA_PHASE_RESOLUTIONS = {"navigation": 2, "look_around": 2}  # 2 = 640x480
+COLORSPACE_INDEX = 13  # BGR, decoded without a color conversion (11 = RGB, 9 = YUV422: 2/3 of the Wi-Fi traffic)
 FRAMERATE = 5
+USE_FRAME_GRABBER = False  # keep the latest frame in the background instead of fetching it on every step
+PUBLISH_FRAMES = False  # with the frame grabber, share frames with other processes (frame_bus.FrameBusReader)
+LOOK_AROUND_MODE = "frames"  # "panorama" sends one stitched image instead of one per head angle
 
 #LANGUAGE = "Polski"
 LANGUAGE = "English"
@@ -46,17 +52,19 @@ tts = app.session.service("ALTextToSpeech")
 motion_service = app.session.service("ALMotion")
 video_service = app.session.service("ALVideoDevice")
 
-video_service = delete_subs("kamera", app, video_service)  # needed for camera initialization
-vid_handle = video_service.subscribeCamera(
-    "kamera",
-    CAMERA_INDEX,
-    RESOLUTION_INDEX,
-    COLORSPACE_INDEX,
-    FRAMERATE
-
-)
-
-sound_module_instance = SoundReceiverModule(app.session, name="SoundProcessingModule", thresholdRMSEnergy=0.04)
+# One subscription per resolution, each tool asks for the one it needs
+camera_manager = CameraManager(app, video_service, "kamera", CAMERA_INDEX, COLORSPACE_INDEX, FRAMERATE,
+                               phase_resolutions=CAMERA_PHASE_RESOLUTIONS, baseline_resolution=RESOLUTION_INDEX)
+video_service = camera_manager.video
+vid_handle = camera_manager.handle_for("navigation")
+frame_bus = FrameBus("pepper_frames") if USE_FRAME_GRABBER and PUBLISH_FRAMES else None
+if USE_FRAME_GRABBER:
+    start_frame_grabber(video_service, vid_handle, rate=FRAMERATE, frame_bus=frame_bus)
+
+# Offline streaming STT: stt_backend=VoskBackend("models/vosk-model-small-en-us-0.15") (from stt_backends)
+command_bus = CommandBus()
+sound_module_instance = SoundReceiverModule(app.session, name="SoundProcessingModule", thresholdRMSEnergy=0.04, language=LANGUAGE,
+                                            command_bus=command_bus)
 app.session.registerService("SoundProcessingModule", sound_module_instance)
 sleep(1)  # Give some time for the module to register
 sound_module_instance.start()
@@ -65,6 +73,7 @@ sound_module_instance.start()
 
 async def main():
     print("Start")
+    command_bus.bind()  # STT threads hand commands over to this loop
     sound_module_instance.setListening()
     #grabGun(motion_service, 0)
     # motion_service.moveInit()
@@ -80,8 +89,10 @@ async def main():
     # Initialize robot action handler
     robot_action_handler = RobotActionHandler(
         motion_service, video_service, vid_handle,
-        sound_module_instance, tts, LANGUAGE
+        sound_module_instance, tts, LANGUAGE, command_bus,
+        look_around_mode=LOOK_AROUND_MODE, camera_manager=camera_manager
     )
+    command_bus.add_preempt_handler(robot_action_handler.preempt)  # "stop" cancels the running task
 
 
 
@@ -90,17 +101,22 @@ async def main():
     # Main command loop
     while True:
         # try:
-        await asyncio.sleep(0.1)
-
-        # Start new task if none running
-        if (current_robot_task is None or current_robot_task.done()) and sound_module_instance.stt_output:
-            command = sound_module_instance.stt_output
-            sound_module_instance.stt_output = None
-            current_robot_task = asyncio.create_task(robot_action_handler.run_task(command))
+        # Wait for the next command; while a task runs, the task itself consumes new commands
+        command = await command_bus.get()
+        print(f"[MAIN] Got command '{command.text}' {command.age * 1000:.0f} ms after recognition")
+        if command.priority <= PRIORITY_HIGH:
+            continue  # already handled by the preempt handler
+        current_robot_task = asyncio.create_task(robot_action_handler.run_task(command.text))
+        await asyncio.wait([current_robot_task])  # does not raise if the task was preempted
         # except Exception as e:
         #     print(f"Error occurred: {e}")
         #     robot_action_handler.close_bt()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    finally:
+        camera_manager.close()  # do not leave subscriptions running on the robot
+        if frame_bus is not None:
+            frame_bus.close()
\ No newline at end of file
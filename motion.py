@@ -1,14 +1,25 @@
+import time
+from aim_calibration import aim_joint_angles
 
 
 
-def grabGun(motion_service, vertical_delta, horizontal_delta):
+
+
+def grabGun(motion_service, vertical_delta, horizontal_delta, distance=None):
+    """
+    Raises the gun aimed vertical_delta degrees up and horizontal_delta degrees left.
+    The joint angles come from the aim calibration table (aim_calibration.py), for
+    `distance` meters if known. Returns (RShoulderPitch, RElbowRoll) in degrees.
+    """
     # Arms motion from user have always the priority than walk arms motion
 
     JointNames = ["RShoulderPitch", "RShoulderRoll", "RElbowRoll", "RElbowYaw"]
     deg_to_rad = 0.017453
     # "RElbowRoll":5 metrów -  12 stopni. 3 metry - 14 stopni.
     # "RShoulderPitch" (bazowe): 5 metrów - -10 stopni. 3 metry - -8 stopni.
-    arm_pos = [-21 - vertical_delta, -0.5, 13 + horizontal_delta, 0]
+    # Default table: RShoulderPitch = -21 - vertical_delta, RElbowRoll = 13 + horizontal_delta
+    shoulder_pitch, elbow_roll = aim_joint_angles(vertical_delta, horizontal_delta, distance)
+    arm_pos = [shoulder_pitch, -0.5, elbow_roll, 0]
     arm_pos = [x * deg_to_rad for x in arm_pos]
 
     pFractionMaxSpeed = 0.5
@@ -18,6 +29,7 @@ def grabGun(motion_service, vertical_delta, horizontal_delta):
     #motion_service.setStiffnesses("RArm", 0.0)
     #motion_service.openHand("LHand")
     #motion_service.closeHand("LHand")
+    return shoulder_pitch, elbow_roll
 
 def lowerGun(motion_service):
     print("Lowering gun")
@@ -46,12 +58,34 @@ def moveFingers(motion_service):
     motion_service.angleInterpolationWithSpeed(JointNames, Arm1, pFractionMaxSpeed)
 
 
-def turnHead(motion_service, angle_degrees):
-    """Turn head to specified angle in degrees"""
+def turnHead(motion_service, angle_degrees, wait=True):
+    """
+    Turn head to specified angle in degrees.
+    With wait=False returns the qi future of the motion right away (call .value() to wait for it).
+    """
     JointNames = ["HeadYaw"]
     deg_to_rad = 0.017453
     Angles = [angle_degrees * deg_to_rad]
     
     pFractionMaxSpeed = 1.0
     # motion_service.wakeUp()
+    if not wait:
+        return motion_service.angleInterpolationWithSpeed(JointNames, Angles, pFractionMaxSpeed, _async=True)
     motion_service.angleInterpolationWithSpeed(JointNames, Angles, pFractionMaxSpeed)
+
+
+def waitForHeadYaw(motion_service, angle_degrees, tolerance=2.0, timeout=0.5):
+    """
+    Waits until the measured HeadYaw is within `tolerance` degrees of `angle_degrees`.
+    Returns True if it got there before `timeout` seconds.
+    """
+    deg_to_rad = 0.017453
+    deadline = time.monotonic() + timeout
+    while True:
+        measured = motion_service.getAngles("HeadYaw", True)[0] / deg_to_rad
+        if abs(measured - angle_degrees) <= tolerance:
+            return True
+        if time.monotonic() > deadline:
+            print(f"[MOTION] HeadYaw at {measured:.1f} deg, expected {angle_degrees} deg")
+            return False
+        time.sleep(0.01)
@@ -0,0 +1,73 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from motion import lowerGun
+
+
+class TaskPreemptor(object):
+    """
+    Interrupts the running robot task: cancels the asyncio task (and with it the
+    LLM stream), stops walking and speech and lowers the gun.
+
+    NAOqi calls block until the robot answers, so they are fired in parallel on
+    a small thread pool and never on the event loop. Every tracked task gets its
+    own abort event for its synchronous LLM tools to bail out of their waits; an
+    event is only ever set, so a tool of a cancelled task still running on an
+    executor thread cannot be re-armed by the next task.
+    """
+    def __init__(self, motion_service, tts, budget=0.1):
+        self.motion_service = motion_service
+        self.tts = tts
+        self.abort_event = threading.Event()  # of the tracked task
+        self.budget = budget  # seconds allowed until stopMove and stopAll returned
+        self.task = None
+        self.latencies = deque(maxlen=50)
+        self._executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="preempt")
+
+    def track(self, task):
+        """
+        Marks `task` as the one to cancel. Returns the new abort event of the task.
+        """
+        self.task = task
+        self.abort_event = threading.Event()
+        return self.abort_event
+
+    def preempt(self, reason=""):
+        """
+        Stops everything without blocking the caller.
+
+        Returns:
+            A Future resolved with the latency (seconds) until the task was cancelled
+            and both stopMove and stopAll returned.
+        """
+        started = time.monotonic()
+        self.abort_event.set()
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+        stops = [
+            self._executor.submit(self.motion_service.stopMove),
+            self._executor.submit(self.tts.stopAll),
+        ]
+        # Lowering the arm takes about a second; it is started, not waited for
+        self._executor.submit(lowerGun, self.motion_service)
+
+        result = Future()
+        remaining = [len(stops)]
+        lock = threading.Lock()
+
+        def on_stopped(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            latency = time.monotonic() - started
+            self.latencies.append(latency)
+            status = "OK" if latency <= self.budget else f"over {self.budget * 1000:.0f} ms budget"
+            print(f"[PREEMPT] Stopped ({reason}) in {latency * 1000:.0f} ms - {status}")
+            result.set_result(latency)
+
+        for stop in stops:
+            stop.add_done_callback(on_stopped)
+        return result
@@ -1,19 +1,40 @@
-from pydantic_ai import BinaryContent
-from camera import take_picture
+from camera import take_picture, MIN_SHARPNESS
 from LLM_and_saying import LLMAndSaying
-import cv2
+from preemption import TaskPreemptor
+from scene_cache import SceneCache
+import asyncio
+import time
+
+SCENE_BACKOFF = 1.0  # seconds to wait for a command after a step with an unchanged scene
+SCENE_BACKOFF_MAX = 8.0
 
 
 class RobotActionHandler:
-    def __init__(self, motion_service, video_service, vid_handle, sound_module, tts, language):
+    def __init__(self, motion_service, video_service, vid_handle, sound_module, tts, language, command_bus,
+                 look_around_mode='frames', camera_manager=None):
         self.sound_module = sound_module
+        self.command_bus = command_bus
         self.tts = tts
         self.video_service = video_service
         self.vid_handle = vid_handle
         self.motion_service = motion_service
+        self.camera_manager = camera_manager  # pool of subscriptions per resolution, optional
         # Initialize LLM agent here
-        self.llm_agent = LLMAndSaying(motion_service, video_service, vid_handle, sound_module=sound_module, speech_service=tts, language=language)
+        self.llm_agent = LLMAndSaying(motion_service, video_service, vid_handle, sound_module=sound_module, speech_service=tts, language=language,
+                                      look_around_mode=look_around_mode, camera_manager=camera_manager)
+        self.is_idle = True
+        self.preemptor = TaskPreemptor(motion_service, tts)
+        # Only match frames the LLM still sees in its compacted history
+        self.scene_cache = SceneCache(max_steps=self.llm_agent.history_manager.keep_image_steps)
+        self.step = 0
+        self.unchanged_steps = 0  # consecutive steps without a new image
+
+    def preempt(self, command):
+        """Stop the running task right away (registered as a CommandBus preempt handler)."""
+        print(f"[ROBOT_TASK] Preempting task on command: '{command.text}'")
         self.is_idle = True
+        self.llm_agent.speech_queue.clear()  # queued sentences must not be spoken after "stop"
+        return self.preemptor.preempt(reason=command.text)
 
     def close_bt(self):
         self.llm_agent.bt.close() if self.llm_agent.bt else None
@@ -21,58 +42,105 @@ class RobotActionHandler:
     async def run_task(self, initial_command):
         """Execute complete robot task from initial command until completion"""
         print(f"[ROBOT_TASK] Starting robot task with initial command: '{initial_command}'")
+        abort_event = self.preemptor.track(asyncio.current_task())  # handed to this task's tools only
         self.llm_agent.reset_conversation()  # Reset conversation for new task
+        self.scene_cache.clear()  # the new conversation has no images yet
+        self.unchanged_steps = 0
         self.is_idle = False
         current_command = initial_command
 
         print("[ROBOT_TASK] Entering task execution loop...")
         while not self.is_idle:
             #print(f"[ROBOT_TASK] Executing action step with command: '{current_command}'")
-            self.is_idle = await self._execute_single_step(current_command)
+            self.is_idle = await self._execute_single_step(current_command, abort_event)
             print(f"[ROBOT_TASK] Action step completed. Is idle: {self.is_idle}")
 
             # Check for new commands during task execution
             if not self.is_idle:
-                if self.sound_module.stt_output is not None:
-                    current_command = self.sound_module.stt_output
-                    self.sound_module.stt_output = None
+                command = self.command_bus.get_nowait()
+                if command is None and self.unchanged_steps:
+                    command = await self._wait_for_command()
+                if command is not None:
+                    current_command = command.text
                     print(f"[ROBOT_TASK] Got new command during task: '{current_command}' - incorporating into task")
                 else:
                     current_command = ""  # Continue working
                     print("[ROBOT_TASK] No new command, continuing task execution...")
 
         print(f"[ROBOT_TASK] Task completed successfully, exiting loop")
+        if self.camera_manager is not None:
+            self.camera_manager.report()  # bandwidth and time saved by the lower resolutions
 
-    async def _execute_single_step(self, user_command):
-        """Execute a single perception-decision-action cycle"""
+    async def _wait_for_command(self):
+        """Backs off when nothing changes: waits for a command, longer after every unchanged step."""
+        backoff = min(SCENE_BACKOFF_MAX, SCENE_BACKOFF * 2 ** (self.unchanged_steps - 1))
+        print(f"[ROBOT_TASK] Scene unchanged, waiting up to {backoff:.0f} s for a command")
+        try:
+            return await asyncio.wait_for(self.command_bus.get(), backoff)
+        except asyncio.TimeoutError:
+            return None
+
+    def _robot_pose(self):
+        """Odometry (x, y, theta) and head yaw in degrees, used to key the scene cache."""
+        pose = self.motion_service.getRobotPosition(True)
+        head_yaw = self.motion_service.getAngles("HeadYaw", True)[0] / 0.017453
+        return pose, head_yaw
+
+    def _perceive(self, user_command):
+        """Captures the front view and builds the user message for this step (runs on a worker thread)."""
         # Capture environment after robot finished previous move
         self.motion_service.waitUntilMoveIsFinished()
-        camera_buffer = take_picture(self.video_service, self.vid_handle, add_vertical_grid=True)
-
-        # Encode the image to JPEG, then convert to bytes for the LLM
-        _, buffer = cv2.imencode('.jpg', camera_buffer, [cv2.IMWRITE_JPEG_QUALITY, 70])
-        photo_bytes = buffer.tobytes()
-        photo_content = BinaryContent(data=photo_bytes, media_type='image/jpeg')
-
-        # save to file
-        with open("pepper_image_front.jpg", 'wb') as f:
-            f.write(buffer)
-
-        # Prepare multimodal input
-        user_input = [
-            f"Human voice command: '{user_command}'.\n\nThat's what you see on the front:" if user_command else "That's what you see on the front (image just for your information):",
-            photo_content
-        ]
+        moved_at = time.time()
+        # No frame from before the move ended and no blurred one, retried for up to 1 s
+        video_service, vid_handle = self.llm_agent._camera("navigation", self.video_service, self.vid_handle)
+        camera_buffer = take_picture(video_service, vid_handle, add_vertical_grid=True, reuse_buffer=True,
+                                     not_older_than=moved_at, min_sharpness=MIN_SHARPNESS)
+        self.step += 1
+
+        # Do not send the same view again while the robot stands still
+        pose, head_yaw = self._robot_pose()
+        cached, signature = self.scene_cache.lookup(camera_buffer, pose, head_yaw, step=self.step)
+        if cached is not None:
+            self.unchanged_steps += 1
+            stats = self.scene_cache.stats()
+            print(f"[SCENE_CACHE] Scene unchanged since step {cached.step}, image not sent "
+                  f"({stats['hits']} hits, {stats['misses']} misses, {stats['bytes_saved'] / 1024:.0f} KB saved)")
+            scene = f"The scene in front is unchanged since the last image (step {cached.step}), no new image sent."
+            user_input = [f"Human voice command: '{user_command}'.\n\n{scene}" if user_command else scene]
+        else:
+            self.unchanged_steps = 0
+            # Encode the image to JPEG within the image budget
+            photo = self.llm_agent.image_shaper.shape(camera_buffer, name="front camera")
+            photo_content = photo.content()
+            self.scene_cache.add(signature, pose, head_yaw, photo.size, step=self.step)
+
+            # save to file
+            with open("pepper_image_front.jpg", 'wb') as f:
+                f.write(photo.data)
+
+            # Prepare multimodal input
+            user_input = [
+                f"Human voice command: '{user_command}'.\n\nThat's what you see on the front:" if user_command else "That's what you see on the front (image just for your information):",
+                photo_content
+            ]
         # user_input = [
         #     f"Human voice command: '{user_command}'.\n\n"
         # ]
+        return user_input
+
+    async def _execute_single_step(self, user_command, abort_event=None):
+        """Execute a single perception-decision-action cycle"""
+        # Capture, shaping and the cache lookup block for up to ~1 s, off the event loop
+        # so a preempting "stop" still runs right away
+        user_input = await asyncio.to_thread(self._perceive, user_command)
 
         # Get LLM response and execute actions
         is_idle = await self.llm_agent.generate_say_execute_response(
             user_input,
             self.tts,
             self.sound_module,
-            is_idle=self.is_idle
+            is_idle=self.is_idle,
+            abort_event=abort_event
         )
         print()  # Add newline after streaming
 
@@ -0,0 +1,105 @@
+import math
+import time
+from collections import deque
+import cv2
+import numpy as np
+
+
+HASH_SIZE = 8
+THUMBNAIL_SIZE = (32, 24)
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """
+    Difference hash of a BGR image: compares neighbouring pixels of a
+    (hash_size + 1) x hash_size grayscale thumbnail. Returns an int of hash_size**2 bits.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def thumbnail(image, size=THUMBNAIL_SIZE):
+    """Small grayscale copy of a BGR image used for the pixel difference."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+class SceneEntry(object):
+    """A frame that was sent to the LLM, reduced to what is needed to recognize it again."""
+    def __init__(self, image_hash, thumb, pose, head_yaw, size, step):
+        self.image_hash = image_hash
+        self.thumb = thumb
+        self.pose = pose  # (x, y, theta) odometry from ALMotion.getRobotPosition
+        self.head_yaw = head_yaw  # degrees
+        self.size = size  # bytes of the image that was sent
+        self.step = step
+        self.timestamp = time.time()
+
+
+class SceneCache(object):
+    """
+    Remembers the last frames sent to the LLM so an unchanged view is not sent again.
+
+    A new frame matches a cached one when the robot pose (odometry) and head yaw
+    are within tolerance AND the image is the same: dHash Hamming distance at most
+    `max_hamming` and mean absolute difference of the grayscale thumbnails at most
+    `max_diff` gray levels. Entries older than `max_age` seconds or `max_steps`
+    steps are ignored, so a match always refers to an image the LLM still has in
+    its (compacted) history.
+    """
+    def __init__(self, max_hamming=4, max_diff=6.0, max_translation=0.05, max_rotation=2.0,
+                 max_head_yaw=2.0, max_age=60.0, max_steps=None, history=4):
+        self.max_hamming = max_hamming
+        self.max_diff = max_diff
+        self.max_translation = max_translation  # meters
+        self.max_rotation = max_rotation  # degrees
+        self.max_head_yaw = max_head_yaw  # degrees
+        self.max_age = max_age
+        self.max_steps = max_steps
+        self.entries = deque(maxlen=history)
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def _same_pose(self, entry, pose, head_yaw):
+        dx = pose[0] - entry.pose[0]
+        dy = pose[1] - entry.pose[1]
+        dtheta = math.degrees(abs(math.atan2(math.sin(pose[2] - entry.pose[2]), math.cos(pose[2] - entry.pose[2]))))
+        return (math.hypot(dx, dy) <= self.max_translation and dtheta <= self.max_rotation
+                and abs(head_yaw - entry.head_yaw) <= self.max_head_yaw)
+
+    def _expired(self, entry, now, step):
+        return now - entry.timestamp > self.max_age or (
+            self.max_steps is not None and step - entry.step > self.max_steps)
+
+    def lookup(self, image, pose, head_yaw=0.0, step=0):
+        """
+        Returns (matching SceneEntry or None, (hash, thumbnail)) for a new frame.
+        Pass the returned signature to add() if the frame is sent after all.
+        """
+        signature = (dhash(image), thumbnail(image))
+        now = time.time()
+        for entry in reversed(self.entries):
+            if self._expired(entry, now, step) or not self._same_pose(entry, pose, head_yaw):
+                continue
+            if bin(entry.image_hash ^ signature[0]).count("1") > self.max_hamming:
+                continue
+            if np.abs(entry.thumb - signature[1]).mean() > self.max_diff:
+                continue
+            self.hits += 1
+            self.bytes_saved += entry.size
+            return entry, signature
+        self.misses += 1
+        return None, signature
+
+    def add(self, signature, pose, head_yaw, size, step=0):
+        """Remembers a frame that was sent to the LLM in step `step`."""
+        self.entries.append(SceneEntry(signature[0], signature[1], pose, head_yaw, size, step))
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "bytes_saved": self.bytes_saved}
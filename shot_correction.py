@@ -0,0 +1,129 @@
+import sys
+import time
+import threading
+from pathlib import Path
+from camera import GUN_CAMERA_HFOV, GUN_CAMERA_VFOV
+
+# Imported as top-level bottle_detector like tracker.py and the detector scripts do,
+# so one process has one module and one get_detector cache
+sys.path.append(str(Path(__file__).resolve().parent / "vla_and_vision"))
+from bottle_detector import DEFAULT_WEIGHTS, get_detector
+
+
+LOCAL_MIN_CONFIDENCE = 0.5  # below it the LLM decides the correction
+# Words in the shoot tool's target_name -> COCO class the local detector can find
+TARGET_CLASSES = {
+    "bottle": 39, "butelk": 39, "butel": 39,
+    "cup": 41, "kubek": 41, "kubk": 41,
+}
+
+
+def target_class(target_name):
+    """COCO class id for a target description, or None if the detector does not know it."""
+    name = target_name.lower()
+    for word, class_id in TARGET_CLASSES.items():
+        if word in name:
+            return class_id
+    return None
+
+
+def pixel_to_angles(x, y, width, height, hfov=GUN_CAMERA_HFOV, vfov=GUN_CAMERA_VFOV):
+    """
+    Angles of a gun camera pixel from the image center, as the crosshair labels
+    them: (vertical, + = up; horizontal, + = left) in degrees.
+    """
+    center_x, center_y = width // 2, height // 2
+    horizontal = (1 - x / center_x) * hfov / 2
+    vertical = (1 - y / center_y) * vfov / 2
+    return vertical, horizontal
+
+
+class ShotCorrection(object):
+    """Aim correction in degrees and where it came from ('local' or 'llm')."""
+    def __init__(self, vertical, horizontal, source, latency, confidence=None, box=None):
+        self.vertical = vertical  # + = up
+        self.horizontal = horizontal  # + = left
+        self.source = source
+        self.latency = latency  # ms from the photo to the correction
+        self.confidence = confidence
+        self.box = box
+
+    def __repr__(self):
+        return (f"ShotCorrection(V={self.vertical:.1f}, H={self.horizontal:.1f}, source={self.source}, "
+                f"{self.latency:.0f} ms)")
+
+
+class ShotCorrector(object):
+    """
+    Computes the last aim correction before firing from the gun camera photo.
+
+    The bottle detector looks for the target in the photo; the box center closest
+    to the crosshair is converted to degrees with the gun camera field of view.
+    Only when the target class is unknown to the detector or no detection reaches
+    `min_confidence` is the fallback (the LLM reading the crosshair) asked. The
+    detector is loaded in the background at start so the first shot does not wait.
+    """
+    def __init__(self, weights=DEFAULT_WEIGHTS, min_confidence=LOCAL_MIN_CONFIDENCE, preload=True):
+        self.weights = weights
+        self.min_confidence = min_confidence
+        self._detector = None
+        self._lock = threading.Lock()
+        self.latencies = {"local": [], "llm": []}
+        if preload:
+            threading.Thread(target=self._load, name="shot_detector_preload", daemon=True).start()
+
+    def _load(self):
+        with self._lock:
+            if self._detector is None:
+                self._detector = get_detector(self.weights)
+            return self._detector
+
+    def estimate(self, image, target_name):
+        """
+        Local correction for the target, or None when the detector is not sure.
+        Returns (ShotCorrection or None, best confidence seen).
+        """
+        started = time.perf_counter()
+        class_id = target_class(target_name)
+        if class_id is None:
+            return None, None
+        height, width = image.shape[:2]
+        candidates = [d for d in self._load().detect(image).detections if d.class_id == class_id]
+        best_confidence = max((d.confidence for d in candidates), default=0.0)
+        candidates = [d for d in candidates if d.confidence >= self.min_confidence]
+        if not candidates:
+            return None, best_confidence
+
+        def distance_to_center(detection):
+            x1, y1, x2, y2 = detection.box
+            return ((x1 + x2) / 2 - width / 2) ** 2 + ((y1 + y2) / 2 - height / 2) ** 2
+
+        target = min(candidates, key=distance_to_center)
+        x1, y1, x2, y2 = target.box
+        vertical, horizontal = pixel_to_angles((x1 + x2) / 2, (y1 + y2) / 2, width, height)
+        latency = (time.perf_counter() - started) * 1000
+        return ShotCorrection(vertical, horizontal, "local", latency, target.confidence, target.box), target.confidence
+
+    def correct(self, image, target_name, fallback):
+        """
+        Correction for the target in the gun camera `image`. `fallback(image)`
+        returns (vertical, horizontal) degrees and is called only if the local path fails.
+        """
+        started = time.perf_counter()
+        correction, confidence = self.estimate(image, target_name)
+        if correction is None:
+            reason = "unknown target class" if confidence is None else f"best confidence {confidence:.2f}"
+            print(f"[SHOT] no local detection of '{target_name}' ({reason}), asking the LLM")
+            vertical, horizontal = fallback(image)
+            correction = ShotCorrection(vertical, horizontal, "llm", (time.perf_counter() - started) * 1000)
+        self.latencies[correction.source].append(correction.latency)
+        print(f"[SHOT] {correction.source} correction V: {correction.vertical:.1f} deg, "
+              f"H: {correction.horizontal:.1f} deg in {correction.latency:.0f} ms")
+        return correction
+
+    def report(self):
+        """Number of corrections and mean latency per path."""
+        for source, latencies in self.latencies.items():
+            if latencies:
+                print(f"[SHOT] {source}: {len(latencies)} corrections, "
+                      f"mean {sum(latencies) / len(latencies):.0f} ms")
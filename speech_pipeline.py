@@ -0,0 +1,149 @@
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# --- Sentence segmentation ---
+
+SENTENCE_END = ".!?…"
+CLOSING_CHARS = "\"')]»”"
+# Words followed by a dot that do not end a sentence (Polish and English)
+ABBREVIATIONS = {"np", "itp", "itd", "tzn", "tj", "dr", "prof", "inż", "mgr", "ok", "ul", "godz",
+                 "mr", "mrs", "ms", "st", "vs", "etc", "e.g", "i.e"}
+
+
+class SentenceSegmenter(object):
+    """
+    Splits streamed LLM text into sentences as soon as they are complete.
+
+    A sentence ends at . ! ? or … (plus closing quotes/brackets) followed by
+    whitespace, or at a newline. Decimal numbers, abbreviations and initials do
+    not end a sentence. Clauses longer than `max_chars` are cut at the last comma
+    so the robot does not wait for a very long sentence.
+    """
+    def __init__(self, max_chars=200):
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._scan = 0  # index in the buffer from which to continue looking for a boundary
+
+    def push(self, text):
+        """
+        Adds streamed text and returns the list of sentences completed by it.
+        """
+        buf = self._buffer + text
+        sentences = []
+        start = 0
+        i = self._scan
+        while i < len(buf):
+            ch = buf[i]
+            if ch == "\n":
+                sentences.append(buf[start:i])
+                start = i = i + 1
+                continue
+            if ch in SENTENCE_END:
+                j = i + 1
+                while j < len(buf) and (buf[j] in SENTENCE_END or buf[j] in CLOSING_CHARS):
+                    j += 1
+                if j == len(buf):
+                    break  # need the next character to know if the sentence ended
+                if buf[j].isspace() and not self._is_abbreviation(buf, start, i):
+                    sentences.append(buf[start:j])
+                    start = j
+                i = j
+                continue
+            i += 1
+
+        self._buffer = buf[start:]
+        self._scan = i - start
+        if len(self._buffer) > self.max_chars:
+            cut = self._buffer.rfind(", ", 0, self.max_chars)
+            if cut > 0:
+                sentences.append(self._buffer[:cut + 1])
+                self._buffer = self._buffer[cut + 2:]
+                self._scan = 0
+        return [s.strip() for s in sentences if s.strip()]
+
+    def flush(self):
+        """
+        Returns whatever text is left (or None) and resets the segmenter.
+        """
+        rest = self._buffer.strip()
+        self._buffer = ""
+        self._scan = 0
+        return rest or None
+
+    @staticmethod
+    def _is_abbreviation(buf, start, dot_index):
+        if buf[dot_index] != ".":
+            return False
+        words = buf[start:dot_index].split()
+        if not words:
+            return False
+        word = words[-1].lower().lstrip("(\"'")
+        return word in ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+
+# --- Speech queue ---
+
+class SpeechQueue(object):
+    """
+    Speaks sentences in order on a dedicated TTS thread so the event loop keeps
+    consuming LLM tokens while the robot talks.
+
+    speak() only enqueues. drain() waits until everything queued was said and
+    clear() drops what has not been said yet. The delay between begin() (the
+    request to the LLM) and the first say() is reported as time-to-first-word.
+    """
+    def __init__(self, speech_service):
+        self.speech_service = speech_service
+        self.first_word_latencies = deque(maxlen=50)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+        self._queue = asyncio.Queue()
+        self._consumer = None
+        self._requested_at = None
+
+    def begin(self):
+        """
+        Marks the moment the LLM request was sent.
+        """
+        self._requested_at = time.monotonic()
+
+    def speak(self, sentence):
+        """
+        Queues a sentence without waiting for it to be spoken.
+        """
+        if self._consumer is None or self._consumer.done():
+            self._consumer = asyncio.get_running_loop().create_task(self._consume())
+        self._queue.put_nowait(sentence)
+
+    async def drain(self):
+        """
+        Waits until every queued sentence has been spoken.
+        """
+        await self._queue.join()
+
+    def clear(self):
+        """
+        Drops sentences that have not started yet (the current one is stopped with tts.stopAll).
+        """
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+        self._requested_at = None
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            sentence = await self._queue.get()
+            try:
+                if self._requested_at is not None:
+                    latency = time.monotonic() - self._requested_at
+                    self._requested_at = None
+                    self.first_word_latencies.append(latency)
+                    print(f"\n[TTS] Time to first word: {latency * 1000:.0f} ms")
+                await loop.run_in_executor(self._executor, self.speech_service.say, sentence)
+            except Exception as e:
+                print(f"[TTS] Error while speaking: {e}")
+            finally:
+                self._queue.task_done()
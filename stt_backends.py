@@ -0,0 +1,183 @@
+import os
+import abc
+import json
+import numpy as np
+import requests
+import speech_recognition as sr
+from audio_codec import resample, encode_payload
+
+
+# --- Speech-to-text backends ---
+# Every backend takes 16 kHz mono int16 NumPy arrays. Streaming backends decode
+# chunks as they arrive; the others collect the chunks and recognize the whole
+# utterance at end_stream(). Errors are reported with the speech_recognition
+# exception types so callers handle every backend the same way.
+
+
+class STTBackend(abc.ABC):
+    """
+    Base class. Whole-utterance backends only implement recognize().
+    """
+    sample_rate = 16000
+    streaming = False
+
+    @abc.abstractmethod
+    def recognize(self, samples):
+        """
+        Recognizes a complete utterance and returns its transcript.
+        """
+
+    def start_stream(self):
+        self._chunks = []
+
+    def accept_chunk(self, samples):
+        """
+        Feeds the next chunk and returns the current partial hypothesis (or None).
+        """
+        self._chunks.append(np.array(samples, dtype=np.int16))
+        return None
+
+    def end_stream(self):
+        """
+        Ends the utterance and returns the final hypothesis.
+        """
+        chunks, self._chunks = self._chunks, []
+        if not chunks:
+            return None
+        return self.recognize(np.concatenate(chunks))
+
+    def close(self):
+        pass
+
+
+GOOGLE_SPEECH_KEY_ENV = "GOOGLE_SPEECH_KEY"  # environment variable (or .env entry) with the API key
+GOOGLE_SPEECH_URL = "http://www.google.com/speech-api/v2/recognize"
+
+
+def default_google_key():
+    """
+    The generic key speech_recognition's recognize_google falls back to, or None
+    if the installed SpeechRecognition keeps it inside recognize_google (< 3.10.1).
+    """
+    try:
+        from speech_recognition.recognizers.google import create_request_builder
+    except ImportError:
+        return None
+    return create_request_builder(endpoint=GOOGLE_SPEECH_URL).key
+
+
+class GoogleBackend(STTBackend):
+    """
+    Adapter for the Google speech API used so far.
+
+    Same request as speech_recognition.Recognizer.recognize_google, but over one
+    HTTP session kept alive between utterances. Audio is low-pass resampled to
+    `upload_rate` and encoded with `codec` (see audio_codec.encode_payload).
+    The API key is `key`, the GOOGLE_SPEECH_KEY environment variable or, like
+    recognize_google, speech_recognition's generic key that works without setup.
+    """
+    def __init__(self, language="pl-PL", key=None, pfilter=1, timeout=10,
+                 upload_rate=8000, codec="flac"):
+        self.language = language
+        self.key = key or os.getenv(GOOGLE_SPEECH_KEY_ENV) or default_google_key()
+        if not self.key:
+            raise ValueError(f"Google speech API key missing: set {GOOGLE_SPEECH_KEY_ENV} in the environment "
+                             f"or .env, or install SpeechRecognition>=3.10.1 for its generic key")
+        self.pfilter = pfilter
+        self.timeout = timeout
+        self.upload_rate = upload_rate  # 8 kHz keeps the upload as small as the old decimation
+        self.codec = codec
+        self.session = requests.Session()
+
+    def recognize(self, samples):
+        return self.recognize_pcm(resample(samples, self.sample_rate, self.upload_rate), self.upload_rate)
+
+    def recognize_pcm(self, samples, sample_rate):
+        """
+        Encodes mono int16 samples and returns the best transcript.
+        """
+        payload, content_type = encode_payload(samples, sample_rate, self.codec)
+        return self.recognize_payload(payload, content_type)
+
+    def recognize_payload(self, payload, content_type):
+        """
+        Sends an already encoded payload and returns the best transcript.
+        """
+        try:
+            response = self.session.post(
+                GOOGLE_SPEECH_URL,
+                params={"client": "chromium", "lang": self.language, "key": self.key, "pFilter": self.pfilter},
+                data=payload,
+                headers={"Content-Type": content_type},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise sr.RequestError(f"recognition connection failed: {e}")
+
+        # The response is a series of JSON objects, the first non-empty one holds the result
+        for line in response.text.split("\n"):
+            if not line:
+                continue
+            result = json.loads(line).get("result", [])
+            if result:
+                alternatives = result[0].get("alternative", [])
+                if alternatives:
+                    best = max(alternatives, key=lambda alt: alt.get("confidence", 0))
+                    return best["transcript"]
+        raise sr.UnknownValueError()
+
+    def close(self):
+        self.session.close()
+
+
+class VoskBackend(STTBackend):
+    """
+    Offline streaming recognizer running on the laptop CPU (https://alphacephei.com/vosk/).
+
+    Needs `pip install vosk` and a model directory, e.g. vosk-model-small-pl-0.22
+    or vosk-model-small-en-us-0.15.
+    """
+    streaming = True
+
+    def __init__(self, model_path, sample_rate=16000):
+        from vosk import Model, KaldiRecognizer
+
+        self.sample_rate = sample_rate
+        self.model = Model(model_path)
+        self._recognizer_class = KaldiRecognizer
+        self._recognizer = None
+        self._segments = []
+
+    def start_stream(self):
+        self._recognizer = self._recognizer_class(self.model, self.sample_rate)
+        self._segments = []
+
+    def accept_chunk(self, samples):
+        if self._recognizer is None:
+            self.start_stream()
+        if self._recognizer.AcceptWaveform(np.ascontiguousarray(samples, dtype=np.int16).tobytes()):
+            # Vosk closed a segment on its own; keep it and start a new partial
+            text = json.loads(self._recognizer.Result()).get("text", "")
+            if text:
+                self._segments.append(text)
+            return " ".join(self._segments) or None
+        partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        return " ".join(self._segments + [partial]).strip() or None
+
+    def end_stream(self):
+        if self._recognizer is None:
+            return None
+        text = json.loads(self._recognizer.FinalResult()).get("text", "")
+        self._recognizer = None
+        if text:
+            self._segments.append(text)
+        final = " ".join(self._segments).strip()
+        if not final:
+            raise sr.UnknownValueError()
+        return final
+
+    def recognize(self, samples):
+        self.start_stream()
+        self.accept_chunk(samples)
+        return self.end_stream()
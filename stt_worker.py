@@ -0,0 +1,185 @@
+import time
+import queue
+import threading
+from collections import deque
+
+
+class RecognitionWorkerPool(object):
+    """
+    Long-lived speech recognition workers fed by a bounded queue.
+
+    `recognize(recording)` runs on a worker thread and `on_result(text)` is called
+    with its return value (None when nothing was recognized). With `drop_stale`
+    a newly submitted utterance replaces any that are still waiting, so the robot
+    always reacts to the latest command instead of working through a backlog.
+    """
+    def __init__(self, recognize, on_result, workers=1, max_queue=2, drop_stale=True, name="STT"):
+        self.recognize = recognize
+        self.on_result = on_result
+        self.drop_stale = drop_stale
+        self.name = name
+        self.dropped = 0
+        self.processed = 0
+        self.latencies = deque(maxlen=50)  # (queue wait, recognition time) in seconds
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    @property
+    def is_idle(self):
+        with self._lock:
+            return self._busy == 0 and self._queue.empty()
+
+    def submit(self, recording):
+        """
+        Queues an utterance for recognition without blocking the caller.
+        """
+        item = (time.monotonic(), recording)
+        if self.drop_stale:
+            self._drop_waiting()
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                break
+            except queue.Full:
+                # Backpressure: the oldest waiting utterance is the least relevant one
+                self._drop_oldest()
+
+    def _drop_oldest(self):
+        try:
+            self._queue.get_nowait()
+            self.dropped += 1
+            print(f"[{self.name}] Dropped stale utterance (queue depth {self.queue_depth}).")
+        except queue.Empty:
+            pass
+
+    def _drop_waiting(self):
+        while not self._queue.empty():
+            self._drop_oldest()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            queued_at, recording = item
+            with self._lock:
+                self._busy += 1
+            started_at = time.monotonic()
+            text = None
+            try:
+                text = self.recognize(recording)
+            except Exception as e:
+                print(f"[{self.name}] Error during recognition: {e}")
+            finally:
+                finished_at = time.monotonic()
+                self.latencies.append((started_at - queued_at, finished_at - started_at))
+                self.processed += 1
+                with self._lock:
+                    self._busy -= 1
+            print(f"[{self.name}] Waited {started_at - queued_at:.2f}s, recognized in "
+                  f"{finished_at - started_at:.2f}s, queue depth {self.queue_depth}.")
+            self.on_result(text)
+
+    def stats(self):
+        """
+        Returns queue depth, drop count and recognition latency figures.
+        """
+        recognition = [latency for _, latency in self.latencies]
+        waits = [wait for wait, _ in self.latencies]
+        return {
+            "queue_depth": self.queue_depth,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "mean_wait_s": sum(waits) / len(waits) if waits else 0.0,
+            "mean_recognition_s": sum(recognition) / len(recognition) if recognition else 0.0,
+            "last_recognition_s": recognition[-1] if recognition else None,
+        }
+
+    def close(self):
+        """
+        Stops the workers after the utterances already queued.
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+class StreamingRecognitionWorker(object):
+    """
+    Feeds audio chunks to a streaming STT backend on a dedicated thread.
+
+    The audio callback only enqueues chunks; decoding happens here while the
+    person is still talking, so the final hypothesis is ready right after the
+    end of speech. `on_partial(text)` is called whenever the hypothesis changes,
+    `on_result(text)` once per utterance.
+    """
+    def __init__(self, backend, on_result, on_partial=None, name="STT-stream"):
+        self.backend = backend
+        self.on_result = on_result
+        self.on_partial = on_partial
+        self.name = name
+        self.latencies = deque(maxlen=50)  # end of speech -> final hypothesis, seconds
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def start(self, samples=None):
+        self._queue.put(("start", samples))
+
+    def feed(self, samples):
+        self._queue.put(("chunk", samples))
+
+    def end(self):
+        self._queue.put(("end", time.monotonic()))
+
+    def cancel(self):
+        self._queue.put(("cancel", None))
+
+    def _run(self):
+        active = False
+        last_partial = None
+        while True:
+            kind, payload = self._queue.get()
+            try:
+                if kind == "stop":
+                    break
+                if kind == "start":
+                    self.backend.start_stream()
+                    active, last_partial = True, None
+                    if payload is not None and len(payload):
+                        self.backend.accept_chunk(payload)
+                elif kind == "chunk" and active:
+                    partial = self.backend.accept_chunk(payload)
+                    if partial and partial != last_partial and self.on_partial is not None:
+                        last_partial = partial
+                        self.on_partial(partial)
+                elif kind == "end" and active:
+                    active = False
+                    text = self.backend.end_stream()
+                    self.latencies.append(time.monotonic() - payload)
+                    print(f"[{self.name}] Final hypothesis {self.latencies[-1] * 1000:.0f} ms after end of speech.")
+                    self.on_result(text or None)
+                elif kind == "cancel" and active:
+                    active = False
+                    self.backend.end_stream()
+            except Exception as e:
+                active = False
+                print(f"[{self.name}] Error during streaming recognition: {e}")
+                if kind == "end":
+                    self.on_result(None)
+
+    def close(self):
+        self._queue.put(("stop", None))
+        self._thread.join()
@@ -0,0 +1,58 @@
+"""
+History compaction staying inside the byte budget.
+
+Usage:
+    python -m pytest tests/test_history_manager.py -q
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+pytest.importorskip("pydantic_ai")
+
+from pydantic_ai.messages import BinaryContent, ModelRequest, ModelResponse, SystemPromptPart, TextPart, UserPromptPart
+from history_manager import HistoryManager, _is_image
+
+
+def fake_jpeg(size):
+    """JPEG-looking bytes of `size` with a 640x480 SOF header."""
+    header = b"\xff\xd8" + b"\xff\xc0\x00\x11\x08" + (480).to_bytes(2, "big") + (640).to_bytes(2, "big")
+    return header + b"\x00" * (size - len(header))
+
+
+def step(text, image_size, system_prompt=None):
+    parts = [SystemPromptPart(system_prompt)] if system_prompt else []
+    parts.append(UserPromptPart([text, BinaryContent(fake_jpeg(image_size), media_type="image/jpeg")]))
+    return [ModelRequest(parts=parts), ModelResponse(parts=[TextPart("Walking to the bottle.")])]
+
+
+def images(messages):
+    return [item for m in messages for part in m.parts
+            if isinstance(part, UserPromptPart) and not isinstance(part.content, str)
+            for item in part.content if _is_image(item)]
+
+
+def test_last_step_over_budget_loses_its_images():
+    history = HistoryManager(max_bytes=100_000)
+    messages = step("first", 80_000, system_prompt="You are Pepper.") + step("second", 150_000)
+
+    compacted = history.compact(messages)
+
+    size, _ = history.payload_size(compacted)
+    assert size <= history.max_bytes
+    assert images(compacted) == []
+    assert isinstance(compacted[0].parts[0], SystemPromptPart)  # kept from the dropped first step
+    assert "removed to save context" in compacted[0].parts[-1].content[1]
+
+
+def test_steps_within_budget_keep_their_images():
+    history = HistoryManager(max_bytes=400_000)
+    messages = step("first", 80_000, system_prompt="You are Pepper.") + step("second", 150_000)
+
+    compacted = history.compact(messages)
+
+    assert len(images(compacted)) == 2
@@ -0,0 +1,313 @@
+"""
+Stop-command preemption with fake NAOqi services and a fake LLM.
+
+The LLM is a pydantic-ai FunctionModel that streams its answer slowly (and can
+call the shoot tool), so RobotActionHandler, LLMAndSaying streaming, the speech
+queue and the tools run for real; only the robot, the Raspberry Pi and the
+network are replaced.
+
+Usage:
+    python -m pytest tests/test_preemption.py -q
+"""
+import sys
+import time
+import asyncio
+import functools
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+pytest.importorskip("pydantic_ai")
+pytest.importorskip("dotenv")
+pytest.importorskip("logfire")
+
+from pydantic_ai import Agent
+from pydantic_ai.models.function import FunctionModel, DeltaToolCall
+import LLM_and_saying
+import robot_action_logic
+from command_bus import CommandBus
+from robot_action_logic import RobotActionHandler
+from shot_correction import ShotCorrection, ShotCorrector
+from SoundReciver import SoundReceiverModule
+
+
+class FakeMotion(object):
+    """ALMotion stand-in recording every call; moveTo blocks until stopMove."""
+    def __init__(self):
+        self.calls = []
+        self._stopped = threading.Event()
+
+    def moveTo(self, x, y, theta):
+        self.calls.append("moveTo")
+        self._stopped.wait(5)
+
+    def stopMove(self):
+        self.calls.append("stopMove")
+        self._stopped.set()
+
+    def waitUntilMoveIsFinished(self):
+        pass
+
+    def angleInterpolationWithSpeed(self, names, angles, speed, _async=False):
+        self.calls.append(("angleInterpolationWithSpeed", tuple(names)))
+
+    def getRobotPosition(self, use_sensors):
+        return [0.0, 0.0, 0.0]
+
+    def getAngles(self, names, use_sensors):
+        return [0.0]
+
+    def getExternalCollisionProtectionEnabled(self, name):
+        return True
+
+
+class FakeTTS(object):
+    """ALTextToSpeech stand-in: say() takes `duration` seconds unless stopAll() interrupts it."""
+    def __init__(self, duration=0.3):
+        self.duration = duration
+        self.said = []
+        self.stop_all_calls = 0
+        self._stop = threading.Event()
+
+    def say(self, sentence):
+        self.said.append(sentence)
+        self._stop.wait(self.duration)
+
+    def stopAll(self):
+        self.stop_all_calls += 1
+        self._stop.set()
+
+
+class FakeVideo(object):
+    """ALVideoDevice stand-in serving a sharp random BGR frame with the current timestamp."""
+    def __init__(self, width=320, height=240):
+        self.data = np.random.default_rng(0).integers(0, 256, width * height * 3, dtype=np.uint8).tobytes()
+        self.width, self.height = width, height
+
+    def getImageRemote(self, handle):
+        now = time.time()
+        return [self.width, self.height, 3, 13, int(now), int((now % 1) * 1e6), self.data]
+
+
+class FakeAudioDevice(object):
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+class FakeSession(object):
+    def service(self, name):
+        return FakeAudioDevice()
+
+
+class FakeSTT(object):
+    """Whole-utterance STT backend that is never called in these tests."""
+    streaming = False
+
+    def recognize(self, samples):
+        return None
+
+
+class FakeRPi(object):
+    def __init__(self):
+        self.fired = 0
+
+    def capture_image(self):
+        return np.zeros((480, 640, 3), dtype=np.uint8)
+
+    def fire(self):
+        self.fired += 1
+
+
+def slow_answer(sentences, delay=0.05):
+    """FunctionModel stream function speaking `sentences` token by token."""
+    async def stream(messages, info):
+        for sentence in sentences:
+            for word in sentence.split(" "):
+                await asyncio.sleep(delay)
+                yield word + " "
+    return stream
+
+
+def shoot_then_answer(arguments):
+    """FunctionModel stream function: calls shoot first, then answers with text."""
+    async def stream(messages, info):
+        if len(messages) == 1:
+            yield {0: DeltaToolCall(name="shoot", json_args=arguments, tool_call_id="shoot-1")}
+        else:
+            yield "Done."
+    return stream
+
+
+@pytest.fixture
+def robot(monkeypatch, tmp_path):
+    """RobotActionHandler wired to fakes; files the tools write go to tmp_path."""
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test")
+    monkeypatch.setattr(LLM_and_saying, "ShotCorrector", lambda: ShotCorrector(preload=False))
+    monkeypatch.chdir(parent_dir)  # prompts/ is read relative to the working directory
+    motion, tts, bus = FakeMotion(), FakeTTS(), CommandBus()
+    sound = SoundReceiverModule(FakeSession(), language="English", stt_backend=FakeSTT(), command_bus=bus)
+    handler = RobotActionHandler(motion, FakeVideo(), "front", sound, tts, "English", bus)
+    handler.llm_agent.rpi_controller = FakeRPi()
+    stops = []  # Futures returned by handler.preempt, resolved with the stop latency
+    bus.add_preempt_handler(lambda command: stops.append(handler.preempt(command)))
+    monkeypatch.chdir(tmp_path)
+    return SimpleNamespace(handler=handler, llm=handler.llm_agent, motion=motion, tts=tts, bus=bus, sound=sound,
+                           stops=stops)
+
+
+async def stop_latency(robot, text="stop"):
+    """
+    Says `text` as if it was just recognized and returns the seconds until the task
+    was cancelled and stopMove and stopAll returned, measured from recognition.
+    """
+    heard_at = time.monotonic()
+    robot.sound._onRecognitionResult(text)
+    while not robot.stops:
+        await asyncio.sleep(0.001)
+    await asyncio.wrap_future(robot.stops[-1])
+    return time.monotonic() - heard_at
+
+
+def use_model(robot, stream_function):
+    """
+    Replaces the LLM with a FunctionModel, keeping the real tools. Returns the
+    list the shoot tool's return values are appended to (it runs on a worker thread).
+    """
+    robot.llm.agent = Agent(FunctionModel(stream_function=stream_function),
+                            system_prompt=robot.llm.system_prompt)
+    shoot = robot.llm._shoot_tool(robot.motion)
+    shots = []
+
+    @functools.wraps(shoot)
+    def recorded_shoot(*args, **kwargs):
+        shots.append(shoot(*args, **kwargs))
+        return shots[-1]
+
+    robot.llm.agent.tool(recorded_shoot)
+    robot.llm.agent.tool(robot.llm.task_finished_tool())
+    return shots
+
+
+def test_stop_while_speaking_cancels_task_and_stops_robot(robot):
+    use_model(robot, slow_answer(["I am walking to the bottle now.", "Then I will look around it.",
+                                  "And then I will shoot it from close by."]))
+
+    async def scenario():
+        robot.bus.bind()
+        task = asyncio.create_task(robot.handler.run_task("go to the bottle"))
+        while not robot.tts.said:  # first sentence is being spoken, the rest still streams
+            await asyncio.sleep(0.01)
+        assert robot.sound.is_listening and robot.sound.stop_words_only
+
+        # The robot's own voice is ignored, a stop word goes through to the preempt handler
+        robot.sound._onRecognitionResult("I am walking to the bottle now")
+        await asyncio.sleep(0.05)
+        assert not task.done() and robot.bus.empty()
+        abort_event = robot.handler.preemptor.abort_event
+        latency = await stop_latency(robot)
+        await asyncio.wait([task], timeout=1.0)
+        return task, abort_event, latency
+
+    task, abort_event, latency = asyncio.run(scenario())
+    assert latency <= robot.handler.preemptor.budget
+    assert task.cancelled()
+    assert abort_event.is_set()
+    assert "stopMove" in robot.motion.calls
+    assert robot.tts.stop_all_calls == 1
+    assert robot.llm.speech_queue._queue.empty()
+    assert robot.tts.said == ["I am walking to the bottle now."]  # queued sentences were dropped
+    assert robot.sound.is_listening and not robot.sound.stop_words_only
+
+
+def test_later_task_does_not_rearm_old_abort_event(robot):
+    use_model(robot, slow_answer(["Looking."]))
+
+    async def scenario():
+        robot.bus.bind()
+        old = asyncio.create_task(robot.handler.run_task("shoot the bottle"))
+        await asyncio.sleep(0.05)
+        old_event = robot.handler.preemptor.abort_event
+        robot.handler.preempt(SimpleNamespace(text="stop"))
+        await asyncio.wait([old])
+        new = asyncio.create_task(robot.handler.run_task("look around"))
+        await asyncio.sleep(0.05)
+        new_event = robot.handler.preemptor.abort_event
+        new.cancel()
+        await asyncio.wait([new])
+        return old_event, new_event
+
+    old_event, new_event = asyncio.run(scenario())
+    assert old_event is not new_event
+    assert old_event.is_set() and not new_event.is_set()
+
+    # A shoot call of the old task that only now reaches its abort check must not move or fire
+    robot.motion.calls.clear()
+    shoot = robot.llm._shoot_tool(robot.motion)
+    result = shoot(SimpleNamespace(deps=old_event), 0.0, "bottle")
+    assert "stopped" in result
+    assert robot.motion.calls == []
+    assert robot.llm.rpi_controller.fired == 0
+
+
+def test_shoot_waiting_to_fire_is_aborted(robot, monkeypatch):
+    local = ShotCorrection(0.0, 0.0, "local", 1.0, confidence=0.9)
+    monkeypatch.setattr(robot.llm.shot_corrector, "correct", lambda image, target, fallback: local)
+    shots = use_model(robot, shoot_then_answer('{"vertical_angle": 0, "target_name": "bottle"}'))
+
+    async def scenario():
+        robot.bus.bind()
+        task = asyncio.create_task(robot.handler.run_task("shoot the bottle"))
+        # The tool runs on an executor thread and raises the arm before firing
+        while not any(call[0] == "angleInterpolationWithSpeed" for call in robot.motion.calls
+                      if isinstance(call, tuple)):
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        robot.sound._onRecognitionResult("stop")
+        await asyncio.wait([task], timeout=1.0)
+        return task
+
+    task = asyncio.run(scenario())
+    deadline = time.monotonic() + 3.0
+    while not shots and time.monotonic() < deadline:  # the tool thread outlives the cancelled task
+        time.sleep(0.01)
+    assert task.cancelled()
+    assert "stopMove" in robot.motion.calls
+    assert shots and "aborted" in shots[0]
+    assert robot.llm.rpi_controller.fired == 0
+
+
+
+def test_stop_during_slow_capture_is_not_delayed(robot, monkeypatch):
+    use_model(robot, slow_answer(["Looking."]))
+    heard_at = []
+
+    def hear_stop():  # the STT worker thread recognizing "stop"
+        heard_at.append(time.monotonic())
+        robot.sound._onRecognitionResult("stop")
+
+    def slow_take_picture(*args, **kwargs):  # stale/blurred frames retried for the whole time budget
+        threading.Timer(0.05, hear_stop).start()
+        time.sleep(0.5)
+        return np.zeros((240, 320, 3), dtype=np.uint8)
+
+    monkeypatch.setattr(robot_action_logic, "take_picture", slow_take_picture)
+
+    async def scenario():
+        robot.bus.bind()
+        task = asyncio.create_task(robot.handler.run_task("look around"))
+        while not robot.stops:
+            await asyncio.sleep(0.001)
+        await asyncio.wrap_future(robot.stops[0])
+        latency = time.monotonic() - heard_at[0]
+        await asyncio.wait([task], timeout=1.0)
+        return task, latency
+
+    task, latency = asyncio.run(scenario())
+    assert latency <= robot.handler.preemptor.budget
+    assert task.cancelled()
@@ -0,0 +1,270 @@
+import numpy as np
+
+
+# --- Voice Activity Detection ---
+# The detectors below are fed the raw int16 buffers delivered to
+# SoundReceiverModule.processRemote. Time is counted in samples, not wall clock,
+# so recorded audio can be replayed through them at any speed.
+
+SILENCE = "silence"
+SPEECH_START = "speech_start"
+SPEECH = "speech"
+SPEECH_END = "speech_end"
+
+# Endpointing settings per environment. `hangover` is how long the signal has to
+# stay below the speech decision before an utterance is closed.
+ENDPOINT_PROFILES = {
+    "quiet": {"hangover": 0.30, "snr_db": 9.0, "min_speech": 0.15},
+    "indoor": {"hangover": 0.40, "snr_db": 10.0, "min_speech": 0.20},
+    "noisy": {"hangover": 0.55, "snr_db": 12.0, "min_speech": 0.25},
+}
+
+# Polish speakers on the robot pause longer between words, English is the baseline.
+LANGUAGE_HANGOVER_SCALE = {"Polski": 1.25, "English": 1.0}
+
+
+class FixedThresholdVAD(object):
+    """
+    The original detector: speech while RMS > threshold, utterance ends after
+    `hangover` seconds below it.
+    """
+    def __init__(self, threshold=0.04, hangover=2.0, sample_rate=16000):
+        self.threshold = threshold
+        self.hangover = hangover
+        self.sample_rate = sample_rate
+        self._scratch = np.empty(4096, dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self.samples_seen = 0
+        self._last_speech_sample = 0
+
+    def process(self, samples):
+        """
+        Feeds one int16 buffer and returns one of SILENCE, SPEECH_START, SPEECH, SPEECH_END.
+        """
+        n = len(samples)
+        if n > len(self._scratch):
+            self._scratch = np.empty(n, dtype=np.float32)
+        work = self._scratch[:n]
+        np.multiply(samples, 1.0 / 32768.0, out=work, casting="unsafe")
+        rms = np.sqrt(np.dot(work, work) / n) if n else 0.0
+        self.samples_seen += n
+
+        if rms > self.threshold:
+            self._last_speech_sample = self.samples_seen
+            if not self.in_speech:
+                self.in_speech = True
+                return SPEECH_START
+            return SPEECH
+        if not self.in_speech:
+            return SILENCE
+        if (self.samples_seen - self._last_speech_sample) / self.sample_rate >= self.hangover:
+            self.in_speech = False
+            return SPEECH_END
+        return SPEECH
+
+
+class AdaptiveVAD(object):
+    """
+    Noise-floor tracking detector with configurable endpointing.
+
+    Every incoming buffer is split into short frames (samples that do not fill
+    the last frame are carried over to the next buffer) and three features are
+    computed for all frames at once into preallocated work buffers: RMS energy, zero-crossing rate and spectral
+    flatness. A frame is speech when its energy is `snr_db` above the tracked
+    noise floor (and above `min_energy`) and at least one of the spectral
+    features looks like voice rather than fan or room noise.
+    """
+    def __init__(self, sample_rate=16000, min_energy=0.01, hangover=0.40, snr_db=10.0,
+                 min_speech=0.20, frame_seconds=0.02, start_frames=2,
+                 max_flatness=0.45, zcr_range=(0.02, 0.35), floor_adaptation=0.05):
+        self.sample_rate = sample_rate
+        self.min_energy = min_energy
+        self.hangover = hangover
+        self.snr = 10.0 ** (snr_db / 20.0)
+        self.min_speech = min_speech
+        self.frame_length = max(1, int(sample_rate * frame_seconds))
+        self.start_frames = start_frames
+        self.max_flatness = max_flatness
+        self.zcr_range = zcr_range
+        self.floor_adaptation = floor_adaptation
+        # Windowed real DFT as two matrices, so the spectrum is a matmul into a preallocated buffer
+        window = np.hanning(self.frame_length)
+        phase = 2 * np.pi * np.outer(np.arange(self.frame_length), np.arange(self.frame_length // 2 + 1)) \
+            / self.frame_length
+        self._dft_cos = (window[:, None] * np.cos(phase)).astype(np.float32)
+        self._dft_sin = (window[:, None] * np.sin(phase)).astype(np.float32)
+        self._pending = np.empty(self.frame_length, dtype=np.float32)  # samples after the last full frame
+        self._allocate(4096 // self.frame_length + 1)
+        self.reset()
+
+    def _allocate(self, n_frames):
+        """(Re)allocates the per-frame work buffers for up to `n_frames` frames."""
+        bins = self.frame_length // 2 + 1
+        self._capacity = n_frames
+        self._frames = np.empty((n_frames, self.frame_length), dtype=np.float32)
+        self._signs = np.empty((n_frames, self.frame_length), dtype=np.float32)
+        self._crossings = np.empty((n_frames, self.frame_length), dtype=np.float32)
+        self._real = np.empty((n_frames, bins), dtype=np.float32)
+        self._imag = np.empty((n_frames, bins), dtype=np.float32)
+        self._log_power = np.empty((n_frames, bins), dtype=np.float32)
+        self._energy = np.empty(n_frames, dtype=np.float32)
+        self._zcr = np.empty(n_frames, dtype=np.float32)
+        self._flatness = np.empty(n_frames, dtype=np.float32)
+        self._mean_power = np.empty(n_frames, dtype=np.float32)
+        self._loud = np.empty(n_frames, dtype=bool)
+        self._voiced = np.empty(n_frames, dtype=bool)
+        self._is_speech = np.empty(n_frames, dtype=bool)
+
+    @classmethod
+    def from_profile(cls, language="Polski", environment="indoor", **kwargs):
+        """
+        Builds a detector with the hangover chosen for `language` and `environment`.
+        """
+        profile = dict(ENDPOINT_PROFILES.get(environment, ENDPOINT_PROFILES["indoor"]))
+        profile["hangover"] *= LANGUAGE_HANGOVER_SCALE.get(language, 1.0)
+        profile.update(kwargs)
+        return cls(**profile)
+
+    def reset(self):
+        self.in_speech = False
+        self.samples_seen = 0
+        self.noise_floor = None
+        self._speech_run = 0
+        self._speech_begin_sample = 0
+        self._last_speech_sample = 0
+        self._pending_count = 0
+
+    def _fill_frames(self, samples):
+        """
+        Scales the pending samples and `samples` into the frame buffer and keeps
+        whatever does not fill a whole frame for the next call. Returns the number of frames.
+        """
+        fl = self.frame_length
+        total = self._pending_count + len(samples)
+        n_frames = total // fl
+        if n_frames > self._capacity:
+            self._allocate(n_frames)
+        flat = self._frames.reshape(-1)
+        used = n_frames * fl
+        if n_frames:
+            head = used - self._pending_count
+            flat[:self._pending_count] = self._pending[:self._pending_count]
+            new = flat[self._pending_count:used]
+            np.copyto(new, samples[:head], casting="unsafe")
+            np.multiply(new, np.float32(1.0 / 32768.0), out=new)
+            self._pending_count = 0
+        else:
+            head = 0
+        rest = self._pending[self._pending_count:self._pending_count + len(samples) - head]
+        np.copyto(rest, samples[head:], casting="unsafe")
+        np.multiply(rest, np.float32(1.0 / 32768.0), out=rest)
+        self._pending_count += len(rest)
+        return n_frames
+
+    def frame_features(self, n_frames):
+        """
+        Returns per-frame (energy, zero_crossing_rate, spectral_flatness) of the
+        first `n_frames` frames in the frame buffer. The arrays are views of work
+        buffers that the next call overwrites.
+        """
+        frames = self._frames[:n_frames]
+        energy, zcr, flatness = self._energy[:n_frames], self._zcr[:n_frames], self._flatness[:n_frames]
+        real, imag, log_power = self._real[:n_frames], self._imag[:n_frames], self._log_power[:n_frames]
+        mean_power = self._mean_power[:n_frames]
+
+        np.einsum("ij,ij->i", frames, frames, out=energy)
+        np.multiply(energy, 1.0 / self.frame_length, out=energy)
+        np.sqrt(energy, out=energy)
+
+        # Signs as +-1 (same split as np.signbit), a crossing is |difference| == 2.
+        # Differences are taken over the flat buffer; the last column of each row
+        # crosses into the next frame and is left out of the sum.
+        n = n_frames * self.frame_length
+        signs = self._signs.reshape(-1)[:n]
+        np.copysign(1.0, frames.reshape(-1), out=signs)
+        crossings = self._crossings.reshape(-1)[:n - 1]
+        np.subtract(signs[1:], signs[:-1], out=crossings)
+        np.abs(crossings, out=crossings)
+        np.sum(self._crossings[:n_frames, :-1], axis=1, out=zcr)
+        np.multiply(zcr, 0.5 / self.frame_length, out=zcr)
+
+        # Power spectrum in `real`: re^2 + im^2 + eps
+        np.matmul(frames, self._dft_cos, out=real)
+        np.matmul(frames, self._dft_sin, out=imag)
+        np.multiply(real, real, out=real)
+        np.multiply(imag, imag, out=imag)
+        np.add(real, imag, out=real)
+        np.add(real, 1e-12, out=real)
+        # Flatness: geometric mean / arithmetic mean of the power spectrum
+        np.log(real, out=log_power)
+        np.mean(log_power, axis=1, out=flatness)
+        np.exp(flatness, out=flatness)
+        np.mean(real, axis=1, out=mean_power)
+        np.divide(flatness, mean_power, out=flatness)
+        return energy, zcr, flatness
+
+    def _update_noise_floor(self, energy):
+        if self.noise_floor is None:
+            self.noise_floor = float(np.min(energy))
+            return
+        # Follow drops immediately, rises slowly so speech does not leak into the floor
+        lowest = float(np.min(energy))
+        if lowest < self.noise_floor:
+            self.noise_floor = lowest
+        else:
+            self.noise_floor += self.floor_adaptation * (float(np.mean(energy)) - self.noise_floor)
+
+    def process(self, samples):
+        """
+        Feeds one int16 buffer and returns one of SILENCE, SPEECH_START, SPEECH, SPEECH_END.
+        """
+        # Sample index of the first frame: samples left over from the last call come first
+        buffer_start = self.samples_seen - self._pending_count
+        self.samples_seen += len(samples)
+        n_frames = self._fill_frames(samples)
+        if not n_frames:
+            return SPEECH if self.in_speech else SILENCE
+
+        energy, zcr, flatness = self.frame_features(n_frames)
+        floor = self.noise_floor if self.noise_floor is not None else float(np.min(energy))
+        loud, voiced, is_speech = self._loud[:n_frames], self._voiced[:n_frames], self._is_speech[:n_frames]
+        np.greater(energy, floor * self.snr, out=loud)
+        np.logical_and(loud, np.greater(energy, self.min_energy, out=is_speech), out=loud)
+        np.greater(zcr, self.zcr_range[0], out=voiced)
+        np.logical_and(voiced, np.less(zcr, self.zcr_range[1], out=is_speech), out=voiced)
+        np.logical_or(voiced, np.less(flatness, self.max_flatness, out=is_speech), out=voiced)
+        np.logical_and(loud, voiced, out=is_speech)
+
+        if is_speech.any():
+            last = n_frames - 1 - int(np.argmax(is_speech[::-1]))
+            self._last_speech_sample = buffer_start + (last + 1) * self.frame_length
+        else:
+            self._update_noise_floor(energy)
+
+        if not self.in_speech:
+            # Require a short run of speech frames so single clicks do not trigger
+            run = self._speech_run
+            for frame_is_speech in is_speech:
+                run = run + 1 if frame_is_speech else 0
+                if run >= self.start_frames:
+                    break
+            self._speech_run = run
+            if run >= self.start_frames:
+                self.in_speech = True
+                self._speech_run = 0
+                self._speech_begin_sample = buffer_start + int(np.argmax(is_speech)) * self.frame_length
+                return SPEECH_START
+            return SILENCE
+
+        silence = (self.samples_seen - self._last_speech_sample) / self.sample_rate
+        if silence >= self.hangover:
+            self.in_speech = False
+            speech_length = (self._last_speech_sample - self._speech_begin_sample) / self.sample_rate
+            if speech_length < self.min_speech:
+                # Too short to be a command - treat it as a false trigger
+                return SILENCE
+            return SPEECH_END
+        return SPEECH
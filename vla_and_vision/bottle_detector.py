@@ -0,0 +1,311 @@
+import os
+import time
+import cv2
+import numpy as np
+
+
+# === PARAMS ===
+BOTTLE_CLASS_ID        = 39  # COCO "bottle"
+MIN_CONFIDENCE         = 0.25
+DEFAULT_WEIGHTS        = "yolov8n.pt"  # a .onnx file selects the ONNX Runtime backend
+IOU_THRESHOLD          = 0.7  # same NMS threshold as ultralytics
+MAX_DETECTIONS         = 300
+
+
+class Detection(object):
+    """One detected object: box in pixels (x1, y1, x2, y2), confidence and COCO class id."""
+    def __init__(self, box, confidence, class_id):
+        self.box = box
+        self.confidence = confidence
+        self.class_id = class_id
+
+    @property
+    def width(self):
+        return self.box[2] - self.box[0]
+
+    @property
+    def height(self):
+        return self.box[3] - self.box[1]
+
+    def __repr__(self):
+        return f"Detection(box={self.box}, confidence={self.confidence:.2f}, class_id={self.class_id})"
+
+
+class DetectionResult(object):
+    """
+    Detections of one frame with per-stage timings in ms
+    (preprocess, inference, postprocess from the model, total for the whole call per frame).
+    """
+    def __init__(self, detections, timings):
+        self.detections = detections
+        self.timings = timings
+
+    def __repr__(self):
+        return f"DetectionResult({len(self.detections)} detections, {self.timings})"
+
+
+def select_best_bottle(detections, min_confidence=MIN_CONFIDENCE):
+    """Returns the box of the *closest* upright bottle (largest bbox height) or None"""
+    best_box       = None
+    max_box_height = 0
+    for detection in detections:
+        if detection.class_id != BOTTLE_CLASS_ID or detection.confidence < min_confidence:
+            continue
+        x1, y1, x2, y2 = detection.box
+        width  = x2 - x1
+        height = y2 - y1
+        if height <= width:  # require upright shape
+            continue
+        if height > max_box_height:
+            max_box_height = height
+            best_box       = (x1, y1, x2, y2)
+
+    return best_box
+
+
+class BottleDetector(object):
+    """
+    Long-lived YOLO detector: the weights are loaded once and the model is warmed
+    up with a blank frame, so the first real frame does not pay for the lazy setup.
+    detect_batch() runs several frames (e.g. the five look_around frames or an
+    episode) through one forward pass per `batch_size` frames.
+    """
+    def __init__(self, weights=DEFAULT_WEIGHTS, device="cpu", imgsz=640, conf=MIN_CONFIDENCE, warmup=True):
+        self.weights = weights
+        self.device = device
+        self.imgsz = imgsz
+        self.conf = conf
+        from ultralytics import YOLO  # not needed by the ONNX Runtime backend
+
+        started = time.perf_counter()
+        self.model = YOLO(weights)
+        self.load_time = (time.perf_counter() - started) * 1000
+        self.warmup_time = None
+        if warmup:
+            self.warmup()
+
+    def warmup(self, runs=2):
+        """Runs blank frames through the model (builds the graph, fuses layers, allocates buffers)."""
+        started = time.perf_counter()
+        blank = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.model(blank, imgsz=self.imgsz, conf=self.conf, device=self.device, verbose=False)
+        self.warmup_time = (time.perf_counter() - started) * 1000
+        print(f"[DETECTOR] {self.weights} loaded in {self.load_time:.0f} ms, warm-up {self.warmup_time:.0f} ms")
+
+    def detect(self, frame):
+        """Detections of a single BGR frame."""
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames, batch_size=16):
+        """Detections of several BGR frames, `batch_size` frames per forward pass."""
+        results = []
+        for start in range(0, len(frames), batch_size):
+            chunk = list(frames[start:start + batch_size])
+            started = time.perf_counter()
+            outputs = self.model(chunk, imgsz=self.imgsz, conf=self.conf, device=self.device, verbose=False)
+            total = (time.perf_counter() - started) * 1000 / len(chunk)
+            for output in outputs:
+                boxes = output.boxes
+                detections = [
+                    Detection(tuple(int(v) for v in box), float(confidence), int(class_id))
+                    for box, confidence, class_id in zip(boxes.xyxy.tolist(), boxes.conf.tolist(), boxes.cls.tolist())
+                ]
+                timings = dict(output.speed)
+                timings["total"] = total
+                results.append(DetectionResult(detections, timings))
+        return results
+
+
+# --- ONNX Runtime backend (CPU) ---
+
+def letterbox(image, size=640, stride=None, pad_value=114):
+    """
+    Resizes a BGR image to fit a size x size square keeping the aspect ratio and
+    pads the rest (as ultralytics does). With `stride` it only pads up to a multiple
+    of it (e.g. 1280x960 -> 640x480), which needs a model exported with dynamic
+    shapes. Returns (RGB float32 CHW in 0..1, scale, (pad_x, pad_y)).
+    """
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_width, new_height = round(width * scale), round(height * scale)
+    out_width, out_height = size, size
+    if stride:
+        out_width = -(-new_width // stride) * stride
+        out_height = -(-new_height // stride) * stride
+    pad_x, pad_y = (out_width - new_width) / 2, (out_height - new_height) / 2
+    top, left = round(pad_y - 0.1), round(pad_x - 0.1)
+    canvas = np.full((out_height, out_width, 3), pad_value, dtype=np.uint8)
+    canvas[top:top + new_height, left:left + new_width] = cv2.resize(image, (new_width, new_height),
+                                                                     interpolation=cv2.INTER_LINEAR)
+    blob = canvas[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) * (1 / 255)
+    return blob, scale, (left, top)
+
+
+def box_iou(box, boxes):
+    """IoU of one box (x1, y1, x2, y2) with an (N, 4) array of boxes."""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / (area + areas - intersection + 1e-9)
+
+
+def nms(boxes, scores, class_ids, iou_threshold=IOU_THRESHOLD, max_detections=MAX_DETECTIONS):
+    """
+    Per-class non-maximum suppression. Boxes of different classes are shifted
+    apart so one pass handles all classes. Returns the kept indices, best first.
+    """
+    shifted = boxes + (class_ids * 7680.0)[:, None]
+    order = np.argsort(-scores)
+    keep = []
+    while order.size and len(keep) < max_detections:
+        best = order[0]
+        keep.append(best)
+        order = order[1:][box_iou(shifted[best], shifted[order[1:]]) <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+class OnnxBottleDetector(object):
+    """
+    BottleDetector backed by an exported YOLOv8 ONNX model on ONNX Runtime (CPU).
+
+    Letterboxing, box decoding and NMS are done in NumPy, so ultralytics and
+    torch are not needed at run time. `threads` sets intra-op threads (default:
+    physical cores, i.e. half the logical CPUs). Same interface as BottleDetector.
+    """
+    def __init__(self, model_path, imgsz=640, conf=MIN_CONFIDENCE, iou=IOU_THRESHOLD, threads=None, warmup=True):
+        import onnxruntime as ort
+
+        self.weights = model_path
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = threads or max(1, (os.cpu_count() or 2) // 2)
+        options.inter_op_num_threads = 1
+        started = time.perf_counter()
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.max_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None  # None: dynamic
+        # Dynamic height/width: pad only to the stride like ultralytics does for .pt weights
+        self.stride = None if isinstance(model_input.shape[2], int) else 32
+        self.load_time = (time.perf_counter() - started) * 1000
+        self.warmup_time = None
+        if warmup:
+            self.warmup()
+
+    def warmup(self, runs=2):
+        """Runs blank frames through the session."""
+        started = time.perf_counter()
+        blank = np.zeros((1, 3, self.imgsz, self.imgsz), dtype=np.float32)
+        for _ in range(runs):
+            self.session.run(None, {self.input_name: blank})
+        self.warmup_time = (time.perf_counter() - started) * 1000
+        print(f"[DETECTOR] {self.weights} loaded in {self.load_time:.0f} ms, warm-up {self.warmup_time:.0f} ms")
+
+    def detect(self, frame):
+        """Detections of a single BGR frame."""
+        return self.detect_batch([frame])[0]
+
+    def _postprocess(self, prediction, scale, pad, shape):
+        """(84, anchors) YOLOv8 output -> list of Detection in frame pixels."""
+        prediction = prediction.T
+        scores_all = prediction[:, 4:]
+        class_ids = scores_all.argmax(axis=1)
+        scores = scores_all[np.arange(len(class_ids)), class_ids]
+        mask = scores >= self.conf
+        xywh, scores, class_ids = prediction[mask, :4], scores[mask], class_ids[mask]
+        boxes = np.empty_like(xywh)
+        boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+        boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+        keep = nms(boxes, scores, class_ids, self.iou)
+        if not keep.size:
+            return []
+        boxes = (boxes[keep] - (pad * 2)) / scale
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, shape[1])
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, shape[0])
+        return [Detection(tuple(int(v) for v in box), float(score), int(class_id))
+                for box, score, class_id in zip(boxes.tolist(), scores[keep].tolist(), class_ids[keep].tolist())]
+
+    def detect_batch(self, frames, batch_size=16):
+        """Detections of several BGR frames, `batch_size` frames per session run."""
+        batch_size = min(batch_size, self.max_batch or batch_size)
+        results = []
+        for start in range(0, len(frames), batch_size):
+            chunk = frames[start:start + batch_size]
+            t0 = time.perf_counter()
+            # A batch needs one input shape: frames of different sizes get the full square
+            stride = self.stride if len({frame.shape for frame in chunk}) == 1 else None
+            prepared = [letterbox(frame, self.imgsz, stride) for frame in chunk]
+            blob = np.stack([blob for blob, _, _ in prepared])
+            t1 = time.perf_counter()
+            output = self.session.run(None, {self.input_name: blob})[0]
+            t2 = time.perf_counter()
+            detections = [self._postprocess(prediction, scale, pad, frame.shape)
+                          for prediction, (_, scale, pad), frame in zip(output, prepared, chunk)]
+            t3 = time.perf_counter()
+            n = len(chunk)
+            timings = {"preprocess": (t1 - t0) * 1000 / n, "inference": (t2 - t1) * 1000 / n,
+                       "postprocess": (t3 - t2) * 1000 / n, "total": (t3 - t0) * 1000 / n}
+            results.extend(DetectionResult(frame_detections, dict(timings)) for frame_detections in detections)
+        return results
+
+
+def export_onnx(weights=DEFAULT_WEIGHTS, imgsz=640):
+    """Exports YOLO weights to ONNX with a dynamic batch size. Returns the .onnx path."""
+    from ultralytics import YOLO
+
+    return YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+
+
+def quantize_onnx(model_path, calibration_frames=None, imgsz=640):
+    """
+    Writes an INT8 copy of an ONNX model next to it and returns its path.
+
+    With calibration frames (BGR images like the ones the robot sees) activations
+    are quantized statically, which keeps the accuracy close to FP32; without
+    them only the weights are quantized (dynamic quantization).
+    """
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+
+    output_path = model_path.replace(".onnx", "_int8.onnx")
+    if not calibration_frames:
+        quantize_dynamic(model_path, output_path, weight_type=QuantType.QUInt8)
+        return output_path
+
+    class FramesReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.inputs = iter([{input_name: letterbox(frame, imgsz)[0][None]} for frame in calibration_frames])
+
+        def get_next(self):
+            return next(self.inputs, None)
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    quantize_static(model_path, output_path, FramesReader(input_name), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+    return output_path
+
+
+_detectors = {}  # weights -> BottleDetector or OnnxBottleDetector
+
+
+def get_detector(weights=DEFAULT_WEIGHTS, **kwargs):
+    """
+    Returns the shared detector for `weights`, loading it on first use.
+    .onnx weights use ONNX Runtime, anything else ultralytics (PyTorch).
+    """
+    detector = _detectors.get(weights)
+    if detector is None:
+        backend = OnnxBottleDetector if str(weights).endswith(".onnx") else BottleDetector
+        detector = backend(weights, **kwargs)
+        _detectors[weights] = detector
+    return detector
@@ -34,7 +34,7 @@ app.session.service("ALRobotPosture").goToPosture("StandInit", 0.5)  # Set initi
 motion_service = app.session.service("ALMotion")
 video_service = app.session.service("ALVideoDevice")
 
-video_service = delete_subs("kamera", app, video_service, motion_service)  # needed for camera initialization
+video_service = delete_subs("kamera", app, video_service)  # needed for camera initialization
 vid_handle = video_service.subscribeCamera(
     "kamera",
     CAMERA_INDEX,
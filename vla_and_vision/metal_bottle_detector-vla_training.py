@@ -1,17 +1,19 @@
 import sys, os, json, time
 import cv2
 import numpy as np
-from ultralytics import YOLO
 from pathlib import Path
 
 parent_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(parent_dir))
-from camera import take_picture
+from camera import take_picture, HEAD_CAMERA_HALF_HFOV
+from bottle_detector import get_detector, select_best_bottle
+from tracker import BottleTracker
 
 
 # === PARAMS ===
 MIN_CONFIDENCE         = 0.25
 MIN_HEIGHT_RATIO       = 0.03  # if bottle <3% of frame height → too far
+DETECTOR_WEIGHTS       = "yolov8n.pt"  # or an exported "yolov8n.onnx" / "yolov8n_int8.onnx" (ONNX Runtime, CPU)
 
 # Placeholder robot API functions (implement these)
 def turn_robot(angle_degrees, motion_service):
@@ -40,28 +42,11 @@ def detect_bottle(frame):
     if frame is None:
         return None
 
-    # Run YOLOv8 detector
-    model   = YOLO("yolov8n.pt")
-    results = model(frame)[0]
+    # Run YOLOv8 detector (loaded and warmed up once, reused for every frame; PyTorch or ONNX Runtime)
+    result = get_detector(DETECTOR_WEIGHTS).detect(frame)
 
     # Find the *closest* upright bottle (largest bbox height)
-    best_box       = None
-    max_box_height = 0
-    for box, confidence, class_id in zip(results.boxes.xyxy,
-                                         results.boxes.conf,
-                                         results.boxes.cls):
-        if int(class_id) != 39 or float(confidence) < MIN_CONFIDENCE:
-            continue
-        x1, y1, x2, y2 = map(int, box)
-        width  = x2 - x1
-        height = y2 - y1
-        if height <= width:  # require upright shape
-            continue
-        if height > max_box_height:
-            max_box_height = height
-            best_box       = (x1, y1, x2, y2)
-
-    return best_box
+    return select_best_bottle(result.detections, MIN_CONFIDENCE)
 
 def choose_actions(bottle_box, frame_height, frame_width):
     """
@@ -144,6 +129,9 @@ def collect_episode(episode_idx, video_service, vid_handle, motion_service):
     episode_dir = "training_data"
     os.makedirs(episode_dir, exist_ok=True)
 
+    # Full detection every few frames, Kalman prediction in between; stays on one bottle
+    tracker = BottleTracker(get_detector(DETECTOR_WEIGHTS), min_confidence=MIN_CONFIDENCE)
+
     frames = []  # list of uint8 arrays [H,W,3]
     states = []  # list of float32 arrays [S,]
     actions = []  # list of float32 arrays [A,]
@@ -154,8 +142,8 @@ def collect_episode(episode_idx, video_service, vid_handle, motion_service):
 
         state_vec = read_robot_state()
 
-        # Detect bottle
-        best_box = detect_bottle(frame)
+        # Detect / track bottle
+        best_box = tracker.update(frame)
         if not best_box:
             print("No bottle detected.")
             break
@@ -171,17 +159,23 @@ def collect_episode(episode_idx, video_service, vid_handle, motion_service):
         # horizontal rotation
         if action_vec[0]:
             turn_robot(action_vec[0], motion_service)
+            # + = left: the scene moves right in the head camera image
+            tracker.shift(action_vec[0] * frame_width / (2 * HEAD_CAMERA_HALF_HFOV))
         # move forward
         if action_vec[1]:
             move_robot_forward(motion_service)
+            tracker.force_detection()  # box sizes change, prediction would be off
         # vertical rotation
         if action_vec[2]:
             tilt_arm(action_vec[2], motion_service)
+            tracker.force_detection()  # tilt_arm also moves the head
         # shoot
         if action_vec[3]:
             shoot()
             break
 
+    print(f"[TRACKER] {tracker.stats()}")
+
     # convert lists → arrays
     frames_arr = np.stack(frames, axis=0)          # [T,H,W,3], uint8
     states_arr = np.stack(states, axis=0)          # [T,S],    float32
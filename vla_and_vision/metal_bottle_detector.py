@@ -1,15 +1,17 @@
 import sys
-from ultralytics import YOLO
 from pathlib import Path
 
 parent_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(parent_dir))
-from camera import take_picture
+from camera import take_picture, HEAD_CAMERA_HALF_HFOV
+from bottle_detector import get_detector, select_best_bottle
+from tracker import BottleTracker
 
 
 # === PARAMS ===
 MIN_CONFIDENCE         = 0.25
 MIN_HEIGHT_RATIO       = 0.03  # if bottle <3% of frame height → too far
+DETECTOR_WEIGHTS       = "yolov8n.pt"  # or an exported "yolov8n.onnx" / "yolov8n_int8.onnx" (ONNX Runtime, CPU)
 HORIZONTAL_ROTATION_FACTOR = 0.05
 VERTICAL_ROTATION_FACTOR   = 0.05
 
@@ -29,33 +31,30 @@ def tilt_arm(angle_degrees, motion_service):
 def shoot():
     print("[ROBOT] shoot()")
 
+_tracker = None
+
+
+def get_tracker():
+    """Tracker shared by consecutive target_and_shoot_bottle calls, so they keep aiming at the same bottle."""
+    global _tracker
+    if _tracker is None:
+        _tracker = BottleTracker(get_detector(DETECTOR_WEIGHTS), min_confidence=MIN_CONFIDENCE)
+    return _tracker
+
+def turn_shift_pixels(angle_degrees, frame_width):
+    """Horizontal image shift of static objects after the robot turns by angle_degrees (+ = left)."""
+    return angle_degrees * frame_width / (2 * HEAD_CAMERA_HALF_HFOV)
+
 def detect_bottle(frame):
     """Detect bottle in frame and return the best bottle box or None"""
     if frame is None:
         return None
 
-    # Run YOLOv8 detector
-    model   = YOLO("yolov8n.pt")
-    results = model(frame)[0]
+    # Run YOLOv8 detector (loaded and warmed up once, reused for every frame; PyTorch or ONNX Runtime)
+    result = get_detector(DETECTOR_WEIGHTS).detect(frame)
 
     # Find the *closest* upright bottle (largest bbox height)
-    best_box       = None
-    max_box_height = 0
-    for box, confidence, class_id in zip(results.boxes.xyxy,
-                                         results.boxes.conf,
-                                         results.boxes.cls):
-        if int(class_id) != 39 or float(confidence) < MIN_CONFIDENCE:
-            continue
-        x1, y1, x2, y2 = map(int, box)
-        width  = x2 - x1
-        height = y2 - y1
-        if height <= width:  # require upright shape
-            continue
-        if height > max_box_height:
-            max_box_height = height
-            best_box       = (x1, y1, x2, y2)
-
-    return best_box
+    return select_best_bottle(result.detections, MIN_CONFIDENCE)
 
 def choose_actions(bottle_box, frame_height, frame_width):
     """
@@ -89,8 +88,9 @@ def target_and_shoot_bottle(video_service, vid_handle, motion_service):
     frame = take_picture(video_service, vid_handle)
     frame_height, frame_width = frame.shape[:2]
 
-    # Detect bottle
-    best_box = detect_bottle(frame)
+    # Detect bottle (or follow the bottle locked on in the previous calls)
+    tracker = get_tracker()
+    best_box = tracker.update(frame)
     if not best_box:
         print("Can't shoot: no bottle detected.")
         return("No bottle detected.")
@@ -103,6 +103,7 @@ def target_and_shoot_bottle(video_service, vid_handle, motion_service):
     # Execute discrete control actions
     # horizontal rotation
     turn_robot(actions['horizontal_turn'], motion_service)
+    tracker.shift(turn_shift_pixels(actions['horizontal_turn'], frame_width))
     # vertical rotation
     tilt_arm(actions['vertical_turn'], motion_service)
     shoot()
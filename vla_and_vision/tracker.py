@@ -0,0 +1,243 @@
+import time
+import numpy as np
+from bottle_detector import BOTTLE_CLASS_ID, MIN_CONFIDENCE, get_detector
+
+
+# === PARAMS ===
+DETECT_EVERY           = 5    # full detection every N frames, Kalman prediction in between
+MIN_IOU                = 0.3  # detection <-> track association
+MAX_MISSED             = 3    # detections a track may miss before it is dropped
+CONFIDENCE_DECAY       = 0.85 # per predicted-only frame
+REDETECT_CONFIDENCE    = 0.3  # detect again when the target confidence falls below this
+MAX_PREDICTION_AGE     = 1.0  # seconds; older detections are not extrapolated
+
+
+class KalmanBoxFilter(object):
+    """
+    Constant-velocity Kalman filter of a box: state (cx, cy, w, h, vx, vy, vw, vh)
+    in pixels and pixels per frame, measurement (cx, cy, w, h).
+    """
+    def __init__(self, box, position_noise=1.0, velocity_noise=0.05, measurement_noise=4.0):
+        self.x = np.zeros(8)
+        self.x[:4] = self.to_measurement(box)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 100.0, 100.0, 100.0, 100.0])
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+        self.H = np.eye(4, 8)
+        self.Q = np.diag([position_noise] * 4 + [velocity_noise] * 4)
+        self.R = np.eye(4) * measurement_noise
+
+    @staticmethod
+    def to_measurement(box):
+        x1, y1, x2, y2 = box
+        return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], dtype=float)
+
+    @property
+    def box(self):
+        cx, cy, w, h = self.x[:4]
+        w, h = max(w, 1.0), max(h, 1.0)
+        return (cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2)
+
+    def predict(self):
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        return self.box
+
+    def update(self, box):
+        y = self.to_measurement(box) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(8) - K @ self.H) @ self.P
+
+    def shift(self, dx, dy=0.0):
+        """Moves the box by a known image displacement (e.g. the robot turned)."""
+        self.x[0] += dx
+        self.x[1] += dy
+
+
+class Track(object):
+    """One object followed across frames."""
+    def __init__(self, track_id, detection):
+        self.id = track_id
+        self.class_id = detection.class_id
+        self.filter = KalmanBoxFilter(detection.box)
+        self.confidence = detection.confidence
+        self.hits = 1
+        self.missed = 0
+
+    @property
+    def box(self):
+        return tuple(int(round(v)) for v in self.filter.box)
+
+    @property
+    def upright(self):
+        x1, y1, x2, y2 = self.filter.box
+        return y2 - y1 > x2 - x1
+
+    def __repr__(self):
+        return f"Track(id={self.id}, box={self.box}, confidence={self.confidence:.2f}, hits={self.hits})"
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU of every box in boxes_a (N, 4) with every box in boxes_b (M, 4)."""
+    a = np.asarray(boxes_a, dtype=float).reshape(-1, 4)[:, None]
+    b = np.asarray(boxes_b, dtype=float).reshape(-1, 4)[None]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return intersection / (area_a + area_b - intersection + 1e-9)
+
+
+def greedy_match(tracks, detections, min_iou=MIN_IOU):
+    """
+    Pairs tracks with detections of the same class, highest IoU first.
+    Returns (matches [(track, detection)], unmatched detections).
+    """
+    if not tracks or not detections:
+        return [], list(detections)
+    ious = iou_matrix([track.filter.box for track in tracks], [d.box for d in detections])
+    same_class = np.array([[t.class_id == d.class_id for d in detections] for t in tracks])
+    ious[~same_class] = 0
+    matches = []
+    used_tracks, used_detections = set(), set()
+    for flat in np.argsort(-ious, axis=None):
+        t, d = np.unravel_index(flat, ious.shape)
+        if ious[t, d] < min_iou:
+            break
+        if t in used_tracks or d in used_detections:
+            continue
+        used_tracks.add(t)
+        used_detections.add(d)
+        matches.append((tracks[t], detections[d]))
+    unmatched = [d for i, d in enumerate(detections) if i not in used_detections]
+    return matches, unmatched
+
+
+class BottleTracker(object):
+    """
+    Follows bottles between frames so the aiming loop does not run the detector
+    on every frame and does not jump between bottles.
+
+    The detector runs every `detect_every` frames, or earlier when there is no
+    target, its confidence (decayed on every predicted-only frame) drops below
+    `redetect_confidence`, or the last detection is older than `max_prediction_age`
+    seconds. Other frames only advance the Kalman filters. The first target is
+    the closest upright bottle (largest box height, as select_best_bottle does);
+    afterwards the tracker stays locked on that track until it is lost.
+    """
+    def __init__(self, detector=None, detect_every=DETECT_EVERY, min_iou=MIN_IOU, max_missed=MAX_MISSED,
+                 min_confidence=MIN_CONFIDENCE, confidence_decay=CONFIDENCE_DECAY,
+                 redetect_confidence=REDETECT_CONFIDENCE, max_prediction_age=MAX_PREDICTION_AGE,
+                 class_id=BOTTLE_CLASS_ID):
+        self.detector = detector or get_detector()
+        self.detect_every = detect_every
+        self.min_iou = min_iou
+        self.max_missed = max_missed
+        self.min_confidence = min_confidence
+        self.confidence_decay = confidence_decay
+        self.redetect_confidence = redetect_confidence
+        self.max_prediction_age = max_prediction_age
+        self.class_id = class_id
+        self.tracks = []
+        self.target_id = None
+        self._next_id = 1
+        self._frames_since_detection = 0
+        self._last_detection = 0.0
+        self._force_detection = False
+        self.frames = 0
+        self.detections_run = 0
+        self.target_switches = 0
+
+    @property
+    def target(self):
+        """The locked Track or None."""
+        for track in self.tracks:
+            if track.id == self.target_id:
+                return track
+        return None
+
+    def _needs_detection(self):
+        target = self.target
+        return (self._force_detection or target is None
+                or self._frames_since_detection >= self.detect_every
+                or target.confidence < self.redetect_confidence
+                or time.monotonic() - self._last_detection > self.max_prediction_age)
+
+    def _detect(self, frame):
+        result = self.detector.detect(frame)
+        detections = [d for d in result.detections
+                      if d.class_id == self.class_id and d.confidence >= self.min_confidence]
+        matches, unmatched = greedy_match(self.tracks, detections, self.min_iou)
+        matched = set()
+        for track, detection in matches:
+            track.filter.update(detection.box)
+            track.confidence = detection.confidence
+            track.hits += 1
+            track.missed = 0
+            matched.add(track.id)
+        for track in self.tracks:
+            if track.id not in matched:
+                track.missed += 1
+                track.confidence *= self.confidence_decay
+        for detection in unmatched:
+            self.tracks.append(Track(self._next_id, detection))
+            self._next_id += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+        self._frames_since_detection = 0
+        self._last_detection = time.monotonic()
+        self._force_detection = False
+        self.detections_run += 1
+
+    def _select_target(self):
+        target = self.target
+        if target is not None:
+            return target  # stays locked while the track survives (max_missed detections)
+        # Lock on the closest upright bottle seen in the last detection
+        candidates = [track for track in self.tracks if track.missed == 0 and track.upright]
+        if not candidates:
+            return None
+        best = max(candidates, key=lambda track: track.filter.box[3] - track.filter.box[1])
+        if self.target_id is not None and best.id != self.target_id:
+            self.target_switches += 1
+            print(f"[TRACKER] target {self.target_id} lost, locking on track {best.id}")
+        self.target_id = best.id
+        return best
+
+    def update(self, frame):
+        """
+        Advances the tracks by one frame and returns the target box
+        (x1, y1, x2, y2) in pixels, or None when there is no bottle.
+        """
+        self.frames += 1
+        self._frames_since_detection += 1
+        for track in self.tracks:
+            track.filter.predict()
+        if self._needs_detection():
+            self._detect(frame)
+            target = self._select_target()
+        else:
+            for track in self.tracks:
+                track.confidence *= self.confidence_decay
+            target = self.target
+        return target.box if target is not None else None
+
+    def shift(self, dx, dy=0.0):
+        """Moves every track by a known image displacement in pixels (camera motion)."""
+        for track in self.tracks:
+            track.filter.shift(dx, dy)
+
+    def force_detection(self):
+        """Runs the detector on the next frame (e.g. after the robot walked and box sizes changed)."""
+        self._force_detection = True
+
+    def reset(self):
+        self.tracks = []
+        self.target_id = None
+        self._force_detection = False
+
+    def stats(self):
+        return {"frames": self.frames, "detections": self.detections_run,
+                "target_switches": self.target_switches, "tracks": len(self.tracks)}